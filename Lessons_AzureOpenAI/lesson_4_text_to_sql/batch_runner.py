@@ -0,0 +1,360 @@
+"""
+Concurrent Batch Runner for Text-to-SQL
+
+Running an evaluation suite one question at a time leaves the process idle for
+the whole LLM round-trip of every question. The BatchRunner keeps several
+questions in flight at once:
+
+- SQL generation runs on the async client, limited by a concurrency cap and a
+  token-bucket rate limit (requests and/or tokens per minute)
+- SQL execution runs on a thread pool, so the event loop is never blocked by SQLite
+- One JSONL record per question (SQL, rows, errors, timings) is written as soon
+  as the question finishes, so a long run can be inspected or resumed
+
+Input is a JSONL file with one question per line:
+    {"id": "q1", "question": "How many customers are there?", "expected_sql": "SELECT COUNT(*) FROM customers"}
+
+`expected_sql` is optional; when present both queries are executed and the
+record says whether their results match.
+
+Usage (from the lesson_4_text_to_sql folder):
+    python batch_runner.py examples/eval_questions.jsonl --output results.jsonl --concurrency 16 --rpm 300
+    python batch_runner.py examples/eval_questions.jsonl --mock   # offline, no API calls
+
+    # From a notebook (functions may be sync or async)
+    summary = await run_batch(questions, text_to_sql_basic, execute_sql_query, output_path='results.jsonl')
+"""
+
+import argparse
+import asyncio
+import inspect
+import json
+import os
+import random
+import statistics
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from schema_catalog import SchemaCatalog
+from sql_engine import SQLEngine
+
+
+class TokenBucket:
+    """Async token bucket: `rate` tokens are added per second, up to `capacity`."""
+
+    def __init__(self, rate, capacity=None):
+        self.rate = rate
+        self.capacity = capacity or rate
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self, amount=1):
+        """Wait until `amount` tokens are available and take them."""
+        amount = min(amount, self.capacity)
+        # Holding the lock while sleeping keeps waiters in FIFO order
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= amount:
+                    self._tokens -= amount
+                    return
+                await asyncio.sleep((amount - self._tokens) / self.rate)
+
+
+def load_questions(path):
+    """Read a JSONL file of {'id', 'question', 'expected_sql'} records."""
+    items = []
+    with open(path, encoding='utf-8') as f:
+        for line_number, line in enumerate(f, 1):
+            line = line.strip()
+            if not line:
+                continue
+            item = json.loads(line)
+            item.setdefault('id', str(line_number))
+            items.append(item)
+    return items
+
+
+def clean_sql(text):
+    """Strip markdown code fences from a model response."""
+    sql = text.strip()
+    if sql.startswith('```sql'):
+        sql = sql.replace('```sql', '').replace('```', '').strip()
+    elif sql.startswith('```'):
+        sql = sql.replace('```', '').strip()
+    return sql
+
+
+def _rows_and_columns(result):
+    """Accept both execute_query() and the notebook's execute_sql_query() result shapes."""
+    rows = result.get('results') or []
+    columns = result.get('columns') or result.get('column_names') or []
+    rows = [list(row.values()) if isinstance(row, dict) else list(row) for row in rows]
+    return rows, columns
+
+
+def _same_rows(rows, expected):
+    """Compare results ignoring row order and column names."""
+    return sorted(map(repr, rows)) == sorted(map(repr, expected))
+
+
+def _percentile(values, q):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q * len(values)))]
+
+
+class BatchRunner:
+    """Runs many text-to-SQL questions concurrently and records the outcome of each."""
+
+    def __init__(self, generate_fn, execute_fn, concurrency=8, requests_per_minute=None,
+                 tokens_per_minute=None, estimate_tokens=None, execution_workers=4, max_rows=20):
+        """
+        Args:
+            generate_fn: question -> SQL, either a coroutine function or a plain function
+                         (plain functions run in a worker thread)
+            execute_fn: SQL -> result dict ({'success', 'results', ...}), called on the thread pool
+            concurrency: Maximum number of questions in flight
+            requests_per_minute: Rate limit for generate_fn calls (None for no limit)
+            tokens_per_minute: Token rate limit for generate_fn calls (None for no limit)
+            estimate_tokens: question -> estimated tokens of one generate_fn call,
+                             used with tokens_per_minute
+            execution_workers: Threads used to execute SQL
+            max_rows: Rows stored per question in the output file
+        """
+        self.generate_fn = generate_fn
+        self.execute_fn = execute_fn
+        self.concurrency = concurrency
+        self.execution_workers = execution_workers
+        self.max_rows = max_rows
+        self.estimate_tokens = estimate_tokens or (lambda question: len(question) // 4 + 1)
+
+        self.request_bucket = TokenBucket(requests_per_minute / 60, max(1, requests_per_minute / 60)) \
+            if requests_per_minute else None
+        self.token_bucket = TokenBucket(tokens_per_minute / 60, tokens_per_minute / 6) \
+            if tokens_per_minute else None
+
+    async def _wait_for_rate_limit(self, question):
+        if self.request_bucket:
+            await self.request_bucket.acquire()
+        if self.token_bucket:
+            await self.token_bucket.acquire(self.estimate_tokens(question))
+
+    async def _generate(self, question, generation_executor):
+        if generation_executor is None:
+            return await self.generate_fn(question)
+        return await asyncio.get_running_loop().run_in_executor(generation_executor, self.generate_fn, question)
+
+    async def _process(self, item, semaphore, executor, generation_executor):
+        loop = asyncio.get_running_loop()
+        record = {'id': item['id'], 'question': item['question']}
+
+        async with semaphore:
+            # Timings start once the question is admitted and its rate-limit slot is granted
+            await self._wait_for_rate_limit(item['question'])
+            started = time.perf_counter()
+            try:
+                sql = await self._generate(item['question'], generation_executor)
+                record['sql'] = sql
+                record['generation_ms'] = round((time.perf_counter() - started) * 1000, 1)
+
+                executed = time.perf_counter()
+                result = await loop.run_in_executor(executor, self.execute_fn, sql)
+                record['execution_ms'] = round((time.perf_counter() - executed) * 1000, 1)
+
+                record['success'] = bool(result.get('success'))
+                if record['success']:
+                    rows, columns = _rows_and_columns(result)
+                    record['columns'] = columns
+                    record['row_count'] = len(rows)
+                    record['rows'] = rows[:self.max_rows]
+                    if item.get('expected_sql'):
+                        expected = await loop.run_in_executor(executor, self.execute_fn, item['expected_sql'])
+                        record['match'] = bool(expected.get('success')) and \
+                            _same_rows(rows, _rows_and_columns(expected)[0])
+                else:
+                    record['error'] = result.get('error')
+                    if item.get('expected_sql'):
+                        record['match'] = False
+            except Exception as e:
+                record['success'] = False
+                record['error'] = f"{type(e).__name__}: {e}"
+
+        record['total_ms'] = round((time.perf_counter() - started) * 1000, 1)
+        return record
+
+    async def run(self, items, output_path=None, resume=False, on_record=None):
+        """
+        Process all questions and return a summary.
+
+        Args:
+            items: Question strings or {'id', 'question', 'expected_sql'} dicts
+            output_path: JSONL file that receives one record per question as it completes
+            resume: Skip questions whose id is already in output_path
+            on_record: Optional callback called with each record
+
+        Returns:
+            dict: Counts, match rate, latency percentiles and wall time
+        """
+        items = [{'id': str(i), 'question': item} if isinstance(item, str) else item
+                 for i, item in enumerate(items, 1)]
+
+        done = set()
+        if resume and output_path and os.path.exists(output_path):
+            done = {str(record['id']) for record in load_questions(output_path)}
+            items = [item for item in items if str(item['id']) not in done]
+
+        semaphore = asyncio.Semaphore(self.concurrency)
+        records = []
+        started = time.perf_counter()
+        output = open(output_path, 'a' if resume else 'w', encoding='utf-8') if output_path else None
+        # A plain (blocking) generate_fn gets one thread per concurrent question
+        generation_executor = None if inspect.iscoroutinefunction(self.generate_fn) \
+            else ThreadPoolExecutor(max_workers=self.concurrency)
+        try:
+            with ThreadPoolExecutor(max_workers=self.execution_workers) as executor:
+                tasks = [asyncio.ensure_future(self._process(item, semaphore, executor, generation_executor))
+                         for item in items]
+                for finished in asyncio.as_completed(tasks):
+                    record = await finished
+                    records.append(record)
+                    if output:
+                        output.write(json.dumps(record, default=str) + '\n')
+                        output.flush()
+                    if on_record:
+                        on_record(record)
+        finally:
+            if output:
+                output.close()
+            if generation_executor:
+                generation_executor.shutdown(wait=False)
+
+        return summarize(records, time.perf_counter() - started, skipped=len(done))
+
+
+def summarize(records, wall_seconds, skipped=0):
+    graded = [r for r in records if 'match' in r]
+    generation = [r['generation_ms'] for r in records if 'generation_ms' in r]
+    total = [r['total_ms'] for r in records]
+    return {
+        'questions': len(records),
+        'skipped': skipped,
+        'succeeded': sum(r['success'] for r in records),
+        'failed': sum(not r['success'] for r in records),
+        'graded': len(graded),
+        'matched': sum(r['match'] for r in graded),
+        'wall_seconds': round(wall_seconds, 2),
+        'questions_per_second': round(len(records) / wall_seconds, 2) if wall_seconds else 0.0,
+        'generation_ms_p50': _percentile(generation, 0.5),
+        'generation_ms_p95': _percentile(generation, 0.95),
+        'total_ms_p50': _percentile(total, 0.5),
+        'total_ms_p95': _percentile(total, 0.95),
+        'mean_total_ms': round(statistics.mean(total), 1) if total else 0.0,
+    }
+
+
+async def run_batch(questions, generate_fn, execute_fn, output_path=None, resume=False, **kwargs):
+    """Convenience wrapper: BatchRunner(generate_fn, execute_fn, **kwargs).run(...)"""
+    runner = BatchRunner(generate_fn, execute_fn, **kwargs)
+    return await runner.run(questions, output_path=output_path, resume=resume)
+
+
+# ----------------------------------------------------------------------
+# Command line
+# ----------------------------------------------------------------------
+
+def make_llm_generator(schema_text, max_tokens=200):
+    """Async question -> SQL function using the Azure OpenAI chat completions API."""
+    sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    from shared.llm_client import get_client, get_model
+
+    # Shared pooled client: retries 429/5xx with backoff, so a rate-limited request is not a failed item
+    client = get_client(async_client=True)
+    model = get_model()
+
+    async def generate(question):
+        response = await client.chat.completions.create(
+            model=model,
+            messages=[
+                {"role": "system", "content": f"You are a SQL expert. Generate only valid SQLite queries, no explanations.\n\nDatabase Schema:\n{schema_text}"},
+                {"role": "user", "content": question},
+            ],
+            temperature=0.1,
+            max_tokens=max_tokens,
+        )
+        return clean_sql(response.choices[0].message.content)
+
+    return generate
+
+
+def make_mock_generator(items, latency=0.5, fallback_sql="SELECT COUNT(*) FROM customers"):
+    """
+    Offline stand-in for the LLM: answers each question with its expected_sql
+    after a random delay of up to `latency` seconds.
+    """
+    answers = {item['question']: item.get('expected_sql') or fallback_sql for item in items}
+
+    async def generate(question):
+        await asyncio.sleep(random.uniform(0, latency))
+        return answers.get(question, fallback_sql)
+
+    return generate
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run a JSONL file of questions through text-to-SQL concurrently")
+    parser.add_argument("input", help="JSONL file with one {'id', 'question', 'expected_sql'} record per line")
+    parser.add_argument("--output", default="batch_results.jsonl", help="JSONL file for per-question results")
+    parser.add_argument("--db", default="sample_database.sqlite", help="SQLite database to query")
+    parser.add_argument("--concurrency", type=int, default=8, help="Questions in flight at once")
+    parser.add_argument("--rpm", type=float, default=None, help="LLM requests per minute")
+    parser.add_argument("--tpm", type=float, default=None, help="LLM tokens per minute")
+    parser.add_argument("--workers", type=int, default=4, help="Threads executing SQL")
+    parser.add_argument("--max-rows", type=int, default=20, help="Rows kept per question in the output")
+    parser.add_argument("--resume", action="store_true", help="Skip questions already in --output")
+    parser.add_argument("--mock", action="store_true", help="Use a mocked LLM that answers with expected_sql")
+    parser.add_argument("--mock-latency", type=float, default=0.5, help="Maximum mocked LLM latency in seconds")
+    args = parser.parse_args()
+
+    items = load_questions(args.input)
+    engine = SQLEngine(args.db, pool_size=args.workers)
+    schema_text = SchemaCatalog(args.db, sample_rows=0).describe()
+    max_tokens = 200
+
+    if args.mock:
+        generate = make_mock_generator(items, latency=args.mock_latency)
+    else:
+        generate = make_llm_generator(schema_text, max_tokens=max_tokens)
+
+    runner = BatchRunner(
+        generate,
+        lambda sql: engine.execute(sql, max_rows=10000),
+        concurrency=args.concurrency,
+        requests_per_minute=args.rpm,
+        tokens_per_minute=args.tpm,
+        estimate_tokens=lambda question: (len(schema_text) + len(question)) // 4 + max_tokens,
+        execution_workers=args.workers,
+        max_rows=args.max_rows,
+    )
+
+    def progress(record):
+        status = "ok" if record['success'] else "error"
+        if 'match' in record:
+            status += ", match" if record['match'] else ", MISMATCH"
+        print(f"[{record['id']}] {record['total_ms']:>8.1f} ms  {status}  {record['question']}")
+
+    summary = asyncio.run(runner.run(items, output_path=args.output, resume=args.resume, on_record=progress))
+    print("\nSummary")
+    print("-" * 60)
+    for key, value in summary.items():
+        print(f"{key:<22} {value}")
+    print(f"\nResults written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
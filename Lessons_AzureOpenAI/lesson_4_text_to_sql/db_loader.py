@@ -0,0 +1,279 @@
+"""
+Bulk CSV -> SQLite Loader
+
+Building the lesson database with pd.read_csv + DataFrame.to_sql loads every
+CSV fully into memory and produces untyped tables with no primary keys,
+foreign keys or indexes, so every join scans or builds a temporary index.
+
+This loader:
+
+- creates each table with declared types, a PRIMARY KEY and the FOREIGN KEY
+  relationships of the e-commerce schema (customers <- orders <- order_items -> products,
+  reviews -> customers/products)
+- streams each CSV in chunks with the csv module into executemany(), inside one
+  transaction, with journal_mode=OFF and synchronous=OFF while loading
+- builds the indexes afterwards (faster than maintaining them row by row) and runs ANALYZE
+- remembers the size and modification time of every CSV in a manifest next to the
+  database, and on the next run only reloads the tables whose CSV changed
+
+Usage:
+    from db_loader import load_database
+    loaded = load_database('.', 'sample_database.sqlite')   # ['customers', 'orders', ...]
+
+    python db_loader.py --csv-dir . --db sample_database.sqlite [--force]
+"""
+
+import argparse
+import csv
+import json
+import os
+import sqlite3
+import sys
+import time
+from itertools import islice
+
+# Column types, keys and indexes of the sample e-commerce tables.
+# Columns not listed here (e.g. added to the CSVs later) are loaded as TEXT.
+TABLES = {
+    'customers': {
+        'columns': {
+            'customer_id': 'TEXT', 'first_name': 'TEXT', 'last_name': 'TEXT', 'email': 'TEXT',
+            'phone': 'TEXT', 'date_of_birth': 'DATE', 'address': 'TEXT', 'city': 'TEXT',
+            'state': 'TEXT', 'country': 'TEXT', 'registration_date': 'DATE',
+            'customer_status': 'TEXT', 'total_spent': 'REAL',
+        },
+        'primary_key': 'customer_id',
+        'foreign_keys': {},
+        'indexes': [('state',)],
+    },
+    'products': {
+        'columns': {
+            'product_id': 'TEXT', 'product_name': 'TEXT', 'category': 'TEXT', 'price': 'REAL',
+            'cost': 'REAL', 'stock_quantity': 'INTEGER', 'supplier': 'TEXT', 'description': 'TEXT',
+            'created_date': 'DATE', 'is_active': 'BOOLEAN',
+        },
+        'primary_key': 'product_id',
+        'foreign_keys': {},
+        'indexes': [('category',)],
+    },
+    'orders': {
+        'columns': {
+            'order_id': 'TEXT', 'customer_id': 'TEXT', 'order_date': 'DATE', 'status': 'TEXT',
+            'total_amount': 'REAL', 'shipping_address': 'TEXT', 'payment_method': 'TEXT',
+        },
+        'primary_key': 'order_id',
+        'foreign_keys': {'customer_id': ('customers', 'customer_id')},
+        'indexes': [('customer_id',), ('order_date',)],
+    },
+    'order_items': {
+        'columns': {
+            'item_id': 'TEXT', 'order_id': 'TEXT', 'product_id': 'TEXT', 'quantity': 'INTEGER',
+            'unit_price': 'REAL', 'total_price': 'REAL',
+        },
+        'primary_key': 'item_id',
+        'foreign_keys': {'order_id': ('orders', 'order_id'), 'product_id': ('products', 'product_id')},
+        'indexes': [('order_id',), ('product_id',)],
+    },
+    'reviews': {
+        'columns': {
+            'review_id': 'TEXT', 'customer_id': 'TEXT', 'product_id': 'TEXT', 'rating': 'INTEGER',
+            'review_text': 'TEXT', 'review_date': 'DATE', 'helpful_votes': 'INTEGER',
+        },
+        'primary_key': 'review_id',
+        'foreign_keys': {'customer_id': ('customers', 'customer_id'), 'product_id': ('products', 'product_id')},
+        'indexes': [('product_id',), ('customer_id',)],
+    },
+}
+
+_BOOLEANS = {'true': 1, 'false': 0, '1': 1, '0': 0}
+
+
+def create_table_sql(table, columns):
+    """CREATE TABLE statement for `table` with the given column order."""
+    spec = TABLES.get(table, {})
+    types = spec.get('columns', {})
+    lines = []
+    for column in columns:
+        line = f'"{column}" {types.get(column, "TEXT")}'
+        if column == spec.get('primary_key'):
+            line += ' PRIMARY KEY'
+        lines.append(line)
+    for column, (ref_table, ref_column) in spec.get('foreign_keys', {}).items():
+        if column in columns:
+            lines.append(f'FOREIGN KEY ("{column}") REFERENCES "{ref_table}" ("{ref_column}")')
+    return f'CREATE TABLE "{table}" (\n    ' + ',\n    '.join(lines) + '\n)'
+
+
+def create_indexes(conn, table):
+    """Create the secondary indexes of a table (foreign keys and common filters)."""
+    existing = {row[1] for row in conn.execute(f'PRAGMA table_info("{table}")')}
+    for columns in TABLES.get(table, {}).get('indexes', []):
+        if set(columns) <= existing:
+            name = f'idx_{table}_' + '_'.join(columns)
+            cols = ', '.join(f'"{c}"' for c in columns)
+            conn.execute(f'CREATE INDEX IF NOT EXISTS "{name}" ON "{table}" ({cols})')
+
+
+def _converters(table, columns):
+    """Per-column conversion of CSV strings: '' -> NULL for typed columns, True/False -> 1/0."""
+    types = TABLES.get(table, {}).get('columns', {})
+    converters = []
+    for column in columns:
+        declared = types.get(column, 'TEXT')
+        if declared == 'BOOLEAN':
+            converters.append(lambda v: _BOOLEANS.get(v.lower(), v) if v else None)
+        elif declared == 'TEXT':
+            converters.append(None)
+        else:
+            # INTEGER / REAL / DATE affinity converts numeric strings itself
+            converters.append(lambda v: v if v != '' else None)
+    return converters
+
+
+def _read_rows(path, table, chunk_size):
+    """Yield (columns, chunk of row tuples) from a CSV, chunk_size rows at a time."""
+    with open(path, newline='', encoding='utf-8') as f:
+        reader = csv.reader(f)
+        columns = next(reader)
+        converters = _converters(table, columns)
+        convert = [(i, fn) for i, fn in enumerate(converters) if fn is not None]
+        while True:
+            chunk = list(islice(reader, chunk_size))
+            if not chunk:
+                return
+            if convert:
+                for row in chunk:
+                    for i, fn in convert:
+                        row[i] = fn(row[i])
+            yield columns, chunk
+
+
+def _file_signature(path):
+    stat = os.stat(path)
+    return {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns}
+
+
+def _manifest_path(db_path):
+    return db_path + '.manifest.json'
+
+
+def _read_manifest(db_path):
+    if not os.path.exists(db_path):
+        return {}
+    try:
+        with open(_manifest_path(db_path)) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def load_table(conn, table, csv_path, chunk_size=50_000):
+    """Drop and reload one table from its CSV. Returns the number of rows loaded."""
+    conn.execute(f'DROP TABLE IF EXISTS "{table}"')
+    rows = 0
+    created = False
+    for columns, chunk in _read_rows(csv_path, table, chunk_size):
+        if not created:
+            conn.execute(create_table_sql(table, columns))
+            names = ', '.join(f'"{c}"' for c in columns)
+            placeholders = ', '.join('?' * len(columns))
+            insert = f'INSERT INTO "{table}" ({names}) VALUES ({placeholders})'
+            created = True
+        conn.executemany(insert, chunk)
+        rows += len(chunk)
+    if not created:
+        raise ValueError(f"{csv_path} is empty")
+    create_indexes(conn, table)
+    return rows
+
+
+def load_database(csv_dir, db_path='sample_database.sqlite', tables=None, chunk_size=50_000,
+                  force=False, verbose=True):
+    """
+    Build or update the SQLite database from the CSV files in csv_dir.
+
+    Args:
+        csv_dir: Directory holding <table>.csv files
+        db_path: SQLite database to create or update
+        tables: Tables to load (defaults to every table in TABLES with a CSV)
+        chunk_size: Rows read from a CSV and inserted per executemany() call
+        force: Reload every table even if its CSV is unchanged
+
+    Returns:
+        list: the tables that were (re)loaded
+
+    Raises:
+        FileNotFoundError: if csv_dir holds none of the table CSVs
+    """
+    tables = tables or [t for t in TABLES if os.path.exists(os.path.join(csv_dir, f'{t}.csv'))]
+    if not tables:
+        names = ', '.join(f'{t}.csv' for t in TABLES)
+        raise FileNotFoundError(f"None of {names} found in {os.path.abspath(csv_dir)}; "
+                                "generate them with create_dummy_data.py")
+    manifest = {} if force else _read_manifest(db_path)
+
+    changed = []
+    for table in tables:
+        signature = _file_signature(os.path.join(csv_dir, f'{table}.csv'))
+        if manifest.get(table) != signature:
+            changed.append((table, signature))
+    if not changed:
+        if verbose:
+            print(f"{db_path} is up to date")
+        return []
+
+    conn = sqlite3.connect(db_path, isolation_level=None)
+    try:
+        # Nothing needs to survive a crash mid-load: the manifest is only written on
+        # success, so the next run simply reloads these tables again
+        conn.execute("PRAGMA journal_mode = OFF")
+        conn.execute("PRAGMA synchronous = OFF")
+        conn.execute("PRAGMA cache_size = -262144")  # 256 MB
+        conn.execute("PRAGMA temp_store = MEMORY")
+        conn.execute("PRAGMA foreign_keys = OFF")
+
+        conn.execute("BEGIN")
+        for table, signature in changed:
+            started = time.perf_counter()
+            rows = load_table(conn, table, os.path.join(csv_dir, f'{table}.csv'), chunk_size)
+            if verbose:
+                print(f"Loaded {table}: {rows:,} rows in {time.perf_counter() - started:.2f}s")
+        conn.execute("COMMIT")
+
+        for table, _ in changed:
+            conn.execute(f'ANALYZE "{table}"')
+    except Exception:
+        conn.close()
+        # With journal_mode=OFF a failed load cannot be rolled back: start over next time
+        for path in (db_path, _manifest_path(db_path)):
+            if os.path.exists(path):
+                os.remove(path)
+        raise
+    conn.close()
+
+    manifest.update({table: signature for table, signature in changed})
+    with open(_manifest_path(db_path), 'w') as f:
+        json.dump(manifest, f, indent=2)
+    return [table for table, _ in changed]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load the lesson CSV files into SQLite")
+    parser.add_argument('--csv-dir', default='.', help="Directory with the <table>.csv files")
+    parser.add_argument('--db', default='sample_database.sqlite', help="SQLite database to build")
+    parser.add_argument('--chunk-size', type=int, default=50_000)
+    parser.add_argument('--force', action='store_true', help="Reload every table")
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    try:
+        loaded = load_database(args.csv_dir, args.db, chunk_size=args.chunk_size, force=args.force)
+    except (OSError, ValueError, sqlite3.Error) as e:
+        print(f"Error: {e}")
+        sys.exit(1)
+    if loaded:
+        print(f"Rebuilt {', '.join(loaded)} in {time.perf_counter() - started:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
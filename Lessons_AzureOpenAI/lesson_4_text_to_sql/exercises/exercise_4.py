@@ -6,22 +6,25 @@ Complete these exercises to practice building text-to-SQL systems.
 
 import sqlite3
 import os
+import sys
 import json
-from openai import AzureOpenAI
 from dotenv import load_dotenv
 
+# Make the lesson's helper modules importable
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+# ... and the shared modules of the track (shared/llm_client.py, ...)
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+from shared.llm_client import get_client
+from schema_catalog import SchemaCatalog
+from sql_validator import SQLValidator
+from query_guard import QueryGuard
+
 # Load environment variables
 load_dotenv()
 
-# Initialize OpenAI client  
-client = AzureOpenAI(
-    api_key=os.environ.get("AZURE_OPENAI_KEY"),
-    azure_endpoint=os.environ.get("AZURE_OPENAI_ENDPOINT"),
-    azure_deployment=os.environ.get("AZURE_OPENAI_DEPLOYMENT_NAME"),
-    api_version=os.environ.get("AZURE_OPENAI_VERSION"),
-)
-
-MODEL = os.environ.get("AZURE_OPENAI_MODEL")
+# Shared client of the track (OpenAI or Azure OpenAI, from the environment):
+# pooled connections, retries with backoff on 429/5xx, identical requests coalesced
+client = get_client()
 
 # Exercise 1: Implement Enhanced Schema Description
 def get_enhanced_schema():
@@ -38,20 +41,28 @@ def get_enhanced_schema():
     pass
 
 # Exercise 2: Implement Query Validation
+schema_catalog = SchemaCatalog('sample_database.sqlite')
+sql_validator = SQLValidator(catalog=schema_catalog, max_rows=50)
+
 def validate_sql_query(sql_query):
     """
-    TODO: Implement SQL query validation that checks for:
+    SQL query validation that checks for:
     - Only SELECT statements allowed
     - No dangerous keywords (DROP, DELETE, etc.)
     - Proper LIMIT clauses
     - Valid table and column names
     
     Return dict with 'is_valid' boolean and 'issues' list.
+
+    Solved with SQLValidator from sql_validator.py: it tokenizes the query so that
+    keywords, identifiers and string literals are not confused (created_date is not
+    CREATE), and adds a LIMIT when one is missing (see the 'sql' key).
     """
-    # Your code here
-    pass
+    return sql_validator.validate(sql_query)
 
 # Exercise 3: Implement Query Optimization Suggestions
+query_guard = QueryGuard('sample_database.sqlite', catalog=schema_catalog, on_expensive='warn')
+
 def suggest_query_optimizations(sql_query):
     """
     TODO: Analyze SQL query and suggest optimizations:
@@ -61,9 +72,12 @@ def suggest_query_optimizations(sql_query):
     - Performance warnings
     
     Return dict with optimization suggestions.
+
+    Solved with QueryGuard from query_guard.py: it reads the EXPLAIN QUERY PLAN,
+    estimates the rows visited, warns about full scans, nested loops and temporary
+    indexes, and suggests CREATE INDEX statements (see 'suggested_indexes').
     """
-    # Your code here
-    pass
+    return query_guard.check(sql_query)
 
 # Exercise 4: Implement Multi-Step Query Planning
 def plan_complex_query(natural_language_query):
@@ -218,6 +232,8 @@ def bonus_challenge_1():
     - Handles cache invalidation
     - Provides cache hit/miss statistics
     - Optimizes cache storage
+
+    Compare your design with QueryCache in query_cache.py when you are done.
     """
     pass
 
@@ -230,6 +246,8 @@ def bonus_challenge_2():
     - Suggests existing results for similar questions
     - Groups related queries
     - Provides query recommendations
+
+    Hint: QueryCache(embed_fn=...) in query_cache.py reuses SQL for paraphrased questions.
     """
     pass
 
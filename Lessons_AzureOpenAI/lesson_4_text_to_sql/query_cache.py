@@ -0,0 +1,342 @@
+"""
+Two-Tier Query Cache for Text-to-SQL
+
+Most questions asked of a text-to-SQL system are repeats, and every repeat pays
+for an LLM round-trip plus a database query. The QueryCache sits in front of
+both steps:
+
+- Tier 1: normalised question -> generated SQL (optionally also matching
+  questions that are worded differently but mean the same, via embeddings)
+- Tier 2: SQL fingerprint -> query result, keyed on the database version so a
+  result is never served after the data it was computed from has changed
+
+Both tiers use LRU eviction with an optional TTL, and hit/miss/latency
+statistics are kept per tier.
+
+Usage:
+    catalog = SchemaCatalog('sample_database.sqlite')
+    cache = QueryCache(version_fn=catalog.get_version)
+
+    sql = cache.get_sql_or_generate(question, text_to_sql)
+    result = cache.get_result_or_execute(sql, execute_query)
+    print(cache.stats())
+
+    # Also match paraphrased questions (embed_fn: list of texts -> list of vectors)
+    cache = QueryCache(version_fn=catalog.get_version, embed_fn=embed_texts)
+"""
+
+import hashlib
+import re
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+
+def normalize_question(question):
+    """Lowercase, collapse whitespace and drop punctuation that does not change the meaning."""
+    question = question.lower().strip()
+    question = re.sub(r"[?!.,;:]+(\s|$)", r"\1", question)
+    return " ".join(question.split())
+
+
+_SQL_TOKEN = re.compile(
+    r"""('(?:[^']|'')*')"""      # string literal, kept as-is
+    r"""|("(?:[^"]|"")*")"""     # quoted identifier, kept as-is
+    r"""|(--[^\n]*|/\*.*?\*/)"""  # comment, dropped
+    r"""|(\s+)"""                 # whitespace, collapsed
+    r"""|([^'"\s-]+|-)""",       # anything else, lowercased
+    re.DOTALL,
+)
+
+
+def sql_fingerprint(sql):
+    """
+    Hash of a SQL statement that ignores case, whitespace, comments and trailing semicolons.
+
+    String literals keep their case, so WHERE state = 'CA' and WHERE state = 'ca'
+    get different fingerprints.
+    """
+    parts = []
+    for literal, quoted, comment, space, other in _SQL_TOKEN.findall(sql):
+        if literal or quoted:
+            parts.append(literal or quoted)
+        elif space or comment:
+            parts.append(" ")
+        else:
+            parts.append(other.lower())
+    normalized = " ".join("".join(parts).split()).rstrip("; ")
+    return hashlib.sha1(normalized.encode("utf-8")).hexdigest()
+
+
+def _question_literals(question):
+    """
+    Values a similar-looking question must share before its SQL can be reused.
+
+    "Customers from California" and "Customers from Texas" embed almost
+    identically but need different SQL, so numbers, quoted strings and
+    capitalised words (other than the first word) have to match exactly.
+    """
+    words = question.split()
+    literals = set(re.findall(r"\d+(?:\.\d+)?", question))
+    literals.update(q.lower() for q in re.findall(r"['\"]([^'\"]+)['\"]", question))
+    literals.update(w.strip("?!.,;:'\"").lower() for w in words[1:] if w[:1].isupper())
+    return frozenset(literals)
+
+
+class LRUCache:
+    """Thread-safe LRU cache with an optional time-to-live per entry."""
+
+    def __init__(self, max_size=1024, ttl=None):
+        """
+        Args:
+            max_size: Maximum number of entries before the least recently used is evicted
+            ttl: Seconds an entry stays valid (None for no expiry)
+        """
+        self.max_size = max_size
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self.evictions = 0
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return default
+            value, expires = entry
+            if expires is not None and expires < time.monotonic():
+                del self._data[key]
+                return default
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        """Store a value and return the list of keys evicted to make room."""
+        expires = time.monotonic() + self.ttl if self.ttl else None
+        evicted = []
+        with self._lock:
+            self._data[key] = (value, expires)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_size:
+                evicted.append(self._data.popitem(last=False)[0])
+                self.evictions += 1
+        return evicted
+
+    def pop(self, key, default=None):
+        with self._lock:
+            entry = self._data.pop(key, None)
+            return default if entry is None else entry[0]
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+    def __contains__(self, key):
+        return self.get(key) is not None
+
+
+class CacheStats:
+    """Hit/miss counts and latencies for one cache tier."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.hit_seconds = 0.0
+        self.miss_seconds = 0.0
+
+    def record(self, hit, seconds):
+        with self._lock:
+            if hit:
+                self.hits += 1
+                self.hit_seconds += seconds
+            else:
+                self.misses += 1
+                self.miss_seconds += seconds
+
+    def as_dict(self):
+        lookups = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / lookups if lookups else 0.0,
+            'avg_hit_ms': 1000 * self.hit_seconds / self.hits if self.hits else 0.0,
+            'avg_miss_ms': 1000 * self.miss_seconds / self.misses if self.misses else 0.0,
+        }
+
+
+class QueryCache:
+    """Question -> SQL and SQL -> result caches for a text-to-SQL pipeline."""
+
+    def __init__(self, version_fn=None, sql_cache_size=1024, result_cache_size=256,
+                 sql_ttl=24 * 3600, result_ttl=None, embed_fn=None, similarity_threshold=0.92):
+        """
+        Args:
+            version_fn: Callable returning the current database version, e.g.
+                        SchemaCatalog.get_version. Results are only reused for the same version.
+            sql_cache_size: Maximum number of cached question -> SQL entries
+            result_cache_size: Maximum number of cached results
+            sql_ttl: Seconds a generated SQL query is reused (None for no expiry)
+            result_ttl: Seconds a result is reused, on top of the version check
+            embed_fn: Optional callable mapping a list of texts to a list of vectors,
+                      used to match paraphrased questions
+            similarity_threshold: Minimum cosine similarity for a paraphrase match
+        """
+        self.version_fn = version_fn
+        self.embed_fn = embed_fn
+        self.similarity_threshold = similarity_threshold
+
+        self.sql_cache = LRUCache(sql_cache_size, sql_ttl)
+        self.result_cache = LRUCache(result_cache_size, result_ttl)
+        self.sql_stats = CacheStats()
+        self.result_stats = CacheStats()
+        self.similar_hits = 0
+
+        # Embeddings of the cached questions, for the similarity lookup
+        self._lock = threading.Lock()
+        self._keys = []
+        self._vectors = []
+        self._literals = []
+        self._matrix = None
+        # Vectors of questions that just missed, so put_sql() does not embed them again
+        self._miss_vectors = LRUCache(max_size=64)
+
+    # ------------------------------------------------------------------
+    # Tier 1: question -> SQL
+    # ------------------------------------------------------------------
+
+    def _embed(self, text):
+        vector = np.asarray(self.embed_fn([text])[0], dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def _find_similar(self, question, vector):
+        with self._lock:
+            if not self._keys:
+                return None
+            if self._matrix is None:
+                self._matrix = np.vstack(self._vectors)
+            similarities = self._matrix @ vector
+            keys = list(self._keys)
+            cached_literals = list(self._literals)
+
+        literals = _question_literals(question)
+        for i in np.argsort(-similarities):
+            if similarities[i] < self.similarity_threshold:
+                break
+            if cached_literals[i] != literals:
+                continue
+            sql = self.sql_cache.get(keys[i])
+            if sql is not None:
+                return sql
+        return None
+
+    def _forget(self, keys):
+        with self._lock:
+            for key in keys:
+                if key in self._keys:
+                    i = self._keys.index(key)
+                    del self._keys[i]
+                    del self._vectors[i]
+                    del self._literals[i]
+                    self._matrix = None
+
+    def get_sql(self, question):
+        """Return cached SQL for the question (or a paraphrase of it), or None."""
+        key = normalize_question(question)
+        sql = self.sql_cache.get(key)
+        if sql is None and self.embed_fn is not None:
+            vector = self._embed(key)
+            self._miss_vectors.set(key, vector)
+            sql = self._find_similar(question, vector)
+            if sql is not None:
+                self.similar_hits += 1
+        return sql
+
+    def put_sql(self, question, sql):
+        key = normalize_question(question)
+        evicted = self.sql_cache.set(key, sql)
+        if self.embed_fn is not None:
+            self._forget(evicted + [key])
+            vector = self._miss_vectors.pop(key)
+            if vector is None:
+                vector = self._embed(key)
+            with self._lock:
+                self._keys.append(key)
+                self._vectors.append(vector)
+                self._literals.append(_question_literals(question))
+                self._matrix = None
+
+    def get_sql_or_generate(self, question, generate_fn):
+        """Return the SQL for a question, calling generate_fn(question) only on a cache miss."""
+        started = time.perf_counter()
+        sql = self.get_sql(question)
+        if sql is not None:
+            self.sql_stats.record(True, time.perf_counter() - started)
+            return sql
+
+        sql = generate_fn(question)
+        if sql:
+            self.put_sql(question, sql)
+        self.sql_stats.record(False, time.perf_counter() - started)
+        return sql
+
+    # ------------------------------------------------------------------
+    # Tier 2: SQL -> result
+    # ------------------------------------------------------------------
+
+    def _result_key(self, sql, args):
+        version = self.version_fn() if self.version_fn is not None else None
+        return sql_fingerprint(sql), args, version
+
+    def get_result(self, sql, *args):
+        return self.result_cache.get(self._result_key(sql, args))
+
+    def put_result(self, sql, result, *args):
+        self.result_cache.set(self._result_key(sql, args), result)
+
+    def get_result_or_execute(self, sql, execute_fn, *args):
+        """
+        Return the result of a query, calling execute_fn(sql, *args) only on a cache miss.
+
+        Extra args (e.g. a row limit) are passed through and are part of the cache key.
+
+        Only successful results (result['success'] is true) are cached. The
+        returned result is shared with the cache, treat it as read-only.
+        """
+        started = time.perf_counter()
+        key = self._result_key(sql, args)
+        result = self.result_cache.get(key)
+        if result is not None:
+            self.result_stats.record(True, time.perf_counter() - started)
+            return result
+
+        result = execute_fn(sql, *args)
+        if not isinstance(result, dict) or result.get('success', True):
+            self.result_cache.set(key, result)
+        self.result_stats.record(False, time.perf_counter() - started)
+        return result
+
+    # ------------------------------------------------------------------
+    # Housekeeping
+    # ------------------------------------------------------------------
+
+    def clear(self):
+        self.sql_cache.clear()
+        self.result_cache.clear()
+        with self._lock:
+            self._keys, self._vectors, self._literals, self._matrix = [], [], [], None
+
+    def stats(self):
+        """Hit/miss counts, hit rates and average latencies for both tiers."""
+        return {
+            'sql': dict(self.sql_stats.as_dict(), size=len(self.sql_cache),
+                        evictions=self.sql_cache.evictions, similar_hits=self.similar_hits),
+            'result': dict(self.result_stats.as_dict(), size=len(self.result_cache),
+                           evictions=self.result_cache.evictions),
+        }
@@ -0,0 +1,588 @@
+"""
+Query Cost Guard and Index Advisor
+
+A generated query can be valid and still expensive. db_loader gives the lesson
+database primary keys and indexes on the foreign keys and common filters, but a
+query that filters or joins on any other column scans the whole table or makes
+SQLite build a temporary index for that one query (and a database created with
+DataFrame.to_sql has no indexes at all). The QueryGuard runs EXPLAIN QUERY PLAN
+on each query before it executes and:
+
+- estimates how many rows the plan visits (table sizes from sqlite_stat1, or rowid ranges),
+  up to the LIMIT when the plan returns rows as it finds them
+- flags full scans of large tables, nested-loop joins that rescan a table, and
+  automatic (temporary) indexes, which mean a permanent index is missing
+- rejects queries whose estimated cost is above a threshold, or first creates the
+  missing indexes and re-plans them (on_expensive='index')
+- records which columns are filtered and joined on, and recommends (or creates)
+  covering indexes for the patterns that keep recurring
+
+Usage:
+    guard = QueryGuard('sample_database.sqlite', catalog=schema_catalog, max_cost=5_000_000)
+    check = guard.check(sql)
+    if not check['ok']:
+        print(check['reason'])
+
+    for index in guard.recommend_indexes():
+        print(index['sql'], index['queries'])
+    guard.create_recommended_indexes()
+"""
+
+import math
+import os
+import re
+import sqlite3
+import threading
+from collections import Counter, defaultdict
+
+from query_cache import LRUCache
+from sql_validator import KEYWORDS, tokenize
+
+
+_PLAN_LOOP = re.compile(
+    r"^(?P<op>SCAN|SEARCH) (?P<name>\S+)(?: AS \S+)?"
+    r"(?: USING (?P<using>.*?))?(?: \((?P<terms>.*)\))?$"
+)
+_TERM = re.compile(r"(\w+)\s*(=|>|<|>=|<=)\s*\?")
+
+_COMPARISON = {'=': 'eq', '==': 'eq', 'IN': 'eq', 'IS': 'eq',
+               '<': 'range', '>': 'range', '<=': 'range', '>=': 'range', 'BETWEEN': 'range'}
+
+_CLAUSE_END = frozenset(["WHERE", "GROUP", "HAVING", "ORDER", "LIMIT", "WINDOW", "UNION",
+                         "EXCEPT", "INTERSECT", "ON", "USING", "SELECT"])
+
+# A query with any of these reads every matching row before it returns the first one
+_AGGREGATES = frozenset(["COUNT", "SUM", "AVG", "MIN", "MAX", "TOTAL", "GROUP_CONCAT", "STRING_AGG"])
+_UNBOUNDED = frozenset(["GROUP", "DISTINCT", "OVER", "WINDOW", "UNION", "EXCEPT", "INTERSECT"])
+
+# SELECT COUNT(*) FROM table counts the entries of each b-tree page instead of reading rows
+_ENTRIES_PER_PAGE = 100
+
+
+def _table_aliases(tokens, tables):
+    """Map each alias (and table name) used in FROM/JOIN clauses to its table."""
+    aliases = {}
+    in_from = False
+    i = 0
+    while i < len(tokens):
+        kind, text = tokens[i][0], tokens[i][1]
+        upper = text.upper()
+        if upper in ('FROM', 'JOIN') or (text == ',' and in_from):
+            in_from = True
+            if i + 1 < len(tokens) and tokens[i + 1][0] in ('name', 'quoted'):
+                table = tokens[i + 1][1].strip('"`[]').lower()
+                if table in tables:
+                    aliases[table] = table
+                    j = i + 2
+                    if j < len(tokens) and tokens[j][1].upper() == 'AS':
+                        j += 1
+                    if j < len(tokens) and tokens[j][0] in ('name', 'quoted') and tokens[j][1].upper() not in KEYWORDS:
+                        aliases[tokens[j][1].strip('"`[]').lower()] = table
+        elif kind == 'name' and upper in _CLAUSE_END:
+            in_from = False
+        i += 1
+    return aliases
+
+
+def _row_limit(tokens):
+    """
+    Number of rows after which a query stops: its top-level LIMIT plus OFFSET.
+
+    None when there is no literal LIMIT, or when the query has to read every
+    row before it returns the first (aggregates, GROUP BY, DISTINCT, window
+    functions, compound queries).
+    """
+    depth, limit = 0, None
+    for i, (kind, text, _, _) in enumerate(tokens):
+        upper = text.upper()
+        if text == '(':
+            depth += 1
+        elif text == ')':
+            depth -= 1
+        elif kind != 'name':
+            continue
+        elif upper in _UNBOUNDED:
+            return None
+        elif upper in _AGGREGATES and i + 1 < len(tokens) and tokens[i + 1][1] == '(':
+            return None
+        elif upper == 'LIMIT' and depth == 0:
+            limit = i
+    if limit is None:
+        return None
+
+    # LIMIT count [OFFSET n]  or  LIMIT offset, count
+    numbers = []
+    for kind, text, _, _ in tokens[limit + 1:limit + 4]:
+        if kind == 'number':
+            numbers.append(text)
+        elif text != ',' and text.upper() != 'OFFSET':
+            break
+    try:
+        return sum(int(float(n)) for n in numbers) if numbers else None
+    except ValueError:
+        return None
+
+
+def extract_predicates(sql, tables):
+    """
+    Find the columns a query filters or joins on.
+
+    Args:
+        sql: The query
+        tables: {table: set of columns} for the database (lowercase)
+
+    Returns:
+        tuple: (predicates, referenced) where predicates is a list of
+               (table, column, 'eq' | 'range' | 'join') and referenced is
+               {table: set of columns} for every column the query mentions
+    """
+    tokens = tokenize(sql)
+    aliases = _table_aliases(tokens, tables)
+    used_tables = set(aliases.values())
+
+    def resolve(i):
+        """Resolve the column reference ending at tokens[i] to (table, column)."""
+        if tokens[i][0] not in ('name', 'quoted'):
+            return None
+        column = tokens[i][1].strip('"`[]').lower()
+        if i >= 2 and tokens[i - 1][1] == '.':
+            table = aliases.get(tokens[i - 2][1].strip('"`[]').lower())
+            return (table, column) if table and column in tables[table] else None
+        owners = [t for t in used_tables if column in tables[t]]
+        return (owners[0], column) if len(owners) == 1 else None
+
+    referenced = defaultdict(set)
+    predicates = []
+    for i, token in enumerate(tokens):
+        ref = resolve(i)
+        if ref and not (i + 1 < len(tokens) and tokens[i + 1][1] == '.'):
+            referenced[ref[0]].add(ref[1])
+
+        op = token[1].upper()
+        if op not in _COMPARISON or i == 0 or tokens[i - 1][1].upper() == 'NOT':
+            continue
+        kind = _COMPARISON[op]
+        left = resolve(i - 1)
+        right = resolve(i + 1) if i + 1 < len(tokens) and op not in ('IN', 'BETWEEN') else None
+        if i + 3 < len(tokens) and tokens[i + 2][1] == '.':
+            right = resolve(i + 3)
+        if left and right and kind == 'eq':
+            kind = 'join'  # column = column
+        for ref in (left, right):
+            if ref:
+                predicates.append((ref[0], ref[1], kind))
+    return predicates, referenced
+
+
+def _is_key_column(table, columns):
+    """True for lookups that include a table's own id column (orders.order_id), which match one row."""
+    singular = table[:-1] if table.endswith('s') else table
+    return any(column in ('id', f'{singular}_id') for column in columns)
+
+
+class QueryGuard:
+    """EXPLAIN QUERY PLAN based cost check and index advisor."""
+
+    def __init__(self, db_path, catalog=None, max_cost=5_000_000, large_table_rows=10_000,
+                 on_expensive='reject', auto_create_indexes=False, min_occurrences=3,
+                 max_index_columns=4, cache_size=1024):
+        """
+        Args:
+            db_path: Path to the SQLite database
+            catalog: SchemaCatalog for the database (its version keys the plan cache)
+            max_cost: Highest estimated number of row visits allowed for a query
+            large_table_rows: Tables with at least this many rows are reported when fully scanned
+            on_expensive: 'reject' to refuse expensive queries, 'index' to create the
+                          missing indexes and re-plan first, 'warn' to only report them
+            auto_create_indexes: Create recommended indexes once their pattern was seen
+                                 min_occurrences times
+            min_occurrences: How often a filter/join pattern must recur before it is recommended
+            max_index_columns: Maximum columns in a recommended (covering) index
+            cache_size: Number of plans to keep
+        """
+        if on_expensive not in ('reject', 'index', 'warn'):
+            raise ValueError("on_expensive must be 'reject', 'index' or 'warn'")
+        self.db_path = db_path
+        self.catalog = catalog
+        self.max_cost = max_cost
+        self.large_table_rows = large_table_rows
+        self.on_expensive = on_expensive
+        self.auto_create_indexes = auto_create_indexes
+        self.min_occurrences = min_occurrences
+        self.max_index_columns = max_index_columns
+
+        self._lock = threading.Lock()
+        self._cache = LRUCache(cache_size)
+        self._stats = None          # (version, table rows, index stats, existing indexes)
+        self.patterns = Counter()   # (table, key columns, covering columns) -> occurrences
+        self.pattern_cost = Counter()
+        self.created_indexes = []
+
+    # ------------------------------------------------------------------
+    # Database access
+    # ------------------------------------------------------------------
+
+    def _connect(self):
+        # A fresh connection per check: a long-lived one keeps returning plans
+        # prepared before another connection created an index
+        uri = f"file:{os.path.abspath(self.db_path)}?mode=ro"
+        return sqlite3.connect(uri, uri=True)
+
+    def _version(self):
+        return self.catalog.get_version() if self.catalog is not None else None
+
+    def _load_stats(self, conn, version):
+        """Table sizes, index selectivity and existing indexes, reloaded when the database changes."""
+        if self._stats is not None and self._stats[0] == version:
+            return self._stats
+
+        def query(sql):
+            return conn.execute(sql).fetchall()
+
+        tables = [row[0] for row in query(
+            "SELECT name FROM sqlite_master WHERE type='table' AND name NOT LIKE 'sqlite_%'")]
+        columns = {t.lower(): {row[1].lower() for row in query(f'PRAGMA table_info("{t}")')} for t in tables}
+
+        rows, index_rows = {}, {}
+        has_stat1 = bool(query("SELECT 1 FROM sqlite_master WHERE name='sqlite_stat1'"))
+        if has_stat1:
+            for table, index, stat in query("SELECT tbl, idx, stat FROM sqlite_stat1"):
+                numbers = [int(x) for x in stat.split()[:8] if x.isdigit()]
+                if index is None or table.lower() not in rows:
+                    rows[table.lower()] = numbers[0] if numbers else 0
+                if index is not None:
+                    index_rows[index.lower()] = numbers[1:]
+        for table in tables:
+            if table.lower() not in rows:
+                # MAX(rowid) is answered from the b-tree in O(log n), unlike COUNT(*)
+                rows[table.lower()] = query(f'SELECT COALESCE(MAX(rowid), 0) FROM "{table}"')[0][0]
+
+        existing = defaultdict(list)
+        for table in tables:
+            for index in query(f'PRAGMA index_list("{table}")'):
+                cols = [row[2].lower() for row in query(f'PRAGMA index_info("{index[1]}")') if row[2]]
+                existing[table.lower()].append(cols)
+
+        self._stats = (version, rows, index_rows, existing, columns)
+        return self._stats
+
+    # ------------------------------------------------------------------
+    # Plan analysis
+    # ------------------------------------------------------------------
+
+    def explain(self, sql, conn=None):
+        """Return the EXPLAIN QUERY PLAN rows as (id, parent, detail)."""
+        own = conn is None
+        conn = self._connect() if own else conn
+        try:
+            return [(row[0], row[1], row[3]) for row in conn.execute(f"EXPLAIN QUERY PLAN {sql}")]
+        finally:
+            if own:
+                conn.close()
+
+    def _bounded(self, loops, aliases, predicates, limit):
+        """
+        True when the top-level loops stop as soon as the LIMIT is reached.
+
+        That needs a plan that is nothing but nested loops (no temporary b-tree
+        for ORDER BY or GROUP BY, no automatic index built up front) where every
+        filter on a table is answered by its index: a filter checked row by row
+        may reject most of the table before LIMIT rows are found.
+        """
+        if limit is None or not loops:
+            return False
+        for position, detail in enumerate(loops):
+            match = _PLAN_LOOP.match(detail)
+            if not match or 'AUTOMATIC' in (match.group('using') or ''):
+                return False
+            name = match.group('name').lower()
+            table = aliases.get(name, name)
+            served = {column.lower() for column, _ in _TERM.findall(match.group('terms') or '')}
+            if 'rowid' in served:
+                # An INTEGER PRIMARY KEY column is the rowid
+                served.update(c for t, c, _ in predicates if t == table and _is_key_column(table, [c]))
+            # The outermost loop's join columns are matched by the inner loops
+            kinds = ('eq', 'range') if position == 0 else ('eq', 'range', 'join')
+            if any(t == table and kind in kinds and column not in served for t, column, kind in predicates):
+                return False
+        return True
+
+    def _analyze_plan(self, plan, aliases, rows, index_rows, predicates=(), limit=None, counted=False):
+        """
+        Estimate the row visits of a plan.
+
+        Args:
+            plan: EXPLAIN QUERY PLAN rows as (id, parent, detail)
+            aliases: {alias: table} for the query
+            rows: {table: row count}
+            index_rows: {index: rows per distinct key prefix} from sqlite_stat1
+            predicates: (table, column, kind) filters and joins of the query
+            limit: rows after which the query stops (see _row_limit)
+            counted: True when SQLite answers COUNT(*) from the b-tree pages
+
+        Returns:
+            tuple: (cost, warnings, missing indexes, fully scanned tables)
+        """
+        children = defaultdict(list)
+        for node_id, parent, detail in plan:
+            children[parent].append((node_id, detail))
+
+        warnings, missing, full_scans = [], [], []
+        bounded = self._bounded([detail for _, detail in children.get(0, [])], aliases, predicates, limit)
+
+        def table_rows(name):
+            return rows.get(aliases.get(name.lower(), name.lower()), 1000)
+
+        def walk(parent, outer):
+            cost, loop_rows = 0.0, outer
+            for node_id, detail in children.get(parent, []):
+                match = _PLAN_LOOP.match(detail)
+                if match:
+                    name = match.group('name')
+                    table = aliases.get(name.lower(), name.lower())
+                    n = table_rows(name)
+                    using = match.group('using') or ''
+                    terms = _TERM.findall(match.group('terms') or '')
+                    if match.group('op') == 'SCAN':
+                        visited = out = n
+                        # The outermost scan of a bounded plan (in index order, when
+                        # the index serves the ORDER BY) stops after the first rows
+                        stops_early = bounded and parent == 0 and loop_rows == 1
+                        if counted:
+                            visited = math.ceil(n / _ENTRIES_PER_PAGE)
+                        elif n >= self.large_table_rows and not stops_early:
+                            warnings.append(f"Full scan of {table} ({n:,} rows)")
+                            full_scans.append(table)
+                        if loop_rows > 1 and n > 1:
+                            warnings.append(f"Nested loop rescans {table} ({n:,} rows) for each of "
+                                            f"~{int(loop_rows):,} outer rows")
+                    elif 'PRIMARY KEY' in using:
+                        visited = out = 1
+                    else:
+                        eq = [column for column, op in terms if op == '=']
+                        if 'AUTOMATIC' in using:
+                            # SQLite builds a temporary index for this query only
+                            cost += n * math.log2(max(n, 2))
+                            missing.append((table, eq))
+                            warnings.append(f"No index on {table}({', '.join(eq)}); "
+                                            "SQLite builds a temporary one for every run")
+                            per_key = 1 if _is_key_column(table, eq) else 10
+                        else:
+                            index_name = using.replace('COVERING INDEX', '').replace('INDEX', '').strip().lower()
+                            stats = index_rows.get(index_name)
+                            if stats and 0 < len(eq) <= len(stats):
+                                per_key = stats[len(eq) - 1]
+                            else:
+                                per_key = 1 if _is_key_column(table, eq) else 10
+                        if len(eq) < len(terms):
+                            per_key = max(per_key, n // 4)  # range condition
+                        visited = out = min(n, per_key)
+                    cost += loop_rows * visited
+                    loop_rows *= max(out, 1)
+                elif detail.startswith('USE TEMP B-TREE'):
+                    cost += loop_rows
+                elif detail.startswith('CORRELATED'):
+                    cost += loop_rows * walk(node_id, 1)[0]
+                else:
+                    # MATERIALIZE, CO-ROUTINE, LIST SUBQUERY, COMPOUND QUERY, ...
+                    cost += walk(node_id, 1)[0]
+            return cost, loop_rows
+
+        cost, out = walk(0, 1)
+        if bounded:
+            # Each output row costs cost / out visits, and only the first LIMIT rows are produced
+            cost *= min(1.0, limit / max(out, 1))
+        return cost, warnings, missing, full_scans
+
+    # ------------------------------------------------------------------
+    # Index advice
+    # ------------------------------------------------------------------
+
+    def _propose(self, predicates, referenced, columns, existing, full_scans, missing):
+        """Index proposals for the tables this query scans or joins without an index."""
+        proposals = []
+        automatic = {}
+        for table, eq in missing:
+            automatic.setdefault(table, eq)
+        for table in dict.fromkeys(list(automatic) + full_scans):
+            if table not in columns:
+                continue  # a CTE or subquery, not a real table
+            if automatic.get(table):
+                # The temporary index SQLite built is exactly the one that is missing
+                key = tuple(automatic[table])
+            else:
+                eq = list(dict.fromkeys(c for t, c, kind in predicates if t == table and kind == 'eq'))
+                ranges = [c for t, c, kind in predicates if t == table and kind == 'range' and c not in eq]
+                joins = [c for t, c, kind in predicates if t == table and kind == 'join']
+                # Unrelated join columns are not combined: each serves a different join order
+                key = tuple(eq + ranges[:1]) or tuple(joins[:1])
+            if not key:
+                continue
+
+            # Covering: add the other columns the query reads from this table, if few enough
+            extra = tuple(sorted(referenced.get(table, set()) - set(key)))
+            covering = extra if len(key) + len(extra) <= self.max_index_columns else ()
+
+            if any(list(key) == index[:len(key)] for index in existing.get(table, [])):
+                continue
+            proposals.append((table, key, covering))
+        return proposals
+
+    @staticmethod
+    def index_sql(table, key, covering=()):
+        name = "idx_" + "_".join((table,) + tuple(key) + tuple(covering))
+        cols = ", ".join(f'"{c}"' for c in tuple(key) + tuple(covering))
+        return f'CREATE INDEX IF NOT EXISTS "{name}" ON "{table}" ({cols})'
+
+    def recommend_indexes(self, min_occurrences=None):
+        """
+        Indexes for filter/join patterns seen at least min_occurrences times, most costly first.
+
+        Returns:
+            list: [{'table', 'key', 'covering', 'columns', 'sql', 'queries', 'total_cost'}]
+        """
+        min_occurrences = min_occurrences or self.min_occurrences
+        recommendations = []
+        for (table, key, covering), count in self.patterns.items():
+            if count < min_occurrences:
+                continue
+            recommendations.append({
+                'table': table,
+                'key': key,
+                'covering': covering,
+                'columns': list(key) + list(covering),
+                'sql': self.index_sql(table, key, covering),
+                'queries': count,
+                'total_cost': self.pattern_cost[(table, key, covering)],
+            })
+        return sorted(recommendations, key=lambda r: -r['total_cost'])
+
+    def create_index(self, table, key, covering=()):
+        """Create an index (and refresh the planner statistics for its table)."""
+        sql = self.index_sql(table, key, covering)
+        conn = sqlite3.connect(self.db_path)
+        try:
+            conn.execute(sql)
+            conn.execute(f'ANALYZE "{table}"')
+            conn.commit()
+        finally:
+            conn.close()
+        self.patterns.pop((table, key, covering), None)
+        self.created_indexes.append(sql)
+        self._stats = None
+        self._cache.clear()
+        return sql
+
+    def create_recommended_indexes(self, min_occurrences=None):
+        """Create every recommended index and return their CREATE INDEX statements."""
+        return [self.create_index(r['table'], r['key'], r['covering'])
+                for r in self.recommend_indexes(min_occurrences)]
+
+    # ------------------------------------------------------------------
+    # Public API
+    # ------------------------------------------------------------------
+
+    def check(self, sql):
+        """
+        Plan a query and decide whether it may run.
+
+        Returns:
+            dict: {
+                'ok': False if the query was rejected,
+                'reason': why it was rejected (or None),
+                'estimated_cost': estimated row visits,
+                'plan': EXPLAIN QUERY PLAN details,
+                'warnings': full scans, rescanning nested loops, missing indexes,
+                'suggested_indexes': CREATE INDEX statements that would help,
+                'created_indexes': indexes created for this query (on_expensive='index')
+            }
+        """
+        version = self._version()
+        cached = self._cache.get((sql, version))
+        if cached is not None:
+            result, proposals = cached
+            # A repeated query counts towards its patterns as often as it runs
+            self._record(proposals, result['estimated_cost'])
+            created = [self.create_index(*pattern) for pattern in self._due(proposals)]
+            if not created:
+                return dict(result)
+            result, proposals = self._replan(sql, created)
+        else:
+            conn = self._connect()
+            try:
+                result, proposals = self._check(conn, sql, version)
+            finally:
+                conn.close()
+        # Plan again after indexes were created: the schema version changed
+        self._cache.set((sql, self._version()), (result, proposals))
+        return dict(result)
+
+    def _record(self, proposals, cost):
+        with self._lock:
+            for pattern in proposals:
+                self.patterns[pattern] += 1
+                self.pattern_cost[pattern] += cost
+
+    def _due(self, proposals):
+        """Proposals whose pattern recurred often enough to be created automatically."""
+        if not self.auto_create_indexes:
+            return []
+        return [pattern for pattern in proposals if self.patterns.get(pattern, 0) >= self.min_occurrences]
+
+    def _replan(self, sql, created):
+        """Check a query again after indexes were created, on a connection that sees them."""
+        fresh = self._connect()
+        try:
+            result, proposals = self._check(fresh, sql, self._version())
+        finally:
+            fresh.close()
+        result['created_indexes'] = created + result['created_indexes']
+        return result, proposals
+
+    def _check(self, conn, sql, version):
+        """Plan a query; returns (result, index proposals)."""
+        try:
+            plan = self.explain(sql, conn)
+        except sqlite3.Error as e:
+            return {'ok': False, 'reason': f"Could not plan query: {e}", 'estimated_cost': None,
+                    'plan': [], 'warnings': [], 'suggested_indexes': [], 'created_indexes': []}, []
+
+        _, rows, index_rows, existing, columns = self._load_stats(conn, version)
+        tokens = tokenize(sql)
+        aliases = _table_aliases(tokens, columns)
+        predicates, referenced = extract_predicates(sql, columns)
+        counted = (any(t[1].upper() == 'COUNT' for t in tokens)
+                   and any(row[1] == 'Count' for row in conn.execute(f"EXPLAIN {sql}")))
+        cost, warnings, missing, full_scans = self._analyze_plan(
+            plan, aliases, rows, index_rows, predicates, _row_limit(tokens), counted)
+        proposals = self._propose(predicates, referenced, columns, existing, full_scans, missing)
+        self._record(proposals, cost)
+
+        created = [self.create_index(*pattern) for pattern in self._due(proposals)]
+        if cost > self.max_cost and self.on_expensive == 'index' and proposals and not created:
+            created = [self.create_index(*pattern) for pattern in proposals]
+        if created:
+            # Indexes changed the plan
+            return self._replan(sql, created)
+
+        ok = cost <= self.max_cost or self.on_expensive == 'warn'
+        return {
+            'ok': ok,
+            'reason': None if ok else (
+                f"Estimated cost {cost:,.0f} row visits exceeds the limit of {self.max_cost:,}: "
+                + "; ".join(warnings or ["query reads too many rows"])
+            ),
+            'estimated_cost': round(cost),
+            'plan': [detail for _, _, detail in plan],
+            'warnings': warnings,
+            'suggested_indexes': [self.index_sql(*pattern) for pattern in proposals],
+            'created_indexes': [],
+        }, proposals
+
+    def clear(self):
+        """Forget cached plans and recorded patterns."""
+        self._cache.clear()
+        self._stats = None
+        with self._lock:
+            self.patterns.clear()
+            self.pattern_cost.clear()
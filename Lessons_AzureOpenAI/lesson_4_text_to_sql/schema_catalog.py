@@ -0,0 +1,207 @@
+"""
+Schema Catalog for Text-to-SQL
+
+Introspecting SQLite (sqlite_master, PRAGMA table_info and a few sample rows per
+table) on every question is wasted work: the schema almost never changes between
+two questions. The SchemaCatalog builds the schema description once and serves
+it from memory until SQLite reports a change:
+
+- PRAGMA schema_version changes whenever a table or index is created/altered
+- PRAGMA data_version changes whenever another connection commits new data
+- a generation counter changes whenever the file is replaced (deleted and
+  rebuilt), because the pragmas of the new file start counting from scratch
+
+get_version() returns all three, so caches keyed by it (QueryCache, QueryGuard)
+never serve entries from a database that has since been rebuilt.
+
+Usage:
+    catalog = SchemaCatalog('sample_database.sqlite')
+    schema = catalog.get_schema()        # {table: {'columns': [...], 'sample_data': [...]}}
+    text = catalog.describe()            # plain-text schema for prompts
+    prompt = catalog.render(my_format)   # any custom prompt, cached per version
+"""
+
+import os
+import sqlite3
+import threading
+
+
+class SchemaCatalog:
+    """Cached, self-invalidating view of a SQLite database schema."""
+
+    def __init__(self, db_path='sample_database.sqlite', sample_rows=3):
+        """
+        Args:
+            db_path: Path to the SQLite database file
+            sample_rows: Number of sample rows to keep per table (0 to skip sampling)
+        """
+        self.db_path = db_path
+        self.sample_rows = sample_rows
+
+        self._lock = threading.RLock()
+        self._conn = None
+        self._file_id = None
+        self._generation = 0      # incremented for every (re)opened database file
+        self._schema_version = None
+        self._data_version = None
+
+        self._schema = None
+        self._rendered = {}
+        self.refresh_count = 0
+
+    # ------------------------------------------------------------------
+    # Version tracking
+    # ------------------------------------------------------------------
+
+    def _open(self):
+        """Open the long-lived connection used to watch the database version."""
+        if self._conn is not None:
+            self._conn.close()
+        # Read-only so a missing file is reported instead of silently created
+        uri = f"file:{os.path.abspath(self.db_path)}?mode=ro"
+        self._conn = sqlite3.connect(uri, uri=True, check_same_thread=False)
+        self._generation += 1
+        stat = os.stat(self.db_path)
+        self._file_id = (stat.st_dev, stat.st_ino)
+
+    def _current_version(self):
+        """
+        Return (schema_version, data_version) for the database.
+
+        data_version only changes for commits made by *other* connections, which is
+        why the catalog keeps its own connection open between calls. If the file
+        was deleted and recreated (as the lesson notebook does when rebuilding the
+        database) the old connection would keep reading the unlinked file, so the
+        file identity is checked first.
+        """
+        stat = os.stat(self.db_path)
+        if self._conn is None or (stat.st_dev, stat.st_ino) != self._file_id:
+            self._open()
+            # A new connection has a fresh data_version counter, force a rebuild
+            self._schema_version = None
+
+        schema_version = self._conn.execute("PRAGMA schema_version;").fetchone()[0]
+        data_version = self._conn.execute("PRAGMA data_version;").fetchone()[0]
+        return schema_version, data_version
+
+    def _ensure_fresh(self):
+        schema_version, data_version = self._current_version()
+
+        if schema_version != self._schema_version:
+            self._schema = self._load_schema()
+        elif data_version != self._data_version:
+            # Same tables and columns, only the sample rows can be stale
+            self._load_samples(self._schema)
+        else:
+            return
+
+        self._schema_version = schema_version
+        self._data_version = data_version
+        self._rendered = {}
+        self.refresh_count += 1
+
+    # ------------------------------------------------------------------
+    # Introspection (only runs when the database changed)
+    # ------------------------------------------------------------------
+
+    def _load_schema(self):
+        cursor = self._conn.cursor()
+        cursor.execute(
+            "SELECT name FROM sqlite_master WHERE type='table' AND name NOT LIKE 'sqlite_%' ORDER BY rowid;"
+        )
+        tables = [row[0] for row in cursor.fetchall()]
+
+        schema = {}
+        for table in tables:
+            cursor.execute(f'PRAGMA table_info("{table}");')
+            columns = cursor.fetchall()
+
+            cursor.execute(f'PRAGMA foreign_key_list("{table}");')
+            foreign_keys = [
+                {'column': fk[3], 'references_table': fk[2], 'references_column': fk[4]}
+                for fk in cursor.fetchall()
+            ]
+
+            schema[table] = {
+                'columns': [(col[1], col[2]) for col in columns],
+                'primary_key': [col[1] for col in sorted(columns, key=lambda c: c[5]) if col[5]],
+                'foreign_keys': foreign_keys,
+                'sample_data': [],
+            }
+
+        self._load_samples(schema)
+        return schema
+
+    def _load_samples(self, schema):
+        if not self.sample_rows:
+            return
+        cursor = self._conn.cursor()
+        for table, table_info in schema.items():
+            cursor.execute(f'SELECT * FROM "{table}" LIMIT {int(self.sample_rows)};')
+            column_names = [col[0] for col in table_info['columns']]
+            table_info['sample_data'] = [dict(zip(column_names, row)) for row in cursor.fetchall()]
+
+    # ------------------------------------------------------------------
+    # Public API
+    # ------------------------------------------------------------------
+
+    def get_schema(self):
+        """
+        Get the schema of every table: columns, primary/foreign keys and sample rows.
+
+        The returned dict is shared between callers, treat it as read-only.
+        """
+        with self._lock:
+            self._ensure_fresh()
+            return self._schema
+
+    def get_version(self):
+        """
+        Return the (generation, schema_version, data_version) the cached schema was built from.
+
+        generation counts the database files seen, so a rebuilt database never has the
+        version of the file it replaced, even though its pragmas restart at the same values.
+        """
+        with self._lock:
+            self._ensure_fresh()
+            return self._generation, self._schema_version, self._data_version
+
+    def render(self, formatter):
+        """
+        Return formatter(schema), computed once per database version.
+
+        Use this for prompt text built from the schema so the string is not rebuilt
+        for every question.
+        """
+        with self._lock:
+            self._ensure_fresh()
+            if formatter not in self._rendered:
+                self._rendered[formatter] = formatter(self._schema)
+            return self._rendered[formatter]
+
+    def describe(self):
+        """Plain-text schema description (table names with column names and types)."""
+        return self.render(format_schema_text)
+
+    def invalidate(self):
+        """Drop the cached schema so the next call re-introspects the database."""
+        with self._lock:
+            self._schema_version = None
+            self._data_version = None
+
+    def close(self):
+        """Close the catalog's connection."""
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+
+def format_schema_text(schema):
+    """Format a schema dict as a compact table/column listing."""
+    schema_info = ""
+    for table_name, table_info in schema.items():
+        schema_info += f"\nTable: {table_name}\n"
+        for column_name, column_type in table_info['columns']:
+            schema_info += f"  - {column_name} ({column_type})\n"
+    return schema_info
@@ -0,0 +1,488 @@
+"""
+Schema Linking for Text-to-SQL
+
+Sending every table, column and sample row to the LLM works for a 5-table demo
+database, but on a wide warehouse the schema dominates the prompt: more tokens,
+slower time-to-first-token and higher cost. Schema linking picks the tables and
+columns a question actually needs before the prompt is built:
+
+1. Score tables and columns against the question with a local BM25 index over
+   table names, column names, descriptions and sample values (optionally mixed
+   with embedding similarity if an embedding function is supplied)
+2. Keep the best matching tables
+3. Add the foreign-key neighbours needed to join them
+   (e.g. customers + products also pulls in orders -> order_items)
+4. Emit a pruned schema in the same shape as SchemaCatalog.get_schema()
+
+Usage:
+    linker = SchemaLinker(catalog.get_schema())
+    pruned = linker.link("Which customers bought Electronics?")
+    prompt = format_linked_schema(pruned)
+
+Schemas documented in markdown (see table_metadata/metadata_*.txt) can be loaded
+with load_table_metadata() and linked the same way.
+"""
+
+import heapq
+import math
+import re
+from collections import Counter
+
+import numpy as np
+
+STOPWORDS = {
+    'a', 'about', 'all', 'an', 'and', 'any', 'are', 'as', 'at', 'be', 'by', 'can', 'did',
+    'do', 'does', 'each', 'for', 'from', 'get', 'give', 'has', 'have', 'how', 'i', 'in',
+    'is', 'it', 'its', 'list', 'many', 'me', 'most', 'much', 'my', 'of', 'on', 'or', 'our',
+    'per', 'show', 'than', 'that', 'the', 'their', 'them', 'there', 'these', 'they', 'this',
+    'to', 'was', 'we', 'were', 'what', 'when', 'where', 'which', 'who', 'whose', 'why',
+    'with', 'you', 'your',
+}
+
+# Question words that rarely appear in column names, mapped to words that do.
+# Values are already stemmed (see _stem).
+SYNONYMS = {
+    'revenue': ['total', 'amount', 'price', 'sale'],
+    'sale': ['order', 'total', 'amount'],
+    'sold': ['order', 'quantity'],
+    'sell': ['order', 'quantity'],
+    'bestseller': ['order', 'quantity', 'product'],
+    'bought': ['order', 'product'],
+    'buy': ['order', 'product'],
+    'purchase': ['order', 'product'],
+    'spending': ['spent', 'total', 'amount'],
+    'spend': ['spent', 'total', 'amount'],
+    'expensive': ['price'],
+    'cheap': ['price'],
+    'cost': ['price', 'cost'],
+    'popular': ['order', 'quantity', 'rating'],
+    'rated': ['rating', 'review'],
+    'rating': ['rating', 'review'],
+    'stock': ['stock', 'quantity'],
+    'client': ['customer'],
+    'user': ['customer'],
+    'located': ['city', 'state', 'country', 'address', 'location'],
+    'location': ['city', 'state', 'country', 'address', 'location'],
+    'recent': ['date'],
+    'month': ['date'],
+    'year': ['date'],
+    'day': ['date'],
+    'today': ['date'],
+    'last': ['date'],
+}
+
+_CAMEL = re.compile(r'([a-z])([A-Z])')
+_WORD = re.compile(r'[A-Za-z]+|\d+')
+
+
+def _stem(word):
+    """Very light plural stripping so 'customers' matches 'customer_id'."""
+    if len(word) > 4 and word.endswith('ies'):
+        return word[:-3] + 'y'
+    if len(word) > 4 and word.endswith('sses'):
+        return word[:-2]
+    if len(word) > 3 and word.endswith('s') and not word.endswith('ss'):
+        return word[:-1]
+    return word
+
+
+def tokenize(text):
+    """Split text (including snake_case / camelCase identifiers) into stemmed tokens."""
+    text = _CAMEL.sub(r'\1 \2', str(text))
+    return [_stem(w) for w in (m.lower() for m in _WORD.findall(text)) if w not in STOPWORDS]
+
+
+class _BM25:
+    """Minimal BM25 index over short documents."""
+
+    def __init__(self, documents, k1=1.2, b=0.75):
+        self.k1 = k1
+        self.b = b
+        self.doc_tf = [Counter(doc) for doc in documents]
+        self.doc_len = [len(doc) for doc in documents]
+        self.avg_len = (sum(self.doc_len) / len(documents)) if documents else 0.0
+
+        df = Counter()
+        for tf in self.doc_tf:
+            df.update(tf.keys())
+        n = len(documents)
+        self.idf = {term: math.log(1 + (n - freq + 0.5) / (freq + 0.5)) for term, freq in df.items()}
+
+    def scores(self, query_weights):
+        """Score every document against a {term: weight} query."""
+        out = [0.0] * len(self.doc_tf)
+        for i, tf in enumerate(self.doc_tf):
+            norm = self.k1 * (1 - self.b + self.b * self.doc_len[i] / (self.avg_len or 1))
+            score = 0.0
+            for term, weight in query_weights.items():
+                freq = tf.get(term)
+                if freq:
+                    score += weight * self.idf[term] * freq * (self.k1 + 1) / (freq + norm)
+            out[i] = score
+        return out
+
+
+def infer_relationships(schema):
+    """
+    Return the join relationships of a schema as a list of
+    {'table', 'column', 'references_table', 'references_column'} dicts.
+
+    Declared foreign keys are used when the schema has any. Databases built with
+    DataFrame.to_sql have none, so otherwise a column named '<thing>_id' is linked
+    to the table named '<thing>s' (or '<thing>') that also has that column.
+    """
+    declared = [
+        {'table': table, **fk}
+        for table, info in schema.items()
+        for fk in info.get('foreign_keys', [])
+        if fk.get('references_table') in schema
+    ]
+    if declared:
+        return declared
+
+    inferred = []
+    for table, info in schema.items():
+        for column, _ in info['columns']:
+            if not column.lower().endswith('_id'):
+                continue
+            stem = column[:-3].lower()
+            for owner in (stem + 's', stem + 'es', stem):
+                owner_info = schema.get(owner)
+                if owner == table or owner_info is None:
+                    continue
+                if column in (name for name, _ in owner_info['columns']):
+                    inferred.append({
+                        'table': table,
+                        'column': column,
+                        'references_table': owner,
+                        'references_column': column,
+                    })
+                    break
+    return inferred
+
+
+class SchemaLinker:
+    """Score a schema against questions and return the relevant subset."""
+
+    def __init__(self, schema, relationships=None, embed_fn=None, embedding_weight=1.0,
+                 synonyms=None):
+        """
+        Args:
+            schema: Schema dict as returned by SchemaCatalog.get_schema() or load_table_metadata()
+            relationships: Optional list of join relationships (see infer_relationships)
+            embed_fn: Optional callable(list_of_texts) -> list of vectors, for semantic matching
+            embedding_weight: Weight of embedding similarity relative to the lexical score
+            synonyms: Optional {word: [column words]} map replacing SYNONYMS
+        """
+        self.schema = schema
+        self.relationships = relationships if relationships is not None else infer_relationships(schema)
+        self.synonyms = SYNONYMS if synonyms is None else synonyms
+        self.embed_fn = embed_fn
+        self.embedding_weight = embedding_weight
+
+        # Columns that point at another table describe the *other* table, so they
+        # must not make their own table look relevant
+        self._reference_columns = {(r['table'], r['column']) for r in self.relationships}
+
+        self._neighbours = {table: set() for table in schema}
+        for r in self.relationships:
+            self._neighbours[r['table']].add(r['references_table'])
+            self._neighbours[r['references_table']].add(r['table'])
+
+        self.tables = list(schema)
+        self.columns = [(table, name) for table in schema for name, _ in schema[table]['columns']]
+
+        table_docs = [self._table_document(table) for table in self.tables]
+        column_docs = [self._column_document(table, name) for table, name in self.columns]
+        self._table_index = _BM25([tokenize(doc) for doc in table_docs])
+        self._column_index = _BM25([tokenize(doc) for doc in column_docs])
+
+        self._table_vectors = None
+        self._column_vectors = None
+        if embed_fn is not None:
+            self._table_vectors = self._normalise(embed_fn(table_docs))
+            self._column_vectors = self._normalise(embed_fn(column_docs))
+
+    # ------------------------------------------------------------------
+    # Index construction
+    # ------------------------------------------------------------------
+
+    def _table_document(self, table):
+        info = self.schema[table]
+        # Table name twice so it outweighs the column names that follow
+        parts = [table, table, info.get('description', '')]
+        parts += [name for name, _ in info['columns'] if (table, name) not in self._reference_columns]
+        return ' '.join(parts)
+
+    def _column_document(self, table, column):
+        info = self.schema[table]
+        parts = [column, info.get('column_descriptions', {}).get(column, '')]
+        for row in info.get('sample_data', []):
+            value = row.get(column)
+            if isinstance(value, str) and len(value) <= 40:
+                parts.append(value)
+        return ' '.join(parts)
+
+    @staticmethod
+    def _normalise(vectors):
+        matrix = np.asarray(vectors, dtype=np.float32)
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        return matrix / np.where(norms == 0, 1.0, norms)
+
+    # ------------------------------------------------------------------
+    # Scoring
+    # ------------------------------------------------------------------
+
+    def _query_weights(self, question):
+        weights = Counter()
+        for token in tokenize(question):
+            if token.isdigit():
+                # Limits and thresholds ("top 5", "more than 3") say nothing about the schema
+                continue
+            weights[token] += 1.0
+            for synonym in self.synonyms.get(token, []):
+                weights[synonym] += 0.5
+        return weights
+
+    def _semantic_scores(self, question, vectors):
+        query = self._normalise(self.embed_fn([question]))[0]
+        return (vectors @ query).tolist()
+
+    def score(self, question):
+        """
+        Score every table and column against the question.
+
+        Returns:
+            tuple: ({table: score}, {(table, column): score})
+        """
+        weights = self._query_weights(question)
+        table_scores = self._table_index.scores(weights)
+        column_scores = self._column_index.scores(weights)
+
+
+        if self.embed_fn is not None:
+            top_lexical = max(table_scores + column_scores + [1.0])
+            semantic = self._semantic_scores(question, self._table_vectors)
+            table_scores = [s + self.embedding_weight * top_lexical * max(e, 0) for s, e in zip(table_scores, semantic)]
+            semantic = self._semantic_scores(question, self._column_vectors)
+            column_scores = [s + self.embedding_weight * top_lexical * max(e, 0) for s, e in zip(column_scores, semantic)]
+
+        columns = dict(zip(self.columns, column_scores))
+        tables = {}
+        for table, score in zip(self.tables, table_scores):
+            best_column = max(
+                (columns[(table, name)] for name, _ in self.schema[table]['columns']
+                 if (table, name) not in self._reference_columns),
+                default=0.0,
+            )
+            tables[table] = score + best_column
+        return tables, columns
+
+    # ------------------------------------------------------------------
+    # Linking
+    # ------------------------------------------------------------------
+
+    def _join_path(self, component, target, selected, relevance):
+        """
+        Cheapest join path from the connected component to target.
+
+        Tables that are already selected are free to pass through; any other table
+        costs a little more the less relevant it is to the question, so that
+        customers -> products goes through orders/order_items when orders is
+        already needed rather than through an unrelated table.
+        """
+        costs = {table: 0.0 for table in component}
+        parents = {table: None for table in component}
+        heap = [(0.0, table) for table in sorted(component)]
+        while heap:
+            cost, table = heapq.heappop(heap)
+            if cost > costs[table]:
+                continue
+            if table == target:
+                path = []
+                while table is not None and table not in component:
+                    path.append(table)
+                    table = parents[table]
+                return path
+            for neighbour in sorted(self._neighbours[table]):
+                step = 0.0 if neighbour in selected else 1.0 + 0.1 * (1.0 - relevance.get(neighbour, 0.0))
+                if cost + step < costs.get(neighbour, math.inf):
+                    costs[neighbour] = cost + step
+                    parents[neighbour] = table
+                    heapq.heappush(heap, (cost + step, neighbour))
+        # Not connected to the rest of the selection, include it on its own
+        return [target]
+
+    def link_tables(self, question, max_tables=4, relative_threshold=0.3):
+        """
+        Return the tables needed for the question, including join tables.
+
+        Tables scoring below relative_threshold * best score are dropped. If nothing
+        matches at all, every table is returned so the model is never left blind.
+        """
+        table_scores, _ = self.score(question)
+        tables, _ = self._select_tables(table_scores, max_tables, relative_threshold)
+        return tables
+
+    def _select_tables(self, table_scores, max_tables, relative_threshold):
+        ranked = sorted(self.tables, key=lambda t: -table_scores[t])
+        best = table_scores[ranked[0]] if ranked else 0.0
+        if best <= 0:
+            return list(self.tables), list(self.tables)
+
+        seeds = [t for t in ranked if table_scores[t] >= relative_threshold * best][:max_tables]
+        relevance = {t: table_scores[t] / best for t in self.tables}
+        selected = set(seeds)
+        component = {seeds[0]}
+        for table in seeds[1:]:
+            if table not in component:
+                path = self._join_path(component, table, selected, relevance)
+                component.update(path)
+                selected.update(path)
+        return [t for t in self.tables if t in selected], seeds
+
+    def link(self, question, max_tables=4, max_columns=15, relative_threshold=0.3, sample_rows=2):
+        """
+        Return a pruned copy of the schema containing only what the question needs.
+
+        Tables that matched the question keep all their columns if they have at most
+        max_columns of them; wider tables, and join tables pulled in only to connect
+        the others, keep their keys, the join columns and their best matching columns.
+        Sample rows are only kept for matched tables.
+        """
+        table_scores, column_scores = self.score(question)
+        tables, seeds = self._select_tables(table_scores, max_tables, relative_threshold)
+        kept = set(tables)
+
+        relationships = [r for r in self.relationships if r['table'] in kept and r['references_table'] in kept]
+        join_columns = {(r['table'], r['column']) for r in relationships}
+        join_columns |= {(r['references_table'], r['references_column']) for r in relationships}
+
+        pruned = {}
+        for table in tables:
+            info = self.schema[table]
+            matched = sorted(
+                (name for name, _ in info['columns'] if column_scores[(table, name)] > 0),
+                key=lambda name: -column_scores[(table, name)],
+            )[:max_columns]
+            if table in seeds and len(info['columns']) <= max_columns:
+                matched = [name for name, _ in info['columns']]
+            wanted = set(matched) | set(info.get('primary_key', [])) | {c for t, c in join_columns if t == table}
+
+            columns = [(name, col_type) for name, col_type in info['columns'] if name in wanted]
+            names = [name for name, _ in columns]
+            pruned[table] = {
+                'columns': columns,
+                'primary_key': [c for c in info.get('primary_key', []) if c in wanted],
+                'foreign_keys': [
+                    {k: r[k] for k in ('column', 'references_table', 'references_column')}
+                    for r in relationships if r['table'] == table
+                ],
+                'sample_data': [
+                    {name: row.get(name) for name in names}
+                    for row in info.get('sample_data', [])[:sample_rows]
+                ] if table in seeds else [],
+            }
+            if info.get('description'):
+                pruned[table]['description'] = info['description']
+            if info.get('column_descriptions'):
+                pruned[table]['column_descriptions'] = {
+                    name: desc for name, desc in info['column_descriptions'].items() if name in wanted
+                }
+        return pruned
+
+
+def format_linked_schema(schema, title="DATABASE SCHEMA (tables relevant to the question):"):
+    """Format a (pruned) schema dict as prompt text, including its relationships."""
+    lines = [title, ""]
+    relationships = []
+
+    for table_name, table_info in schema.items():
+        lines.append(f"{table_name.upper()} TABLE:")
+        if table_info.get('description'):
+            lines.append(table_info['description'])
+        lines.append("Columns:")
+        descriptions = table_info.get('column_descriptions', {})
+        for column_name, column_type in table_info['columns']:
+            line = f"  - {column_name} ({column_type})"
+            if descriptions.get(column_name):
+                line += f": {descriptions[column_name]}"
+            lines.append(line)
+
+        if table_info.get('sample_data'):
+            lines.append("Sample data:")
+            for i, sample in enumerate(table_info['sample_data']):
+                lines.append(f"  Row {i+1}: {sample}")
+        lines.append("")
+
+        for fk in table_info.get('foreign_keys', []):
+            relationships.append(
+                f"- {fk['references_table']}.{fk['references_column']} → {table_name}.{fk['column']}"
+            )
+
+    if relationships:
+        lines.append("KEY RELATIONSHIPS:")
+        lines.extend(relationships)
+        lines.append("")
+
+    return "\n".join(lines)
+
+
+_TABLE_HEADING = re.compile(r'^##\s+Table:\s*(\S+)', re.MULTILINE)
+_COLUMN_HEADING = re.compile(r'^\*\*(\w+)\*\*\s*\(([^)]*)\)\s*$')
+_PRIMARY_KEY = re.compile(r'^\*\*Primary Key\*\*:\s*(.+)$')
+_REFERENCE = re.compile(r'\*\*(\w+)\*\*\s+references\s+\*\*(\w+)\.(\w+)\*\*')
+
+
+def load_table_metadata(*sources):
+    """
+    Parse markdown table documentation (the format used in table_metadata/) into a
+    schema dict that SchemaLinker understands.
+
+    Args:
+        *sources: File paths or raw markdown strings
+
+    Returns:
+        dict: {table: {'columns', 'column_descriptions', 'description', 'primary_key', 'foreign_keys', 'sample_data'}}
+    """
+    schema = {}
+    for source in sources:
+        if '\n' not in source:
+            with open(source, encoding='utf-8') as f:
+                source = f.read()
+
+        headings = list(_TABLE_HEADING.finditer(source))
+        for n, heading in enumerate(headings):
+            end = headings[n + 1].start() if n + 1 < len(headings) else len(source)
+            body = source[heading.end():end].strip().splitlines()
+            table = heading.group(1)
+
+            info = {
+                'columns': [],
+                'column_descriptions': {},
+                'description': body[0].strip() if body and not body[0].startswith('#') else '',
+                'primary_key': [],
+                'foreign_keys': [],
+                'sample_data': [],
+            }
+            current = None
+            for line in body:
+                line = line.strip()
+                match = _COLUMN_HEADING.match(line)
+                if match:
+                    current = match.group(1)
+                    info['columns'].append((current, match.group(2)))
+                    continue
+                match = _PRIMARY_KEY.match(line)
+                if match:
+                    info['primary_key'] = [c.strip() for c in match.group(1).split(',')]
+                    continue
+                if current and line.startswith('- Description:'):
+                    info['column_descriptions'][current] = line[len('- Description:'):].strip()
+                    continue
+                for column, ref_table, ref_column in _REFERENCE.findall(line):
+                    info['foreign_keys'].append(
+                        {'column': column, 'references_table': ref_table, 'references_column': ref_column}
+                    )
+            schema[table] = info
+    return schema
@@ -0,0 +1,265 @@
+"""
+Pooled, Read-Only SQL Execution Engine
+
+Opening a new sqlite3 connection for every generated query and fetchall()-ing
+the result has two costs: connection setup on every request, and unbounded
+memory when the model writes an accidental `SELECT *` over a large table.
+
+This module provides:
+
+- SQLiteConnectionPool: read-only (mode=ro URI) connections shared across threads.
+  Connections run in autocommit mode so no read transaction is left open between
+  queries, which keeps them friendly to a writer using WAL mode.
+- SQLEngine: executes queries on pooled connections, streams rows in batches with
+  fetchmany() and stops reading at max_rows instead of slicing a full result.
+
+Usage:
+    engine = SQLEngine('sample_database.sqlite')
+    result = engine.execute("SELECT * FROM orders", max_rows=50)
+
+    with engine.stream("SELECT * FROM order_items", batch_size=1000) as cursor:
+        for batch in cursor:
+            process(batch)
+"""
+
+import os
+import queue
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+
+class SQLiteConnectionPool:
+    """Thread-safe pool of read-only SQLite connections."""
+
+    def __init__(self, db_path, max_connections=4, busy_timeout=5.0, mmap_size=256 * 1024 * 1024):
+        """
+        Args:
+            db_path: Path to the SQLite database file
+            max_connections: Maximum number of open connections
+            busy_timeout: Seconds to wait for a lock held by a writer
+            mmap_size: Bytes of the database file to memory-map (0 to disable)
+        """
+        self.db_path = db_path
+        self.max_connections = max_connections
+        self.busy_timeout = busy_timeout
+        self.mmap_size = mmap_size
+
+        self._idle = queue.LifoQueue()
+        self._lock = threading.Lock()
+        self._created = 0
+        self._file_id = None
+        self._generation = 0
+
+    def _connect(self):
+        uri = f"file:{os.path.abspath(self.db_path)}?mode=ro"
+        # isolation_level=None: autocommit, so no read transaction stays open
+        conn = sqlite3.connect(
+            uri, uri=True, timeout=self.busy_timeout, check_same_thread=False, isolation_level=None
+        )
+        conn.execute("PRAGMA query_only = ON;")
+        conn.execute("PRAGMA temp_store = MEMORY;")
+        if self.mmap_size:
+            conn.execute(f"PRAGMA mmap_size = {int(self.mmap_size)};")
+        return conn
+
+    def _check_file(self):
+        """
+        Drop idle connections if the database file was replaced.
+
+        Rebuilding the database (delete + recreate) leaves old connections reading
+        the deleted file, so they must not be handed out again.
+        """
+        stat = os.stat(self.db_path)
+        file_id = (stat.st_dev, stat.st_ino)
+        if file_id != self._file_id:
+            self._file_id = file_id
+            self._generation += 1
+            self._drain()
+
+    def _drain(self):
+        while True:
+            try:
+                conn, _ = self._idle.get_nowait()
+            except queue.Empty:
+                return
+            conn.close()
+            self._created -= 1
+
+    def acquire(self, timeout=None):
+        """Take a connection from the pool, opening one if the pool is not full."""
+        with self._lock:
+            self._check_file()
+            generation = self._generation
+            try:
+                return self._idle.get_nowait()
+            except queue.Empty:
+                pass
+            if self._created < self.max_connections:
+                self._created += 1
+                try:
+                    return self._connect(), generation
+                except Exception:
+                    self._created -= 1
+                    raise
+
+        # Pool is full: wait for another thread to release a connection
+        try:
+            return self._idle.get(timeout=timeout)
+        except queue.Empty:
+            raise TimeoutError(f"No database connection available after {timeout} seconds")
+
+    def release(self, conn, generation):
+        """Return a connection to the pool (closing it if the database was replaced)."""
+        with self._lock:
+            if generation != self._generation:
+                conn.close()
+                self._created -= 1
+                return
+        self._idle.put((conn, generation))
+
+    @contextmanager
+    def connection(self, timeout=None):
+        """Context manager that borrows a connection from the pool."""
+        conn, generation = self.acquire(timeout=timeout)
+        try:
+            yield conn
+        finally:
+            self.release(conn, generation)
+
+    def close(self):
+        """Close all idle connections."""
+        with self._lock:
+            self._drain()
+
+
+class StreamingResult:
+    """
+    Iterates over a query result in batches of rows.
+
+    The pooled connection is held until the result is exhausted or closed, so use
+    it as a context manager (or iterate to the end).
+    """
+
+    def __init__(self, pool, sql, params=(), batch_size=500, max_rows=None, timeout=None):
+        self._pool = pool
+        self._conn, self._generation = pool.acquire()
+        self.batch_size = batch_size
+        self.max_rows = max_rows
+        self.row_count = 0
+        self.truncated = False
+        self._closed = False
+
+        try:
+            if timeout:
+                _set_deadline(self._conn, timeout)
+            self._cursor = self._conn.execute(sql, params)
+            self.columns = [d[0] for d in self._cursor.description] if self._cursor.description else []
+        except Exception:
+            self.close()
+            raise
+
+    def __iter__(self):
+        try:
+            while not self._closed:
+                size = self.batch_size
+                if self.max_rows is not None:
+                    remaining = self.max_rows - self.row_count
+                    if remaining <= 0:
+                        # Peek one row to know whether the result was cut short
+                        self.truncated = self._cursor.fetchone() is not None
+                        break
+                    size = min(size, remaining)
+
+                batch = self._cursor.fetchmany(size)
+                if not batch:
+                    break
+                self.row_count += len(batch)
+                yield batch
+        finally:
+            self.close()
+
+    def rows(self):
+        """Iterate over individual rows instead of batches."""
+        for batch in self:
+            yield from batch
+
+    def close(self):
+        if self._closed:
+            return
+        self._closed = True
+        cursor = getattr(self, '_cursor', None)
+        if cursor is not None:
+            cursor.close()
+        self._conn.set_progress_handler(None, 0)
+        self._pool.release(self._conn, self._generation)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def _set_deadline(conn, timeout):
+    """Abort the statement running on conn after timeout seconds."""
+    deadline = time.monotonic() + timeout
+    # Called every 10k SQLite VM instructions; a non-zero return interrupts the query
+    conn.set_progress_handler(lambda: time.monotonic() > deadline, 10000)
+
+
+class SQLEngine:
+    """Executes read-only queries on pooled connections."""
+
+    def __init__(self, db_path='sample_database.sqlite', pool_size=4, batch_size=500, timeout=30.0):
+        """
+        Args:
+            db_path: Path to the SQLite database file
+            pool_size: Maximum number of pooled connections
+            batch_size: Default number of rows fetched per batch when streaming
+            timeout: Default per-query time limit in seconds (None for no limit)
+        """
+        self.pool = SQLiteConnectionPool(db_path, max_connections=pool_size)
+        self.batch_size = batch_size
+        self.timeout = timeout
+
+    def stream(self, sql, params=(), batch_size=None, max_rows=None, timeout=None):
+        """Run a query and return a StreamingResult that yields batches of rows."""
+        return StreamingResult(
+            self.pool, sql, params,
+            batch_size=batch_size or self.batch_size,
+            max_rows=max_rows,
+            timeout=timeout if timeout is not None else self.timeout,
+        )
+
+    def execute(self, sql, params=(), max_rows=50, timeout=None):
+        """
+        Run a query and return at most max_rows rows.
+
+        Only max_rows rows (plus one, to detect truncation) are ever read from
+        SQLite, however large the full result would be.
+
+        Returns:
+            dict: {'success', 'results', 'columns', 'row_count', 'truncated'} or
+                  {'success': False, 'error'}
+        """
+        try:
+            with self.stream(sql, params, batch_size=max_rows, max_rows=max_rows, timeout=timeout) as result:
+                rows = list(result.rows())
+                return {
+                    'success': True,
+                    'results': rows,
+                    'columns': result.columns,
+                    'row_count': len(rows),
+                    'truncated': result.truncated,
+                }
+        except sqlite3.OperationalError as e:
+            if str(e) == 'interrupted':
+                return {'success': False, 'error': 'Query took too long and was cancelled'}
+            return {'success': False, 'error': str(e)}
+        except Exception as e:
+            return {'success': False, 'error': str(e)}
+
+    def close(self):
+        self.pool.close()
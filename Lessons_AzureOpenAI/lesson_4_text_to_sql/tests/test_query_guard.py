@@ -0,0 +1,94 @@
+"""Tests for the QueryGuard cost estimate and index advisor (run with: python -m pytest tests)."""
+
+import os
+import sqlite3
+import sys
+
+import pytest
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from query_guard import QueryGuard
+from schema_catalog import SchemaCatalog
+
+
+ORDERS = 40_000
+
+
+@pytest.fixture
+def db_path(tmp_path):
+    path = str(tmp_path / 'orders.sqlite')
+    conn = sqlite3.connect(path)
+    conn.execute("CREATE TABLE customers (customer_id INTEGER PRIMARY KEY, name TEXT)")
+    conn.execute("CREATE TABLE orders (order_id INTEGER PRIMARY KEY, customer_id INTEGER, "
+                 "order_date TEXT, payment_method TEXT, total REAL)")
+    conn.executemany("INSERT INTO customers VALUES (?, ?)", [(i, f"Customer {i}") for i in range(1, 1001)])
+    conn.executemany("INSERT INTO orders VALUES (?, ?, ?, ?, ?)", [
+        (i, i % 1000 + 1, f"2024-{i % 12 + 1:02d}-{i % 28 + 1:02d}", ('PayPal', 'Card')[i % 2], i * 1.5)
+        for i in range(1, ORDERS + 1)
+    ])
+    conn.execute("CREATE INDEX idx_orders_customer_id ON orders (customer_id)")
+    conn.execute("CREATE INDEX idx_orders_order_date ON orders (order_date)")
+    conn.commit()
+    conn.close()
+    return path
+
+
+@pytest.fixture
+def guard(db_path):
+    catalog = SchemaCatalog(db_path)
+    yield QueryGuard(db_path, catalog=catalog, max_cost=30_000)
+    catalog.close()
+
+
+@pytest.mark.parametrize('sql', [
+    "SELECT * FROM orders LIMIT 5",
+    "SELECT * FROM orders ORDER BY order_date DESC LIMIT 5",
+    "SELECT * FROM orders LIMIT 10, 5",
+    "SELECT o.order_id, c.name FROM orders o JOIN customers c ON c.customer_id = o.customer_id LIMIT 5",
+])
+def test_limit_bounds_the_rows_a_plan_reads(guard, sql):
+    check = guard.check(sql)
+    assert check['ok'], check['reason']
+    assert check['estimated_cost'] <= 100
+    assert not any(w.startswith("Full scan") for w in check['warnings'])
+    assert check['suggested_indexes'] == []
+
+
+def test_count_reads_the_btree_pages_not_the_rows(guard):
+    check = guard.check("SELECT COUNT(*) FROM orders LIMIT 51")
+    assert check['ok'], check['reason']
+    assert check['estimated_cost'] < ORDERS
+
+
+@pytest.mark.parametrize('sql', [
+    # Sorted by a column without an index: every row goes into a temporary b-tree
+    "SELECT * FROM orders ORDER BY total LIMIT 5",
+    # A filter checked row by row may have to read the whole table to find 5 rows
+    "SELECT * FROM orders WHERE payment_method = 'Bitcoin' LIMIT 5",
+    # An aggregate reads every row before it returns one
+    "SELECT SUM(total) FROM orders LIMIT 5",
+    "SELECT customer_id, COUNT(*) FROM orders GROUP BY customer_id LIMIT 5",
+    "SELECT * FROM orders",
+])
+def test_unbounded_scans_are_costed_at_the_table_size(guard, sql):
+    check = guard.check(sql)
+    assert not check['ok']
+    assert check['estimated_cost'] >= ORDERS
+
+
+def test_repeated_query_counts_towards_its_pattern(db_path):
+    guard = QueryGuard(db_path, max_cost=30_000, auto_create_indexes=True, min_occurrences=3)
+    sql = "SELECT order_id, total FROM orders WHERE payment_method = 'PayPal' LIMIT 5"
+
+    assert guard.check(sql)['created_indexes'] == []
+    assert guard.check(sql)['created_indexes'] == []
+    assert list(guard.patterns.values()) == [2]
+
+    third = guard.check(sql)
+    assert third['created_indexes'] == [
+        'CREATE INDEX IF NOT EXISTS "idx_orders_payment_method_order_id_total" '
+        'ON "orders" ("payment_method", "order_id", "total")'
+    ]
+    assert third['ok']
+    assert guard.recommend_indexes(min_occurrences=1) == []
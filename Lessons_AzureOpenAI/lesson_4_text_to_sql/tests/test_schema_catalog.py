@@ -0,0 +1,49 @@
+"""Tests for SchemaCatalog version tracking (run with: python -m pytest tests)."""
+
+import os
+import sqlite3
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from schema_catalog import SchemaCatalog
+
+
+def build_database(path, value):
+    """(Re)create the database the way the lesson does: delete the file, then write a new one."""
+    if os.path.exists(path):
+        os.remove(path)
+    conn = sqlite3.connect(path)
+    conn.execute("CREATE TABLE numbers (n INTEGER)")
+    conn.execute("INSERT INTO numbers VALUES (?)", (value,))
+    conn.commit()
+    conn.close()
+
+
+def test_version_changes_when_the_database_is_rebuilt(tmp_path):
+    db_path = str(tmp_path / "test.sqlite")
+    build_database(db_path, 1)
+    catalog = SchemaCatalog(db_path)
+    before = catalog.get_version()
+    assert catalog.get_version() == before
+
+    build_database(db_path, 2)
+    after = catalog.get_version()
+
+    assert after != before
+    assert catalog.get_schema()['numbers']['sample_data'] == [{'n': 2}]
+    catalog.close()
+
+
+def test_version_changes_when_another_connection_commits(tmp_path):
+    db_path = str(tmp_path / "test.sqlite")
+    build_database(db_path, 1)
+    catalog = SchemaCatalog(db_path)
+    before = catalog.get_version()
+
+    conn = sqlite3.connect(db_path)
+    conn.execute("INSERT INTO numbers VALUES (3)")
+    conn.commit()
+    conn.close()
+
+    assert catalog.get_version() != before
+    catalog.close()
@@ -0,0 +1,227 @@
+"""
+Compact BM25 Keyword Index
+
+Dense embeddings capture meaning but blur exact strings: a question about
+"SKU-4471" or "dim_customer_accounts" retrieves chunks about products or
+customers in general, not the one chunk that names them. BM25 keyword scoring
+finds those chunks directly, so hybrid retrieval combines both.
+
+The index is built for being kept next to a vector index:
+
+- postings are stored per term in three flat NumPy arrays (CSR layout): where each
+  term's postings start, the chunk numbers, and the term frequencies; no Python
+  object per posting, and persisting is one .npz file
+- chunks added since the last search are buffered and merged into the arrays in
+  one pass before the next search; deleted chunks are dropped in the same pass
+- identifiers are tokenised whole and in parts, so "SKU-4471", "sku" and "4471"
+  (or "dim_customer" and "customer") all match
+- a search only touches the postings of the query's terms and can be restricted to
+  a subset of chunks (a metadata filter)
+
+Usage:
+    bm25 = BM25Index()
+    bm25.add(["node-1", "node-2"], ["Order SKU-4471 shipped", "Cloud service models"])
+    scores, ids = bm25.search("sku-4471", k=5)
+    bm25.save("storage/default__vector_store.json.bm25")
+"""
+
+import json
+import math
+import os
+import re
+from collections import Counter
+
+import numpy as np
+
+STOPWORDS = {
+    'a', 'an', 'and', 'are', 'as', 'at', 'be', 'by', 'can', 'do', 'does', 'for', 'from',
+    'has', 'have', 'how', 'in', 'is', 'it', 'its', 'of', 'on', 'or', 'that', 'the', 'their',
+    'this', 'to', 'was', 'we', 'were', 'what', 'when', 'where', 'which', 'who', 'why',
+    'will', 'with',
+}
+
+_TOKEN = re.compile(r"\w+(?:[-./]\w+)*")
+_PART = re.compile(r"[^\W_]+")
+
+
+def _stem(word):
+    """Light plural stripping, so 'models' matches 'model'."""
+    if len(word) > 4 and word.endswith('ies'):
+        return word[:-3] + 'y'
+    if len(word) > 3 and word.endswith('s') and not word.endswith('ss') and word.isalpha():
+        return word[:-1]
+    return word
+
+
+def tokenize(text):
+    """Lower-cased tokens; compound identifiers (codes, snake_case, dotted names) also yield their parts."""
+    tokens = []
+    for match in _TOKEN.finditer(text.lower()):
+        token = match.group()
+        parts = _PART.findall(token)
+        if len(parts) > 1 or parts != [token]:
+            tokens.append(token)
+        tokens.extend(_stem(p) for p in parts if p not in STOPWORDS)
+    return tokens
+
+
+class BM25Index:
+    """Okapi BM25 over chunks addressed by string ids, with postings in flat arrays."""
+
+    def __init__(self, k1=1.2, b=0.75):
+        self.k1 = k1
+        self.b = b
+        self.vocab = {}
+        self.ids = []
+        self._doc_of = {}
+        self._doc_len = np.zeros(0, dtype=np.int32)
+        self._alive = np.zeros(0, dtype=bool)
+        # CSR postings: term t occupies _docs[_offsets[t]:_offsets[t + 1]]
+        self._offsets = np.zeros(1, dtype=np.int64)
+        self._docs = np.zeros(0, dtype=np.int32)
+        self._tfs = np.zeros(0, dtype=np.uint16)
+        self._pending = []  # (doc, {term id: tf}) added since the last merge
+        self._dirty = False
+        self._norm = None
+
+    def __len__(self):
+        return len(self._doc_of)
+
+    # --- adding and deleting -------------------------------------------------
+
+    def add(self, ids, texts):
+        """Add (or replace) chunks."""
+        self.delete([id_ for id_ in ids if id_ in self._doc_of])
+        lengths = []
+        for id_, text in zip(ids, texts):
+            tokens = tokenize(text or '')
+            counts = Counter(self.vocab.setdefault(token, len(self.vocab)) for token in tokens)
+            doc = len(self.ids)
+            self.ids.append(id_)
+            self._doc_of[id_] = doc
+            self._pending.append((doc, counts))
+            lengths.append(len(tokens))
+        if lengths:
+            self._doc_len = np.concatenate([self._doc_len, np.array(lengths, dtype=np.int32)])
+            self._alive = np.concatenate([self._alive, np.ones(len(lengths), dtype=bool)])
+            self._dirty = True
+
+    def delete(self, ids):
+        docs = [self._doc_of.pop(id_) for id_ in ids if id_ in self._doc_of]
+        if docs:
+            self._alive[docs] = False
+            self._dirty = True
+
+    def clear(self):
+        self.__init__(self.k1, self.b)
+
+    def _merge(self):
+        """Merge pending chunks into the postings arrays and drop deleted chunks (renumbering the rest)."""
+        if not self._dirty:
+            return
+        n_terms = len(self.vocab)
+        terms = [np.repeat(np.arange(len(self._offsets) - 1), np.diff(self._offsets))]
+        docs, tfs = [self._docs.astype(np.int64)], [self._tfs]
+        for doc, counts in self._pending:
+            terms.append(np.fromiter(counts.keys(), dtype=np.int64, count=len(counts)))
+            docs.append(np.full(len(counts), doc, dtype=np.int64))
+            tfs.append(np.fromiter(counts.values(), dtype=np.int64, count=len(counts)).clip(max=65535))
+        terms, docs, tfs = np.concatenate(terms), np.concatenate(docs), np.concatenate(tfs).astype(np.uint16)
+
+        renumber = np.cumsum(self._alive) - 1
+        keep = self._alive[docs]
+        terms, docs, tfs = terms[keep], renumber[docs[keep]], tfs[keep]
+        order = np.lexsort((docs, terms))
+        self._docs = docs[order].astype(np.int32)
+        self._tfs = tfs[order]
+        self._offsets = np.concatenate([[0], np.cumsum(np.bincount(terms, minlength=n_terms))]).astype(np.int64)
+
+        kept = np.flatnonzero(self._alive)
+        self.ids = [self.ids[i] for i in kept]
+        self._doc_of = {id_: doc for doc, id_ in enumerate(self.ids)}
+        self._doc_len = self._doc_len[kept]
+        self._alive = np.ones(len(kept), dtype=bool)
+        self._pending = []
+        self._dirty = False
+        self._set_norm()
+
+    def _set_norm(self):
+        """BM25 length normalisation of every chunk: k1 * (1 - b + b * length / average length)."""
+        avg_len = float(self._doc_len.mean()) if len(self._doc_len) else 1.0
+        self._norm = (self.k1 * (1 - self.b + self.b * self._doc_len / max(avg_len, 1e-9))).astype(np.float32)
+
+    # --- search --------------------------------------------------------------
+
+    def ids_mask(self, ids):
+        """Boolean mask over the chunks (in search order) of the given ids."""
+        self._merge()
+        mask = np.zeros(len(self.ids), dtype=bool)
+        mask[[self._doc_of[id_] for id_ in ids if id_ in self._doc_of]] = True
+        return mask
+
+    def search(self, query, k=10, mask=None):
+        """
+        Top-k chunks by BM25 score.
+
+        Args:
+            query: Query text
+            k: Number of results
+            mask: Boolean array from ids_mask(); only those chunks are returned
+
+        Returns:
+            tuple: (scores, ids) best first; chunks without any query term are not returned
+        """
+        self._merge()
+        n_docs = len(self.ids)
+        term_ids = list(dict.fromkeys(self.vocab[t] for t in tokenize(query) if t in self.vocab))
+        if not n_docs or not term_ids:
+            return np.zeros(0, dtype=np.float32), []
+
+        scores = np.zeros(n_docs, dtype=np.float32)
+        for term in term_ids:
+            start, stop = self._offsets[term], self._offsets[term + 1]
+            df = stop - start
+            if not df:
+                continue
+            docs = self._docs[start:stop]
+            tf = self._tfs[start:stop].astype(np.float32)
+            idf = math.log(1 + (n_docs - df + 0.5) / (df + 0.5))
+            scores[docs] += idf * tf * (self.k1 + 1) / (tf + self._norm[docs])
+
+        if mask is not None:
+            scores[~mask] = 0
+        candidates = np.flatnonzero(scores > 0)
+        if len(candidates) > k:
+            candidates = candidates[np.argpartition(-scores[candidates], k - 1)[:k]]
+        candidates = candidates[np.argsort(-scores[candidates], kind='stable')]
+        return scores[candidates], [self.ids[doc] for doc in candidates]
+
+    # --- persistence ---------------------------------------------------------
+
+    def save(self, path):
+        """Write path + '.npz' (postings arrays) and path + '.json' (vocabulary and ids)."""
+        self._merge()
+        with open(path + '.npz.tmp', 'wb') as f:
+            np.savez(f, offsets=self._offsets, docs=self._docs, tfs=self._tfs, doc_len=self._doc_len)
+        with open(path + '.json.tmp', 'w') as f:
+            json.dump({'k1': self.k1, 'b': self.b, 'ids': self.ids,
+                       'vocab': sorted(self.vocab, key=self.vocab.get)}, f)
+        os.replace(path + '.npz.tmp', path + '.npz')
+        os.replace(path + '.json.tmp', path + '.json')
+
+    @classmethod
+    def load(cls, path):
+        with open(path + '.json') as f:
+            state = json.load(f)
+        index = cls(state['k1'], state['b'])
+        index.vocab = {term: i for i, term in enumerate(state['vocab'])}
+        index.ids = state['ids']
+        index._doc_of = {id_: doc for doc, id_ in enumerate(index.ids)}
+        with np.load(path + '.npz') as arrays:
+            index._offsets = arrays['offsets']
+            index._docs = arrays['docs']
+            index._tfs = arrays['tfs']
+            index._doc_len = arrays['doc_len']
+        index._alive = np.ones(len(index.ids), dtype=bool)
+        index._set_norm()
+        return index
@@ -0,0 +1,295 @@
+"""
+Persisted, Incrementally Updated Document Index
+
+Building the index with VectorStoreIndex.from_documents on every run re-embeds
+the whole corpus, which costs minutes and embedding API spend even when not a
+single file changed.
+
+This indexer:
+
+- persists the index (docstore, vector store, index store) to a directory with
+  StorageContext and reloads it with load_index_from_storage; vectors live in a
+  NumpyVectorStore, whose inverted metadata index (file name, type, dates, tags)
+  lets queries filter the existing vectors instead of building a new index, and
+  whose BM25 keyword index is built from the same chunks for hybrid retrieval
+- keeps a manifest of every document's size, modification time, SHA-256 and the
+  ids of the documents LlamaIndex made from it
+- on the next run, hashes only the files whose size or modification time changed,
+  embeds only added or changed files, and deletes the nodes of changed and
+  removed files from the index
+- rebuilds from scratch when the embedding model or chunking settings change,
+  since the stored vectors would no longer match
+
+An unchanged corpus is loaded from disk without reading or embedding any document.
+
+Usage:
+    from document_indexer import load_or_build_index
+    index, changes = load_or_build_index("sample_documents", persist_dir="storage")
+
+    python document_indexer.py --docs sample_documents --persist-dir storage [--force]
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import sys
+import time
+
+from llama_index.core import (
+    Settings,
+    SimpleDirectoryReader,
+    StorageContext,
+    VectorStoreIndex,
+    load_index_from_storage,
+)
+
+from numpy_vector_store import NumpyVectorStore
+
+MANIFEST_NAME = 'document_manifest.json'
+
+
+def file_sha256(path, block_size=1 << 20):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(block_size), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def iter_documents(input_dir, required_exts=None, recursive=True):
+    """
+    Walk input_dir lazily, one directory at a time.
+
+    Yields:
+        tuple: (path relative to input_dir, absolute path), hidden files excluded
+    """
+    input_dir = os.path.abspath(input_dir)
+    if not os.path.isdir(input_dir):
+        raise FileNotFoundError(f"Document directory not found: {input_dir}")
+    for root, dirs, files in os.walk(input_dir):
+        dirs[:] = sorted(d for d in dirs if not d.startswith('.')) if recursive else []
+        for name in sorted(files):
+            if name.startswith('.'):
+                continue
+            if required_exts and os.path.splitext(name)[1].lower() not in required_exts:
+                continue
+            path = os.path.join(root, name)
+            yield os.path.relpath(path, input_dir).replace(os.sep, '/'), path
+
+
+def scan_documents(input_dir, required_exts=None, recursive=True):
+    """
+    List the documents under input_dir.
+
+    Returns:
+        dict: {path relative to input_dir: absolute path}, hidden files excluded
+    """
+    return dict(iter_documents(input_dir, required_exts, recursive))
+
+
+def index_settings():
+    """The settings the stored vectors depend on; a change means the index must be rebuilt."""
+    embed_model = Settings.embed_model
+    embed_model = getattr(embed_model, 'embed_model', embed_model)  # look through CachedEmbedding
+    return {
+        'embed_model': f"{type(embed_model).__name__}:{getattr(embed_model, 'model_name', '')}",
+        'vector_store': NumpyVectorStore.class_name(),
+        'keyword_index': 'bm25',
+        'chunk_size': Settings.chunk_size,
+        'chunk_overlap': Settings.chunk_overlap,
+    }
+
+
+def read_manifest(persist_dir):
+    try:
+        with open(os.path.join(persist_dir, MANIFEST_NAME)) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def write_manifest(persist_dir, manifest):
+    # Written last and atomically: if indexing fails, the old manifest still
+    # describes the old index and the next run retries the same files
+    path = os.path.join(persist_dir, MANIFEST_NAME)
+    with open(path + '.tmp', 'w') as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(path + '.tmp', path)
+
+
+def unchanged_entry(entry, path):
+    """The manifest entry of a file if its content is unchanged (with a refreshed mtime), else None."""
+    stat = os.stat(path)
+    if entry['size'] == stat.st_size and entry['mtime_ns'] == stat.st_mtime_ns:
+        return entry
+    if entry['size'] == stat.st_size and entry['sha256'] == file_sha256(path):
+        # Touched but not modified: no need to re-embed
+        return dict(entry, mtime_ns=stat.st_mtime_ns)
+    return None
+
+
+def diff_documents(files, known):
+    """
+    Compare the documents on disk with the manifest entries.
+
+    Args:
+        files: {relative path: absolute path} from scan_documents
+        known: {relative path: {'size', 'mtime_ns', 'sha256', 'doc_ids'}} from the manifest
+
+    Returns:
+        tuple: (added, changed, deleted, entries) where entries are the current
+               manifest entries of unchanged files (with refreshed mtimes)
+    """
+    added, changed, entries = [], [], {}
+    for rel, path in files.items():
+        entry = known.get(rel)
+        if entry is None:
+            added.append(rel)
+            continue
+        current = unchanged_entry(entry, path)
+        if current is None:
+            changed.append(rel)
+        else:
+            entries[rel] = current
+    deleted = [rel for rel in known if rel not in files]
+    return added, changed, deleted, entries
+
+
+def new_storage_context():
+    """Storage for a new index, with the vectors in a NumpyVectorStore."""
+    return StorageContext.from_defaults(vector_store=NumpyVectorStore())
+
+
+def load_index(persist_dir):
+    return load_index_from_storage(StorageContext.from_defaults(
+        persist_dir=persist_dir, vector_store=NumpyVectorStore.from_persist_dir(persist_dir)))
+
+
+def _load_documents(files, rels):
+    """Read the given files, returning {relative path: [Document]} with stable, path-based ids."""
+    if not rels:
+        return {}
+    by_path = {os.path.abspath(files[rel]): rel for rel in rels}
+    documents = SimpleDirectoryReader(input_files=list(by_path), filename_as_id=True).load_data()
+    loaded = {rel: [] for rel in rels}
+    for doc in documents:
+        rel = by_path.get(os.path.abspath(doc.metadata.get('file_path', '')))
+        if rel is None:
+            raise ValueError(f"Could not match document {doc.doc_id} to an input file")
+        loaded[rel].append(doc)
+    return loaded
+
+
+def load_or_build_index(input_dir, persist_dir='storage', force=False, required_exts=None, verbose=True):
+    """
+    Load the persisted index of input_dir, updating it for added, changed and deleted files.
+
+    Args:
+        input_dir: Directory with the documents
+        persist_dir: Directory the index and manifest are stored in
+        force: Rebuild the index from scratch
+        required_exts: Only index files with these extensions (e.g. ['.pdf', '.txt'])
+        verbose: Print what was (re)indexed
+
+    Returns:
+        tuple: (index, changes) where changes is {'added', 'changed', 'deleted', 'unchanged', 'elapsed_s'}
+    """
+    started = time.perf_counter()
+    required_exts = [e.lower() for e in required_exts] if required_exts else None
+    files = scan_documents(input_dir, required_exts)
+
+    manifest = None if force else read_manifest(persist_dir)
+    if manifest is not None and manifest.get('settings') != index_settings():
+        if verbose:
+            print("Embedding or chunking settings changed, rebuilding the index")
+        manifest = None
+    known = manifest['files'] if manifest else {}
+    added, changed, deleted, entries = diff_documents(files, known)
+
+    index = None
+    if manifest is not None:
+        index = load_index(persist_dir)
+
+    if index is not None:
+        for rel in changed + deleted:
+            for doc_id in known[rel]['doc_ids']:
+                index.delete_ref_doc(doc_id, delete_from_docstore=True)
+
+    loaded = _load_documents(files, added + changed)
+    documents = [doc for rel in added + changed for doc in loaded[rel]]
+    if index is None:
+        index = VectorStoreIndex.from_documents(documents, storage_context=new_storage_context(),
+                                                show_progress=verbose)
+    elif documents:
+        # Chunked and embedded in batches like from_documents, but added to the loaded index
+        nodes = Settings.node_parser.get_nodes_from_documents(documents)
+        index.insert_nodes(nodes)
+
+    for rel in added + changed:
+        stat = os.stat(files[rel])
+        entries[rel] = {
+            'size': stat.st_size,
+            'mtime_ns': stat.st_mtime_ns,
+            'sha256': file_sha256(files[rel]),
+            'doc_ids': [doc.doc_id for doc in loaded[rel]],
+        }
+
+    rebuilt = manifest is None or added or changed or deleted
+    if rebuilt:
+        index.storage_context.persist(persist_dir=persist_dir)
+    if rebuilt or entries != known:
+        write_manifest(persist_dir, {'settings': index_settings(), 'files': dict(sorted(entries.items()))})
+
+    changes = {
+        'added': added,
+        'changed': changed,
+        'deleted': deleted,
+        'unchanged': len(files) - len(added) - len(changed),
+        'elapsed_s': round(time.perf_counter() - started, 3),
+    }
+    if verbose:
+        if added or changed or deleted:
+            print(f"Indexed {len(added)} new and {len(changed)} changed documents, "
+                  f"removed {len(deleted)}, kept {changes['unchanged']} in {changes['elapsed_s']:.2f}s")
+        else:
+            print(f"Loaded index of {len(files)} unchanged documents from {persist_dir} "
+                  f"in {changes['elapsed_s']:.2f}s")
+    return index, changes
+
+
+def configure_settings():
+    """Configure LlamaIndex like the lesson notebook, so the CLI and the notebook share one index."""
+    from dotenv import load_dotenv, find_dotenv
+    from llama_index.embeddings.azure_openai import AzureOpenAIEmbedding
+    from embedding_cache import CachedEmbedding
+
+    load_dotenv(find_dotenv())
+    Settings.embed_model = CachedEmbedding(AzureOpenAIEmbedding(
+        deployment_name=os.environ.get("AZURE_OPENAI_EMBEDDINGS_DEPLOYMENT_NAME"),
+        api_key=os.environ.get("AZURE_OPENAI_KEY"),
+        azure_endpoint=os.environ.get("AZURE_OPENAI_ENDPOINT"),
+        api_version=os.environ.get("AZURE_OPENAI_VERSION"),
+    ), cache_dir="embedding_cache")
+    Settings.chunk_size = 1024
+    Settings.chunk_overlap = 200
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build or update the persisted document index")
+    parser.add_argument('--docs', default='sample_documents', help="Directory with the documents")
+    parser.add_argument('--persist-dir', default='storage', help="Directory for the index and manifest")
+    parser.add_argument('--ext', action='append', help="Only index this extension (repeatable), e.g. --ext .pdf")
+    parser.add_argument('--force', action='store_true', help="Rebuild the whole index")
+    args = parser.parse_args()
+
+    configure_settings()
+    try:
+        load_or_build_index(args.docs, args.persist_dir, force=args.force, required_exts=args.ext)
+    except (OSError, ValueError) as e:
+        print(f"Error: {e}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,166 @@
+#!/usr/bin/env python
+"""
+Recall/Latency Benchmark: Dense vs BM25 vs Hybrid (RRF) Retrieval
+
+Builds a synthetic corpus of chunks with known answers and runs two kinds of
+questions through NumpyVectorStore in every query mode:
+
+- keyword questions name an identifier that appears in exactly one chunk
+  (a product code like SKU-48213 or a table name like fact_orders_2931)
+- semantic questions paraphrase a chunk with synonyms, sharing almost no words with it
+
+The embeddings are simulated so no API calls are needed: a chunk's vector is the
+average of its words' vectors, synonyms get nearly the same vector, and
+identifiers all get nearly the same "some code" vector, which is how real
+embedding models tend to blur them. Dense retrieval should therefore win the
+semantic questions, BM25 the keyword questions, and hybrid retrieval both.
+
+Reported per mode: recall@k (is the answer chunk in the top k) per question type,
+and p50/p95 latency of a single query (embedding time excluded).
+
+Usage:
+    python benchmark_hybrid_retrieval.py
+    python benchmark_hybrid_retrieval.py --chunks 100000 --k 5 --rerank
+"""
+
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+from llama_index.core.schema import TextNode
+from llama_index.core.vector_stores.types import VectorStoreQuery, VectorStoreQueryMode
+
+# Make the lesson's helper modules (numpy_vector_store.py) importable
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from numpy_vector_store import NumpyVectorStore
+
+COMMON_WORDS = "the a of and to in is for on with as by this that are be from at".split()
+
+
+class SyntheticCorpus:
+    """Topic-based chunks, synonym paraphrases and identifiers, with simulated embeddings."""
+
+    def __init__(self, n_chunks, dim, rng, n_topics=200, words_per_topic=40, code_fraction=0.3):
+        self.rng = rng
+        self.dim = dim
+        self.topics = [[f"t{t}w{w}" for w in range(words_per_topic)] for t in range(n_topics)]
+        self.vectors = {}
+        code_vector = self._random_vector()
+        for topic in self.topics:
+            for word in topic:
+                self.vectors[word] = self._random_vector()
+                # The synonym means the same thing but is a different string
+                self.vectors["syn" + word] = self.vectors[word] + 0.3 * self._random_vector()
+        for word in COMMON_WORDS:
+            self.vectors[word] = 0.2 * self._random_vector()
+
+        self.texts, self.words, self.codes = [], [], []
+        for i in range(n_chunks):
+            topic = self.topics[rng.integers(n_topics)]
+            words = list(rng.choice(topic, rng.integers(60, 120))) + list(rng.choice(COMMON_WORDS, 20))
+            code = None
+            if rng.random() < code_fraction:
+                code = f"SKU-{10000 + i}" if i % 2 else f"fact_orders_{i}"
+                self.vectors[code] = code_vector + 0.05 * self._random_vector()
+                words.insert(int(rng.integers(len(words))), code)
+            self.texts.append(" ".join(words))
+            self.words.append(words)
+            self.codes.append(code)
+
+    def _random_vector(self):
+        return self.rng.standard_normal(self.dim).astype(np.float32) / np.sqrt(self.dim)
+
+    def embed(self, words):
+        return np.mean([self.vectors[w] for w in words if w in self.vectors], axis=0)
+
+    def questions(self, count):
+        """(kind, question, word list, answer chunk index) tuples, half keyword and half semantic."""
+        with_code = [i for i, code in enumerate(self.codes) if code]
+        result = []
+        for _ in range(count // 2):
+            i = int(self.rng.choice(with_code))
+            words = ["what", "is", "the", "status", "of", self.codes[i]]
+            result.append(('keyword', " ".join(words), words, i))
+        for _ in range(count - count // 2):
+            i = int(self.rng.integers(len(self.texts)))
+            content = [w for w in self.words[i] if w not in COMMON_WORDS and w != self.codes[i]]
+            words = ["explain"] + ["syn" + w for w in self.rng.choice(content, 12)]
+            result.append(('semantic', " ".join(words), words, i))
+        return result
+
+
+def percentile(times, q):
+    return 1000 * float(np.percentile(times, q))
+
+
+def run_mode(store, corpus, questions, mode, k, candidates, reranker=None):
+    hits = {'keyword': [], 'semantic': []}
+    times = []
+    for kind, text, words, answer in questions:
+        query = VectorStoreQuery(
+            query_embedding=corpus.embed(words).tolist(),
+            query_str=text,
+            mode=mode,
+            similarity_top_k=candidates if mode == VectorStoreQueryMode.HYBRID else k,
+            sparse_top_k=candidates if mode == VectorStoreQueryMode.HYBRID else k,
+            hybrid_top_k=candidates if reranker else k,
+        )
+        started = time.perf_counter()
+        ids = store.query(query).ids
+        if reranker:
+            scores = reranker.predict([(text, corpus.texts[int(id_)]) for id_ in ids])
+            ids = [ids[j] for j in np.argsort(-np.asarray(scores))]
+        times.append(time.perf_counter() - started)
+        hits[kind].append(str(answer) in ids[:k])
+    return {kind: float(np.mean(h)) for kind, h in hits.items()}, times
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark dense, BM25 and hybrid retrieval")
+    parser.add_argument('--chunks', type=int, default=20_000)
+    parser.add_argument('--dim', type=int, default=256)
+    parser.add_argument('--questions', type=int, default=400)
+    parser.add_argument('--k', type=int, default=5, help="Recall is measured in the top k")
+    parser.add_argument('--candidates', type=int, default=20,
+                        help="Results taken from each retriever before fusion")
+    parser.add_argument('--rerank', action='store_true',
+                        help="Also time a cross-encoder over the fused candidates (needs sentence-transformers; "
+                             "its relevance judgements mean little on synthetic text)")
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    started = time.perf_counter()
+    corpus = SyntheticCorpus(args.chunks, args.dim, rng)
+    questions = corpus.questions(args.questions)
+    nodes = [TextNode(id_=str(i), text=text, embedding=corpus.embed(words).tolist())
+             for i, (text, words) in enumerate(zip(corpus.texts, corpus.words))]
+    print(f"corpus: {args.chunks:,} chunks, {args.questions} questions ({time.perf_counter() - started:.1f} s)")
+
+    store = NumpyVectorStore()
+    started = time.perf_counter()
+    store.add(nodes)
+    store.keyword_index.search("warm up")  # merges the postings built during add()
+    print(f"indexing (vectors + BM25): {time.perf_counter() - started:.1f} s\n")
+
+    modes = [('dense only', VectorStoreQueryMode.DEFAULT, None),
+             ('BM25 only', VectorStoreQueryMode.TEXT_SEARCH, None),
+             ('hybrid (RRF)', VectorStoreQueryMode.HYBRID, None)]
+    if args.rerank:
+        from reranker import DEFAULT_MODEL, load_cross_encoder
+        encoder = load_cross_encoder(DEFAULT_MODEL)
+        if encoder is not None:
+            modes.append(('hybrid + rerank', VectorStoreQueryMode.HYBRID, encoder))
+
+    print(f"{'mode':<16} {'recall@' + str(args.k) + ' kw':>12} {'semantic':>9} {'all':>6} {'p50 ms':>8} {'p95 ms':>8}")
+    for name, mode, reranker in modes:
+        recall, times = run_mode(store, corpus, questions, mode, args.k, args.candidates, reranker)
+        overall = (recall['keyword'] + recall['semantic']) / 2
+        print(f"{name:<16} {recall['keyword']:>12.3f} {recall['semantic']:>9.3f} {overall:>6.3f} "
+              f"{percentile(times, 50):>8.2f} {percentile(times, 95):>8.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,286 @@
+"""
+Streaming, Parallel Document Ingestion
+
+SimpleDirectoryReader(input_dir=...).load_data() reads every file into memory
+before a single chunk is embedded: on a shared drive with tens of thousands of
+PDFs that is a memory spike followed by one long serial wait, and a crash near
+the end loses everything.
+
+This pipeline streams the corpus through three stages instead:
+
+1. a lazy directory walk that skips files the manifest already has (unchanged
+   size and modification time, or the same SHA-256)
+2. a process pool that reads, hashes and chunks files in parallel, with a bounded
+   number of files in flight
+3. the main thread, which embeds chunks in batches (through the embedding cache)
+   and inserts them into the index
+
+The stages are connected by a bounded queue: when embedding falls behind, the
+queue fills up and no new files are handed to the pool (backpressure). Memory
+used by the pipeline is therefore bounded by the queue size, the files in flight
+and one embedding batch, whatever the size of the corpus (the index itself still
+grows with it).
+
+Every checkpoint_every files the index and the manifest are persisted, in the
+same format as document_indexer.py. An interrupted run resumes from the last
+checkpoint, and load_or_build_index() can load the result.
+
+Usage:
+    from ingestion_pipeline import ingest_directory
+    index, stats = ingest_directory("/shared/docs", persist_dir="storage", workers=8)
+
+    python ingestion_pipeline.py --docs /shared/docs --persist-dir storage --workers 8
+"""
+
+import argparse
+import os
+import queue
+import sys
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+from llama_index.core import Settings, SimpleDirectoryReader, VectorStoreIndex
+from llama_index.core.node_parser import SentenceSplitter
+from llama_index.core.schema import MetadataMode
+
+from document_indexer import (
+    file_sha256,
+    index_settings,
+    iter_documents,
+    load_index,
+    new_storage_context,
+    read_manifest,
+    unchanged_entry,
+    write_manifest,
+)
+
+_DONE = object()
+
+# --- worker processes --------------------------------------------------------
+
+_splitter = None
+
+
+def _init_worker(chunk_size, chunk_overlap):
+    global _splitter
+    _splitter = SentenceSplitter(chunk_size=chunk_size, chunk_overlap=chunk_overlap)
+
+
+def _parse_file(rel, path):
+    """Read, hash and chunk one file (runs in a worker process)."""
+    stat = os.stat(path)
+    documents = SimpleDirectoryReader(input_files=[path], filename_as_id=True).load_data()
+    return {
+        'rel': rel,
+        'entry': {
+            'size': stat.st_size,
+            'mtime_ns': stat.st_mtime_ns,
+            'sha256': file_sha256(path),
+            'doc_ids': [doc.doc_id for doc in documents],
+        },
+        'nodes': _splitter.get_nodes_from_documents(documents),
+    }
+
+
+# --- pipeline ----------------------------------------------------------------
+
+def _put(out, item, stop):
+    """Put item on the bounded queue, waiting while it is full (unless the consumer has stopped)."""
+    while not stop.is_set():
+        try:
+            out.put(item, timeout=0.1)
+            return True
+        except queue.Full:
+            pass
+    return False
+
+
+def _produce(input_dir, required_exts, known, workers, max_in_flight, out, state, stop):
+    """Walk the directory and parse new or changed files in a process pool, feeding out (a bounded queue)."""
+    pool = ProcessPoolExecutor(workers, initializer=_init_worker,
+                               initargs=(Settings.chunk_size, Settings.chunk_overlap))
+    in_flight = {}
+
+    def collect():
+        done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+        for future in done:
+            rel = in_flight.pop(future)
+            try:
+                result = future.result()
+            except Exception as e:
+                result = {'rel': rel, 'error': f"{type(e).__name__}: {e}"}
+            _put(out, result, stop)
+
+    try:
+        for rel, path in iter_documents(input_dir, required_exts):
+            if stop.is_set():
+                return
+            state['seen'].add(rel)
+            entry = known.get(rel)
+            current = unchanged_entry(entry, path) if entry else None
+            if current is not None:
+                state['unchanged'][rel] = current
+                continue
+            while len(in_flight) >= max_in_flight and not stop.is_set():
+                collect()  # blocks while the queue is full: backpressure
+            in_flight[pool.submit(_parse_file, rel, path)] = rel
+        while in_flight and not stop.is_set():
+            collect()
+        state['walk_complete'] = True
+    except BaseException as e:
+        _put(out, e, stop)
+    finally:
+        pool.shutdown(wait=True, cancel_futures=True)
+        _put(out, _DONE, stop)
+
+
+def ingest_directory(input_dir, persist_dir='storage', workers=None, queue_size=16, embed_batch_size=256,
+                     checkpoint_every=500, required_exts=None, force=False, verbose=True):
+    """
+    Index a directory with parallel parsing and streaming, batched embedding.
+
+    Args:
+        input_dir: Directory with the documents
+        persist_dir: Directory the index and manifest are stored in (and resumed from)
+        workers: Parser processes (default: number of CPUs)
+        queue_size: Parsed files that may wait for embedding before parsing pauses
+        embed_batch_size: Chunks embedded and inserted per batch
+        checkpoint_every: Persist the index and manifest after this many indexed files
+        required_exts: Only index files with these extensions (e.g. ['.pdf', '.txt'])
+        force: Ignore the existing index and manifest and index everything
+        verbose: Print progress
+
+    Returns:
+        tuple: (index, stats) where stats is {'indexed', 'changed', 'deleted', 'unchanged',
+               'failed', 'chunks', 'checkpoints', 'elapsed_s'}
+    """
+    started = time.perf_counter()
+    workers = workers or os.cpu_count() or 1
+    required_exts = [e.lower() for e in required_exts] if required_exts else None
+
+    manifest = None if force else read_manifest(persist_dir)
+    if manifest is not None and manifest.get('settings') != index_settings():
+        if verbose:
+            print("Embedding or chunking settings changed, rebuilding the index")
+        manifest = None
+    known = manifest['files'] if manifest else {}
+    index = load_index(persist_dir) if manifest else VectorStoreIndex(nodes=[], storage_context=new_storage_context())
+
+    parsed = queue.Queue(maxsize=queue_size)
+    state = {'seen': set(), 'unchanged': {}, 'walk_complete': False}
+    stop = threading.Event()
+    producer = threading.Thread(
+        target=_produce, args=(input_dir, required_exts, known, workers, 2 * workers, parsed, state, stop),
+        daemon=True)
+    producer.start()
+
+    completed = {}    # files whose chunks are all in the index
+    batch, batch_files = [], {}
+    stats = {'indexed': 0, 'changed': 0, 'deleted': 0, 'unchanged': 0, 'failed': [], 'chunks': 0, 'checkpoints': 0}
+    since_checkpoint = 0
+
+    def flush():
+        """Embed and insert the batch; its files are complete afterwards."""
+        if batch:
+            texts = [node.get_content(metadata_mode=MetadataMode.EMBED) for node in batch]
+            for node, embedding in zip(batch, Settings.embed_model.get_text_embedding_batch(texts)):
+                node.embedding = embedding
+            index.insert_nodes(batch)
+            stats['chunks'] += len(batch)
+        completed.update(batch_files)
+        batch.clear()
+        batch_files.clear()
+
+    def checkpoint(files):
+        index.storage_context.persist(persist_dir=persist_dir)
+        write_manifest(persist_dir, {'settings': index_settings(), 'files': dict(sorted(files.items()))})
+        stats['checkpoints'] += 1
+        if verbose:
+            rate = stats['indexed'] / (time.perf_counter() - started)
+            print(f"Checkpoint: {stats['indexed']} files, {stats['chunks']} chunks indexed ({rate:.1f} files/s)")
+
+    try:
+        while True:
+            item = parsed.get()
+            if item is _DONE:
+                break
+            if isinstance(item, BaseException):
+                raise item
+            if 'error' in item:
+                stats['failed'].append(item['rel'])
+                if verbose:
+                    print(f"Skipping {item['rel']}: {item['error']}")
+                continue
+
+            rel = item['rel']
+            if rel in known:
+                # Changed file: replace its old chunks
+                for doc_id in known[rel]['doc_ids']:
+                    index.delete_ref_doc(doc_id, delete_from_docstore=True)
+                stats['changed'] += 1
+            batch.extend(item['nodes'])
+            batch_files[rel] = item['entry']
+            stats['indexed'] += 1
+            since_checkpoint += 1
+            if len(batch) >= embed_batch_size:
+                flush()
+            if since_checkpoint >= checkpoint_every:
+                # Everything taken off the queue is in the index, so index and manifest agree
+                flush()
+                checkpoint({**known, **completed})
+                since_checkpoint = 0
+        flush()
+    finally:
+        stop.set()  # lets the producer exit if we stopped early
+        producer.join()
+    if not state['walk_complete']:
+        raise RuntimeError("Ingestion stopped before the directory walk finished")
+
+    # Only now is the walk complete, so files missing from it were deleted
+    deleted = [rel for rel in known if rel not in state['seen']]
+    for rel in deleted:
+        for doc_id in known[rel]['doc_ids']:
+            index.delete_ref_doc(doc_id, delete_from_docstore=True)
+    files = {rel: entry for rel, entry in known.items() if rel in state['seen']}
+    files.update(state['unchanged'])
+    files.update(completed)
+    stats['deleted'] = len(deleted)
+    stats['unchanged'] = len(state['unchanged'])
+    if manifest is None or completed or deleted or files != known:
+        checkpoint(files)
+
+    stats['elapsed_s'] = round(time.perf_counter() - started, 3)
+    if verbose:
+        print(f"Indexed {stats['indexed']} files ({stats['changed']} changed, {stats['chunks']} chunks), "
+              f"removed {stats['deleted']}, kept {stats['unchanged']}, failed {len(stats['failed'])} "
+              f"in {stats['elapsed_s']:.1f}s")
+    return index, stats
+
+
+def main():
+    from document_indexer import configure_settings
+
+    parser = argparse.ArgumentParser(description="Stream a large document directory into the persisted index")
+    parser.add_argument('--docs', default='sample_documents', help="Directory with the documents")
+    parser.add_argument('--persist-dir', default='storage', help="Directory for the index and manifest")
+    parser.add_argument('--workers', type=int, help="Parser processes (default: number of CPUs)")
+    parser.add_argument('--batch-size', type=int, default=256, help="Chunks embedded per batch")
+    parser.add_argument('--queue-size', type=int, default=16, help="Parsed files buffered before parsing pauses")
+    parser.add_argument('--checkpoint-every', type=int, default=500, help="Files between checkpoints")
+    parser.add_argument('--ext', action='append', help="Only index this extension (repeatable), e.g. --ext .pdf")
+    parser.add_argument('--force', action='store_true', help="Rebuild the whole index")
+    args = parser.parse_args()
+
+    configure_settings()
+    try:
+        ingest_directory(args.docs, args.persist_dir, workers=args.workers, queue_size=args.queue_size,
+                         embed_batch_size=args.batch_size, checkpoint_every=args.checkpoint_every,
+                         required_exts=args.ext, force=args.force)
+    except (OSError, ValueError) as e:
+        print(f"Error: {e}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,621 @@
+"""
+NumPy Vector Store for LlamaIndex (Brute Force + IVF)
+
+LlamaIndex's default SimpleVectorStore keeps every embedding as a Python list,
+persists them as JSON and scores a query in pure Python, one node at a time.
+That is fine for two sample documents and painfully slow for a real corpus;
+Chroma and friends fix it, but need extra infrastructure.
+
+NumpyVectorStore keeps everything in one process:
+
+- embeddings are L2-normalised rows of one contiguous float32 matrix, persisted as
+  a flat binary file and memory-mapped on load (no JSON parsing, near-instant startup)
+- a query is one matrix-vector product (a batch of queries, one matrix-matrix
+  product) followed by np.argpartition for the top k, processed in row blocks
+- above ivf_threshold vectors it switches to an inverted-file (IVF) index: the
+  vectors are clustered with k-means and a query only scans the nprobe clusters
+  whose centroids are closest, trading a little recall for a large speed-up
+- metadata filters (file_name, file_type, dates, tags, doc ids) are answered by an
+  inverted MetadataIndex kept up to date with the vectors, and become boolean masks
+  that pre-filter the existing rows (cached until the store changes); very
+  selective filters are searched exactly on just the matching rows
+- the chunks' text goes into a BM25 keyword index (bm25_index.py) at ingestion time,
+  persisted next to the vectors; vector_store_query_mode="hybrid" fuses keyword and
+  vector results with reciprocal-rank fusion, "text_search" uses keywords only
+
+Usage:
+    vector_store = NumpyVectorStore()
+    storage_context = StorageContext.from_defaults(vector_store=vector_store)
+    index = VectorStoreIndex.from_documents(documents, storage_context=storage_context)
+    index.storage_context.persist("storage_numpy")
+
+    # Later
+    vector_store = NumpyVectorStore.from_persist_dir("storage_numpy")
+    storage_context = StorageContext.from_defaults(persist_dir="storage_numpy", vector_store=vector_store)
+    index = load_index_from_storage(storage_context)
+
+    # Keyword + vector retrieval
+    retriever = index.as_retriever(vector_store_query_mode="hybrid", similarity_top_k=10,
+                                   sparse_top_k=10, hybrid_top_k=5)
+"""
+
+import json
+import math
+import os
+
+import numpy as np
+from llama_index.core.schema import MetadataMode
+from llama_index.core.vector_stores.types import (
+    BasePydanticVectorStore,
+    FilterCondition,
+    FilterOperator,
+    MetadataFilters,
+    VectorStoreQuery,
+    VectorStoreQueryMode,
+    VectorStoreQueryResult,
+)
+from pydantic import PrivateAttr
+
+from bm25_index import BM25Index
+from metadata_index import MetadataIndex
+
+DEFAULT_PERSIST_FNAME = "default__vector_store.json"
+BLOCK_ELEMENTS = 1 << 24  # scores computed per block: 64 MB of float32
+RRF_K = 60  # rank constant of reciprocal-rank fusion (the value from the original paper)
+
+
+def _normalize(vectors):
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    return vectors / np.maximum(norms, 1e-12)
+
+
+def _merge_topk(best_scores, best_rows, scores, rows, k):
+    """Merge candidate (scores, rows) of shape (nq, m) into the running top k."""
+    if best_scores is not None:
+        scores = np.concatenate([best_scores, scores], axis=1)
+        rows = np.concatenate([best_rows, rows], axis=1)
+    if scores.shape[1] > k:
+        part = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+        scores = np.take_along_axis(scores, part, axis=1)
+        rows = np.take_along_axis(rows, part, axis=1)
+    return scores, rows
+
+
+def _sorted_topk(scores, rows):
+    order = np.argsort(-scores, axis=1, kind='stable')
+    return np.take_along_axis(scores, order, axis=1), np.take_along_axis(rows, order, axis=1)
+
+
+def kmeans(vectors, n_clusters, iterations=10, seed=0):
+    """Spherical k-means: unit-length centroids, assignment by largest dot product."""
+    rng = np.random.default_rng(seed)
+    centroids = vectors[rng.choice(len(vectors), n_clusters, replace=False)].copy()
+    for _ in range(iterations):
+        assign = _nearest(vectors, centroids)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, assign, vectors)
+        counts = np.bincount(assign, minlength=n_clusters)
+        empty = counts == 0
+        if empty.any():  # reseed empty clusters with random points
+            sums[empty] = vectors[rng.choice(len(vectors), int(empty.sum()), replace=False)]
+        centroids = _normalize(sums)
+    return centroids
+
+
+def reciprocal_rank_fusion(rankings, weights=None, k=RRF_K, top_n=None):
+    """
+    Fuse ranked lists of ids: every list adds weight / (k + rank) to each id it contains.
+
+    Only ranks are used, so BM25 scores and cosine similarities need no calibration
+    against each other.
+
+    Returns:
+        tuple: (scores, ids) best first
+    """
+    fused = {}
+    for ranking, weight in zip(rankings, weights or [1.0] * len(rankings)):
+        for rank, id_ in enumerate(ranking, start=1):
+            fused[id_] = fused.get(id_, 0.0) + weight / (k + rank)
+    ranked = sorted(fused.items(), key=lambda item: -item[1])[:top_n]
+    return [score for _, score in ranked], [id_ for id_, _ in ranked]
+
+
+def _nearest(vectors, centroids):
+    """Index of the closest centroid for every vector, computed in blocks."""
+    step = max(1, BLOCK_ELEMENTS // len(centroids))
+    return np.concatenate([
+        np.argmax(vectors[start:start + step] @ centroids.T, axis=1)
+        for start in range(0, len(vectors), step)
+    ]) if len(vectors) else np.zeros(0, dtype=np.int64)
+
+
+class NumpyVectorIndex:
+    """
+    Cosine-similarity search over a contiguous float32 matrix, with an optional IVF index.
+
+    Rows are addressed by string ids; every row can carry a flat metadata dict
+    (values may be lists of scalars, e.g. tags), indexed in metadata_index for
+    filtering. Deleted rows are masked out and dropped when the index is saved.
+    """
+
+    def __init__(self, ivf_threshold=50_000, nlist=None, nprobe=None, exact_fraction=0.05):
+        """
+        Args:
+            ivf_threshold: Use IVF search once this many vectors are stored (None to always scan)
+            nlist: Number of IVF clusters (default: sqrt of the number of vectors)
+            nprobe: Clusters scanned per query (default: 1/8 of nlist, at least 8)
+            exact_fraction: Filters matching at most this fraction of the rows are searched
+                            exactly on the matching rows, even in IVF mode
+        """
+        self.ivf_threshold = ivf_threshold
+        self.nlist = nlist
+        self.nprobe = nprobe
+        self.exact_fraction = exact_fraction
+        self.dim = None
+        self._vectors = np.zeros((0, 0), dtype=np.float32)
+        self._size = 0
+        self._alive = np.zeros(0, dtype=bool)
+        self.ids = []
+        self.metadata = []
+        self._row_of = {}
+        self.metadata_index = MetadataIndex()
+        self._masks = {}
+        self._ivf = None
+
+    def __len__(self):
+        return len(self._row_of)
+
+    @property
+    def vectors(self):
+        return self._vectors[:self._size]
+
+    # --- adding and deleting -------------------------------------------------
+
+    def _reserve(self, rows):
+        needed = self._size + rows
+        if needed <= len(self._vectors) and not isinstance(self._vectors, np.memmap):
+            return  # a memory-mapped (loaded) matrix is copied into memory on the first add
+        capacity = max(needed, 2 * len(self._vectors), 1024)
+        grown = np.empty((capacity, self.dim), dtype=np.float32)
+        grown[:self._size] = self._vectors[:self._size]
+        self._vectors = grown
+        alive = np.zeros(capacity, dtype=bool)
+        alive[:self._size] = self._alive[:self._size]
+        self._alive = alive
+
+    def add(self, ids, vectors, metadata=None):
+        """Add (or replace) vectors; returns their row numbers."""
+        vectors = _normalize(vectors)
+        if vectors.ndim != 2 or len(vectors) != len(ids):
+            raise ValueError("Expected one vector per id")
+        if self.dim is None:
+            self.dim = vectors.shape[1]
+            self._vectors = np.zeros((0, self.dim), dtype=np.float32)
+        elif vectors.shape[1] != self.dim:
+            raise ValueError(f"Expected {self.dim}-dimensional vectors, got {vectors.shape[1]}")
+
+        self.delete([id_ for id_ in ids if id_ in self._row_of])
+        self._reserve(len(ids))
+        start = self._size
+        self._vectors[start:start + len(ids)] = vectors
+        self._alive[start:start + len(ids)] = True
+        self._size += len(ids)
+        for i, id_ in enumerate(ids):
+            self._row_of[id_] = start + i
+        self.ids.extend(ids)
+        metadata = list(metadata) if metadata is not None else [{}] * len(ids)
+        self.metadata.extend(metadata)
+        self.metadata_index.add(start, metadata)
+        self._masks.clear()
+        if self._ivf is not None:
+            # Rows added after training are not in the clustered prefix; search
+            # finds them through their nearest centroid
+            self._ivf['tail_assign'] = np.concatenate([self._ivf['tail_assign'],
+                                                       _nearest(vectors, self._ivf['centroids'])])
+        return list(range(start, start + len(ids)))
+
+    def delete(self, ids):
+        rows = [self._row_of.pop(id_) for id_ in ids if id_ in self._row_of]
+        if rows:
+            self._alive[rows] = False
+            for row in rows:
+                self.metadata_index.remove(row, self.metadata[row])
+            self._masks.clear()
+
+    def clear(self):
+        self.__init__(self.ivf_threshold, self.nlist, self.nprobe, self.exact_fraction)
+
+    def _take(self, rows):
+        """Keep only the given rows, in the given order (drops the IVF index)."""
+        self._vectors = np.ascontiguousarray(self._vectors[rows])
+        self._alive = self._alive[rows]
+        self.ids = [self.ids[i] for i in rows]
+        self.metadata = [self.metadata[i] for i in rows]
+        self._size = len(rows)
+        self._row_of = {id_: row for row, id_ in enumerate(self.ids) if self._alive[row]}
+        self.metadata_index = MetadataIndex.from_metadata(self.metadata, self._alive)
+        self._masks.clear()
+        self._ivf = None
+
+    # --- metadata masks ------------------------------------------------------
+
+    def mask(self, key, operator, value):
+        """Boolean mask of the rows whose metadata[key] satisfies the operator (cached)."""
+        cache_key = (key, operator, json.dumps(value, sort_keys=True, default=str))
+        mask = self._masks.get(cache_key)
+        if mask is None:
+            mask = self._masks[cache_key] = self._compute_mask(key, operator, value)
+        return mask
+
+    def _compute_mask(self, key, operator, value):
+        mask = np.zeros(self._size, dtype=bool)
+        if operator == 'is_empty':
+            mask[self.metadata_index.rows_without(key, self._size)] = True
+        else:
+            mask[self.metadata_index.rows(key, operator, value)] = True
+        return mask
+
+    def ids_mask(self, ids):
+        mask = np.zeros(self._size, dtype=bool)
+        rows = [self._row_of[id_] for id_ in ids if id_ in self._row_of]
+        mask[rows] = True
+        return mask
+
+    # --- search --------------------------------------------------------------
+
+    def search(self, queries, k=5, mask=None, exact=None):
+        """
+        Top-k cosine similarity search.
+
+        Args:
+            queries: One query vector, or a (nq, dim) batch
+            k: Results per query
+            mask: Boolean array over rows; only rows where it is True are returned
+            exact: Force (True) or forbid (False) a full scan; by default IVF is used
+                   at or above ivf_threshold vectors
+
+        Returns:
+            tuple: (scores, rows), arrays of shape (nq, <=k) sorted best first
+                   (1-d arrays for a single query)
+        """
+        single = np.ndim(queries) == 1
+        queries = _normalize(np.atleast_2d(queries))
+        if mask is not None and len(mask) != self._size:
+            raise ValueError("The mask does not match the index; build it again after adding vectors")
+
+        use_ivf = exact is False or (exact is None and self.ivf_threshold is not None
+                                     and len(self) >= self.ivf_threshold)
+        if use_ivf and (self._ivf is None or len(self) > 2 * self._ivf['trained_size']):
+            order = self.build_ivf()
+            if mask is not None:
+                mask = mask[order]  # the rows were reordered by cluster
+
+        valid = self._alive[:self._size] if mask is None else self._alive[:self._size] & mask
+        n_valid = int(valid.sum())
+        k = min(k, n_valid)
+        if k == 0:
+            empty = np.zeros((len(queries), 0))
+            result = (empty.astype(np.float32), empty.astype(np.int64))
+        elif n_valid <= self.exact_fraction * self._size or n_valid < 4 * k:
+            result = self._scan(queries, k, np.flatnonzero(valid))
+        elif use_ivf:
+            result = self._search_ivf(queries, k, valid)
+        else:
+            result = self._scan(queries, k, None if n_valid == self._size else valid)
+        return (result[0][0], result[1][0]) if single else result
+
+    def _scan(self, queries, k, rows=None):
+        """Exact search over all rows (rows=None), the rows of a boolean mask, or a row array."""
+        mask = None
+        if rows is not None and rows.dtype == bool:
+            # Gathering the matching rows is cheaper than scoring everything and
+            # discarding most of it, unless the mask keeps most rows
+            if rows.sum() <= 0.25 * len(rows):
+                rows = np.flatnonzero(rows)
+            else:
+                mask, rows = rows, None
+        total = self._size if rows is None else len(rows)
+        step = max(k, BLOCK_ELEMENTS // len(queries))
+        best_scores = best_rows = None
+        for start in range(0, total, step):
+            if rows is None:
+                stop = min(start + step, total)
+                block_rows = np.arange(start, stop)
+                scores = queries @ self._vectors[start:stop].T
+                if mask is not None:
+                    scores[:, ~mask[start:stop]] = -np.inf
+            else:
+                block_rows = rows[start:start + step]
+                scores = queries @ self._vectors[block_rows].T
+            candidates = np.broadcast_to(block_rows, scores.shape)
+            best_scores, best_rows = _merge_topk(best_scores, best_rows, scores, candidates, k)
+        return _sorted_topk(best_scores, best_rows)
+
+    def build_ivf(self, nlist=None, iterations=10, sample_size=None, seed=0):
+        """
+        Cluster the vectors for IVF search (called automatically when needed).
+
+        The rows are reordered so that every cluster is one contiguous block of the
+        matrix, and a probe is a slice rather than a gather of scattered rows.
+
+        Returns:
+            array: the previous row number of every row, in the new order
+        """
+        kept = np.flatnonzero(self._alive[:self._size])
+        self._take(kept)
+        nlist = min(nlist or self.nlist or max(1, int(math.sqrt(self._size))), self._size)
+        sample_size = min(self._size, sample_size or max(64 * nlist, 10_000))
+        rng = np.random.default_rng(seed)
+        sample = self._vectors[np.sort(rng.choice(self._size, sample_size, replace=False))]
+        centroids = kmeans(sample, nlist, iterations, seed)
+
+        assign = _nearest(self._vectors, centroids)
+        order = np.argsort(assign, kind='stable')
+        self._take(order)
+        self._set_ivf(centroids, assign[order], self._size)
+        return kept[order]
+
+    def _set_ivf(self, centroids, assign, sorted_size):
+        self._ivf = {
+            'centroids': centroids,
+            'offsets': np.searchsorted(assign[:sorted_size], np.arange(len(centroids) + 1)),
+            'sorted_size': sorted_size,
+            'tail_assign': np.asarray(assign[sorted_size:], dtype=np.int64),
+            'trained_size': sorted_size,
+        }
+
+    def _ivf_assign(self):
+        """Cluster of every row: the sorted prefix followed by rows added since training."""
+        ivf = self._ivf
+        prefix = np.repeat(np.arange(len(ivf['centroids'])), np.diff(ivf['offsets']))
+        return np.concatenate([prefix, ivf['tail_assign']])
+
+    def _search_ivf(self, queries, k, valid):
+        ivf = self._ivf
+        centroids, offsets = ivf['centroids'], ivf['offsets']
+        tail_start = ivf['sorted_size']
+        nprobe = min(len(centroids), self.nprobe or max(8, len(centroids) // 8))
+        probes = np.argpartition(-(queries @ centroids.T), nprobe - 1, axis=1)[:, :nprobe]
+
+        all_scores, all_rows = [], []
+        for query, clusters in zip(queries, probes):
+            scores = [self._vectors[offsets[c]:offsets[c + 1]] @ query for c in clusters]
+            rows = [np.arange(offsets[c], offsets[c + 1]) for c in clusters]
+            if len(ivf['tail_assign']):
+                tail = tail_start + np.flatnonzero(np.isin(ivf['tail_assign'], clusters))
+                scores.append(self._vectors[tail] @ query)
+                rows.append(tail)
+            scores, rows = np.concatenate(scores), np.concatenate(rows)
+            keep = valid[rows]
+            if keep.sum() < k:  # not enough candidates near the query: fall back to a scan
+                scores, rows = self._scan(query[None], k, valid)
+            else:
+                scores, rows = _sorted_topk(*_merge_topk(None, None, scores[keep][None], rows[keep][None], k))
+            all_scores.append(scores[0])
+            all_rows.append(rows[0])
+        return np.stack(all_scores), np.stack(all_rows)
+
+    # --- persistence ---------------------------------------------------------
+
+    def save(self, path):
+        """Write path (ids, metadata, settings as JSON) and path + '.f32' (the vectors)."""
+        keep = np.flatnonzero(self._alive[:self._size])
+        vectors = np.ascontiguousarray(self._vectors[keep])
+        with open(path + '.f32.tmp', 'wb') as f:
+            vectors.tofile(f)
+        state = {
+            'dim': self.dim,
+            'ids': [self.ids[i] for i in keep],
+            'metadata': [self.metadata[i] for i in keep],
+            'ivf_threshold': self.ivf_threshold,
+            'nlist': self.nlist,
+            'nprobe': self.nprobe,
+        }
+        if self._ivf is not None:
+            # Dropping deleted rows keeps the clustered prefix sorted by cluster
+            sorted_size = int(np.searchsorted(keep, self._ivf['sorted_size']))
+            with open(path + '.ivf.tmp', 'wb') as f:
+                np.savez(f, centroids=self._ivf['centroids'], assign=self._ivf_assign()[keep],
+                         sorted_size=sorted_size)
+            os.replace(path + '.ivf.tmp', path + '.ivf.npz')
+        elif os.path.exists(path + '.ivf.npz'):
+            os.remove(path + '.ivf.npz')
+        with open(path + '.tmp', 'w') as f:
+            json.dump(state, f)
+        os.replace(path + '.f32.tmp', path + '.f32')
+        os.replace(path + '.tmp', path)
+
+    @classmethod
+    def load(cls, path, mmap=True):
+        """Load a saved index; the vectors are memory-mapped until the first add()."""
+        with open(path) as f:
+            state = json.load(f)
+        index = cls(state['ivf_threshold'], state['nlist'], state['nprobe'])
+        index.dim = state['dim']
+        index.ids = state['ids']
+        index.metadata = state['metadata']
+        index._row_of = {id_: row for row, id_ in enumerate(index.ids)}
+        index.metadata_index = MetadataIndex.from_metadata(index.metadata)
+        index._size = len(index.ids)
+        index._alive = np.ones(index._size, dtype=bool)
+        if index.dim is None:
+            return index
+        if mmap and index._size:
+            index._vectors = np.memmap(path + '.f32', dtype=np.float32, mode='r', shape=(index._size, index.dim))
+        else:
+            index._vectors = np.fromfile(path + '.f32', dtype=np.float32).reshape(index._size, index.dim)
+        if os.path.exists(path + '.ivf.npz'):
+            with np.load(path + '.ivf.npz') as ivf:
+                index._set_ivf(ivf['centroids'], ivf['assign'], int(ivf['sorted_size']))
+        return index
+
+
+_OPERATORS = {
+    FilterOperator.EQ: '==', FilterOperator.NE: '!=', FilterOperator.IN: 'in', FilterOperator.NIN: 'nin',
+    FilterOperator.GT: '>', FilterOperator.LT: '<', FilterOperator.GTE: '>=', FilterOperator.LTE: '<=',
+    FilterOperator.TEXT_MATCH: 'text_match', FilterOperator.TEXT_MATCH_INSENSITIVE: 'text_match_insensitive',
+    FilterOperator.IS_EMPTY: 'is_empty', FilterOperator.CONTAINS: 'contains', FilterOperator.ANY: 'any',
+    FilterOperator.ALL: 'all',
+}
+
+
+def _filterable(value):
+    if isinstance(value, list):
+        return all(isinstance(v, (str, int, float, bool)) for v in value)
+    return value is None or isinstance(value, (str, int, float, bool))
+
+
+class NumpyVectorStore(BasePydanticVectorStore):
+    """LlamaIndex vector store backed by a NumpyVectorIndex."""
+
+    stores_text: bool = False
+    flat_metadata: bool = True
+
+    _index = PrivateAttr()
+    _keywords = PrivateAttr()
+    _version = PrivateAttr(default=0)
+
+    def __init__(self, index=None, ivf_threshold=50_000, nlist=None, nprobe=None, keyword_index=None, **kwargs):
+        super().__init__(**kwargs)
+        self._index = index or NumpyVectorIndex(ivf_threshold, nlist, nprobe)
+        self._keywords = keyword_index or BM25Index()
+
+    @classmethod
+    def class_name(cls):
+        return "NumpyVectorStore"
+
+    @classmethod
+    def from_persist_path(cls, persist_path, fs=None):
+        keywords = BM25Index.load(persist_path + '.bm25') if os.path.exists(persist_path + '.bm25.json') else None
+        return cls(NumpyVectorIndex.load(persist_path), keyword_index=keywords)
+
+    @classmethod
+    def from_persist_dir(cls, persist_dir):
+        return cls.from_persist_path(os.path.join(persist_dir, DEFAULT_PERSIST_FNAME))
+
+    @property
+    def client(self):
+        return self._index
+
+    @property
+    def metadata_index(self):
+        return self._index.metadata_index
+
+    @property
+    def keyword_index(self):
+        return self._keywords
+
+    @property
+    def version(self):
+        """Incremented whenever nodes are added or deleted (e.g. to invalidate cached answers)."""
+        return self._version
+
+    def add(self, nodes, **add_kwargs):
+        if not nodes:
+            return []
+        ids = [node.node_id for node in nodes]
+        metadata = []
+        for node in nodes:
+            meta = {k: v for k, v in node.metadata.items() if _filterable(v)}
+            meta['ref_doc_id'] = node.ref_doc_id
+            metadata.append(meta)
+        self._index.add(ids, [node.get_embedding() for node in nodes], metadata)
+        self._keywords.add(ids, [node.get_content(metadata_mode=MetadataMode.NONE) for node in nodes])
+        self._version += 1
+        return ids
+
+    def _delete_rows(self, mask):
+        ids = [self._index.ids[row] for row in np.flatnonzero(mask)]
+        if ids:
+            self._index.delete(ids)
+            self._keywords.delete(ids)
+            self._version += 1
+
+    def delete(self, ref_doc_id, **delete_kwargs):
+        self._delete_rows(self._index.mask('ref_doc_id', '==', ref_doc_id))
+
+    def delete_nodes(self, node_ids=None, filters=None, **delete_kwargs):
+        mask = self._filters_mask(filters)
+        if node_ids is not None:
+            mask &= self._index.ids_mask(node_ids)
+        self._delete_rows(mask)
+
+    def clear(self):
+        self._index.clear()
+        self._keywords.clear()
+        self._version += 1
+
+    def _filters_mask(self, filters):
+        mask = self._index._alive[:self._index._size].copy()
+        if filters is None:
+            return mask
+        masks = []
+        for f in filters.filters:
+            if isinstance(f, MetadataFilters):
+                masks.append(self._filters_mask(f))
+            else:
+                masks.append(self._index.mask(f.key, _OPERATORS[f.operator], f.value))
+        if not masks:
+            return mask
+        if filters.condition == FilterCondition.OR:
+            combined = np.logical_or.reduce(masks)
+        elif filters.condition == FilterCondition.NOT:
+            combined = ~np.logical_or.reduce(masks)
+        else:
+            combined = np.logical_and.reduce(masks)
+        return mask & combined
+
+    def query(self, query: VectorStoreQuery, **kwargs):
+        """
+        Dense (default), keyword (text_search / sparse) or hybrid search.
+
+        Hybrid search takes the similarity_top_k best chunks by vector and the
+        sparse_top_k best by BM25 and fuses the two rankings with reciprocal-rank
+        fusion into hybrid_top_k results (alpha, if given, weights the vector
+        ranking against the keyword ranking). Filters apply to both.
+        """
+        dense_modes = (VectorStoreQueryMode.DEFAULT, VectorStoreQueryMode.HYBRID)
+        keyword_modes = (VectorStoreQueryMode.TEXT_SEARCH, VectorStoreQueryMode.SPARSE, VectorStoreQueryMode.HYBRID)
+        if query.mode not in dense_modes + keyword_modes:
+            raise ValueError(f"NumpyVectorStore does not support query mode {query.mode}")
+        mask = self._filters_mask(query.filters)
+        if query.doc_ids:
+            mask &= self._index.mask('ref_doc_id', 'in', list(query.doc_ids))
+        if query.node_ids:
+            mask &= self._index.ids_mask(query.node_ids)
+        restricted = bool(query.filters or query.doc_ids or query.node_ids)
+        # Row numbers are only valid until the next search: it may (re)build the IVF index,
+        # which compacts and reorders the rows. Resolve the keyword filter to ids first.
+        keyword_ids = None
+        if restricted and query.mode in keyword_modes:
+            keyword_ids = [self._index.ids[row] for row in np.flatnonzero(mask)]
+
+        rankings = []
+        if query.mode in dense_modes:
+            if query.query_embedding is None:
+                raise ValueError("NumpyVectorStore needs a query embedding")
+            scores, rows = self._index.search(query.query_embedding, query.similarity_top_k, mask)
+            rankings.append(([float(s) for s in scores], [self._index.ids[row] for row in rows]))
+        if query.mode in keyword_modes:
+            if not query.query_str:
+                raise ValueError("Keyword search needs the query text")
+            keyword_mask = None if keyword_ids is None else self._keywords.ids_mask(keyword_ids)
+            scores, ids = self._keywords.search(query.query_str, query.sparse_top_k or query.similarity_top_k,
+                                                keyword_mask)
+            rankings.append(([float(s) for s in scores], ids))
+
+        if query.mode == VectorStoreQueryMode.HYBRID:
+            weights = None if query.alpha is None else [query.alpha, 1 - query.alpha]
+            similarities, ids = reciprocal_rank_fusion(
+                [ids for _, ids in rankings], weights, top_n=query.hybrid_top_k or query.similarity_top_k)
+        else:
+            similarities, ids = rankings[0]
+        return VectorStoreQueryResult(similarities=similarities, ids=ids)
+
+    def persist(self, persist_path=os.path.join("storage", DEFAULT_PERSIST_FNAME), fs=None):
+        directory = os.path.dirname(persist_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._index.save(persist_path)
+        self._keywords.save(persist_path + '.bm25')
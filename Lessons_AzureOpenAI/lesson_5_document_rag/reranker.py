@@ -0,0 +1,82 @@
+"""
+Cross-Encoder Reranking with a Latency Budget
+
+Retrievers score the question and each chunk separately (one embedding each, or
+keyword overlap). A cross-encoder reads the question and the chunk together and
+judges relevance much more precisely, which makes it a good second stage over a
+few dozen fused candidates: the LLM then sees the chunks that actually answer
+the question, and fewer follow-up questions are needed.
+
+It runs locally (a small sentence-transformers model, no API calls), but it does
+cost CPU time per candidate, so CrossEncoderReranker:
+
+- scores candidates in retrieval order, in small batches, and stops starting new
+  batches once the latency budget would be exceeded
+- puts the scored candidates first (by cross-encoder score), followed by the
+  unscored ones in their original order
+- passes the candidates through unchanged if sentence-transformers is not installed
+
+Usage:
+    reranker = CrossEncoderReranker(top_n=3, latency_budget_ms=300)
+    query_engine = RetrieverQueryEngine(retriever=hybrid_retriever, node_postprocessors=[reranker])
+
+    pip install sentence-transformers   # optional
+"""
+
+import time
+from functools import lru_cache
+from typing import Optional
+
+from llama_index.core.postprocessor.types import BaseNodePostprocessor
+from llama_index.core.schema import MetadataMode, NodeWithScore
+
+DEFAULT_MODEL = "cross-encoder/ms-marco-MiniLM-L-6-v2"
+
+
+@lru_cache(maxsize=None)
+def load_cross_encoder(model):
+    """Load a sentence-transformers CrossEncoder once per process, or None if the package is missing."""
+    try:
+        from sentence_transformers import CrossEncoder
+    except ImportError:
+        print("⚠️ sentence-transformers is not installed; results are not reranked")
+        return None
+    return CrossEncoder(model)
+
+
+class CrossEncoderReranker(BaseNodePostprocessor):
+    """Reorders retrieved nodes by cross-encoder relevance, within a latency budget."""
+
+    model: str = DEFAULT_MODEL
+    top_n: Optional[int] = 3
+    latency_budget_ms: float = 300.0
+    batch_size: int = 8
+
+    @classmethod
+    def class_name(cls):
+        return "CrossEncoderReranker"
+
+    def _postprocess_nodes(self, nodes, query_bundle=None):
+        if query_bundle is None or not nodes:
+            return nodes[:self.top_n]
+        encoder = load_cross_encoder(self.model)  # loading the model is not counted against the budget
+        if encoder is None:
+            return nodes[:self.top_n]
+
+        started = time.perf_counter()
+        budget = self.latency_budget_ms / 1000
+        scored = []
+        batch_time = 0.0
+        for start in range(0, len(nodes), self.batch_size):
+            elapsed = time.perf_counter() - started
+            if scored and elapsed + batch_time > budget:
+                break
+            batch = nodes[start:start + self.batch_size]
+            batch_started = time.perf_counter()
+            scores = encoder.predict([(query_bundle.query_str, n.node.get_content(metadata_mode=MetadataMode.NONE))
+                                      for n in batch])
+            batch_time = time.perf_counter() - batch_started
+            scored.extend(NodeWithScore(node=n.node, score=float(s)) for n, s in zip(batch, scores))
+
+        scored.sort(key=lambda n: -n.score)
+        return (scored + nodes[len(scored):])[:self.top_n]
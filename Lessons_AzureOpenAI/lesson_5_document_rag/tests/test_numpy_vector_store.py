@@ -0,0 +1,55 @@
+"""Regression tests for NumpyVectorStore (run with: python -m pytest tests)."""
+
+import os
+import sys
+
+import numpy as np
+import pytest
+
+pytest.importorskip("llama_index.core")
+from llama_index.core.schema import NodeRelationship, RelatedNodeInfo, TextNode
+from llama_index.core.vector_stores.types import (
+    MetadataFilter,
+    MetadataFilters,
+    VectorStoreQuery,
+    VectorStoreQueryMode,
+)
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from numpy_vector_store import NumpyVectorStore
+
+
+def make_nodes(n, files=10, dim=16, seed=0):
+    rng = np.random.default_rng(seed)
+    nodes = []
+    for i in range(n):
+        file_name = f"f{i % files}.pdf"
+        node = TextNode(id_=f"node-{i}", text=f"quarterly revenue report section {i % 7} of {file_name}",
+                        metadata={"file_name": file_name}, embedding=rng.standard_normal(dim).tolist())
+        node.relationships[NodeRelationship.SOURCE] = RelatedNodeInfo(node_id=f"doc-{i % files}")
+        nodes.append(node)
+    return nodes
+
+
+def hybrid_query(nodes, file_name):
+    return VectorStoreQuery(
+        query_embedding=nodes[0].embedding, query_str="quarterly revenue report", similarity_top_k=10,
+        mode=VectorStoreQueryMode.HYBRID,
+        filters=MetadataFilters(filters=[MetadataFilter(key="file_name", value=file_name)]),
+    )
+
+
+@pytest.mark.parametrize("delete_first", [False, True])
+def test_filtered_hybrid_query_survives_ivf_rebuild(delete_first):
+    nodes = make_nodes(3000)
+    store = NumpyVectorStore(ivf_threshold=1000)
+    store.add(nodes)
+    if delete_first:
+        store.delete("doc-0")    # leaves dead rows that the IVF rebuild compacts away
+
+    # The first search above ivf_threshold builds the IVF index, reordering the rows
+    result = store.query(hybrid_query(nodes, "f3.pdf"))
+
+    by_id = {node.node_id: node for node in nodes}
+    assert result.ids
+    assert {by_id[node_id].metadata["file_name"] for node_id in result.ids} == {"f3.pdf"}
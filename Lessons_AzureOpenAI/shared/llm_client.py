@@ -0,0 +1,430 @@
+"""
+Shared LLM Client: Connection Pooling, Retries, Hedging and Request Coalescing
+
+Every notebook and example used to build its own OpenAI/AzureOpenAI client with
+the SDK defaults. Under load the slowest requests are rarely slow generations:
+they are transient failures (429 rate limits, 5xx errors, dropped connections)
+that surface as errors or long waits, and requests that open a new connection
+(TCP + TLS handshake) instead of reusing one. get_client() builds one client per
+process that all lessons share:
+
+- a tuned httpx connection pool: connections are kept alive and reused across
+  requests and threads, with explicit connect and read timeouts
+- retries with jittered exponential backoff on 429, 5xx, timeouts and connection
+  errors, honouring the server's Retry-After header
+- optional hedging: a request still running after the p95 latency of recent
+  requests (or a fixed hedge_after_s) is sent a second time, and whichever
+  response arrives first is used. It costs a duplicate request for the slowest
+  few percent, so it suits short calls (routing, SQL generation)
+- coalescing: identical requests in flight at the same time (same method and
+  arguments, e.g. the same question from several threads) are sent once and
+  share the response
+- the provider (OpenAI or Azure OpenAI), credentials and MODEL come from the
+  environment, in one place
+
+The client has the SDK's interface (client.responses.create,
+client.chat.completions.create, client.embeddings.create, ...), so code written
+for a plain OpenAI client works unchanged. Streaming requests (stream=True) are
+retried if the request fails, but never hedged or coalesced.
+
+Environment:
+    LLM_PROVIDER: "openai" or "azure" (default: this track's provider)
+    OpenAI: OPENAI_API_KEY, OPENAI_MODEL (default gpt-4.1)
+    Azure OpenAI: AZURE_OPENAI_KEY, AZURE_OPENAI_ENDPOINT, AZURE_OPENAI_DEPLOYMENT_NAME,
+                  AZURE_OPENAI_VERSION, AZURE_OPENAI_MODEL
+
+Usage:
+    from shared.llm_client import get_client, MODEL
+    client = get_client()
+    response = client.responses.create(model=MODEL, input="Hello")
+
+    async_client = get_client(async_client=True, hedge=True)
+    print(client.stats)   # requests, retries, hedges, coalesced, latency percentiles
+"""
+
+import asyncio
+import contextvars
+import functools
+import hashlib
+import json
+import os
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+
+import httpx
+import openai
+from dotenv import find_dotenv, load_dotenv
+
+load_dotenv(find_dotenv(usecwd=True))
+
+DEFAULT_PROVIDER = "azure"
+RETRY_STATUS = {408, 409, 429}          # plus every 5xx
+
+
+def get_provider():
+    """'openai' or 'azure': LLM_PROVIDER if set, otherwise this track's provider."""
+    provider = os.environ.get("LLM_PROVIDER", "").strip().lower()
+    return provider if provider in ("openai", "azure") else DEFAULT_PROVIDER
+
+
+def get_model(provider=None):
+    """The model (Azure: deployment model) name configured for the provider."""
+    if (provider or get_provider()) == "azure":
+        return os.environ.get("AZURE_OPENAI_MODEL")
+    return os.environ.get("OPENAI_MODEL", "gpt-4.1")
+
+
+MODEL = get_model()
+
+
+# --- policies ----------------------------------------------------------------
+
+def _jsonable(value):
+    if hasattr(value, 'model_dump'):
+        return value.model_dump(exclude_none=True)
+    raise TypeError(f"not serialisable: {type(value).__name__}")
+
+
+def _retryable(error):
+    if isinstance(error, openai.APIConnectionError):      # includes APITimeoutError
+        return True
+    if isinstance(error, openai.APIStatusError):
+        return error.status_code in RETRY_STATUS or error.status_code >= 500
+    return False
+
+
+def _retry_after(error):
+    """Seconds the server asked us to wait (Retry-After / retry-after-ms), or None."""
+    response = getattr(error, 'response', None)
+    headers = getattr(response, 'headers', None) or {}
+    try:
+        if headers.get('retry-after-ms'):
+            return float(headers['retry-after-ms']) / 1000
+        if headers.get('retry-after'):
+            return float(headers['retry-after'])
+    except ValueError:
+        pass  # an HTTP date; fall back to the backoff
+    return None
+
+
+def _percentile(values, q):
+    if not values:
+        return None
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q * len(values)))]
+
+
+class _Resource:
+    """Mirrors an SDK resource (client.responses, client.chat.completions, ...); create() goes through the policies."""
+
+    def __init__(self, owner, target, path):
+        self._owner = owner
+        self._target = target
+        self._path = path
+
+    def __getattr__(self, name):
+        target = getattr(self._target, name)
+        if name == "create":
+            return functools.partial(self._owner._create, self._path + "." + name, target)
+        if hasattr(target, 'with_raw_response'):               # a nested resource
+            return _Resource(self._owner, target, self._path + "." + name)
+        return target
+
+
+class _PolicyClient:
+    """What the sync and async clients share: settings, backoff, latency tracking and stats."""
+
+    def __init__(self, client, max_retries=3, backoff_s=0.5, max_backoff_s=20.0, hedge=False,
+                 hedge_after_s=None, hedge_min_samples=20, coalesce=True):
+        """
+        Args:
+            client: The SDK client (OpenAI, AzureOpenAI, AsyncOpenAI or AsyncAzureOpenAI)
+            max_retries: Retries of a request after a retryable error
+            backoff_s: Base of the exponential backoff; attempt n waits up to backoff_s * 2**n
+            max_backoff_s: Longest wait between attempts
+            hedge: Send a second request when the first is slower than the hedge deadline
+            hedge_after_s: Fixed hedge deadline in seconds (default: p95 of recent latencies,
+                           once hedge_min_samples requests of that method have completed)
+            hedge_min_samples: Latencies needed before the p95 deadline is used
+            coalesce: Share one request between identical requests in flight
+        """
+        self.raw = client
+        self.max_retries = max_retries
+        self.backoff_s = backoff_s
+        self.max_backoff_s = max_backoff_s
+        self.hedge = hedge
+        self.hedge_after_s = hedge_after_s
+        self.hedge_min_samples = hedge_min_samples
+        self.coalesce = coalesce
+        self._latencies = {}      # method path -> recent latencies (seconds)
+        self._inflight = {}       # request key -> future shared by identical requests
+        self._lock = threading.Lock()
+        self._stats = {'requests': 0, 'retries': 0, 'hedges': 0, 'hedge_wins': 0, 'coalesced': 0, 'errors': 0}
+
+    def __getattr__(self, name):
+        if name == "raw":
+            raise AttributeError(name)
+        target = getattr(self.raw, name)
+        return _Resource(self, target, name) if hasattr(target, 'with_raw_response') else target
+
+    def _count(self, stat):
+        with self._lock:
+            self._stats[stat] += 1
+
+    def _backoff(self, error, attempt):
+        """Seconds to wait before retrying, or None if the error is not retried."""
+        if attempt >= self.max_retries or not _retryable(error):
+            return None
+        retry_after = _retry_after(error)
+        if retry_after is not None:
+            return min(retry_after, self.max_backoff_s)
+        # Full jitter: clients that failed together don't retry together
+        return random.uniform(0, min(self.max_backoff_s, self.backoff_s * 2 ** attempt))
+
+    def _key(self, path, kwargs):
+        """Identity of a request for coalescing (None: never coalesced)."""
+        if not self.coalesce or kwargs.get('stream'):
+            return None
+        try:
+            payload = json.dumps([path, kwargs], sort_keys=True, default=_jsonable)
+        except (TypeError, ValueError):
+            return None
+        return hashlib.sha256(payload.encode()).hexdigest()
+
+    def _hedge_delay(self, path, kwargs):
+        if not self.hedge or kwargs.get('stream'):
+            return None
+        if self.hedge_after_s is not None:
+            return self.hedge_after_s
+        with self._lock:
+            latencies = list(self._latencies.get(path, ()))
+        return _percentile(latencies, 0.95) if len(latencies) >= self.hedge_min_samples else None
+
+    def _record(self, path, seconds):
+        with self._lock:
+            self._latencies.setdefault(path, deque(maxlen=200)).append(seconds)
+
+    @property
+    def stats(self):
+        """Request counts, and latency percentiles (seconds) of recent successful requests."""
+        with self._lock:
+            latencies = [s for values in self._latencies.values() for s in values]
+            stats = dict(self._stats)
+        p50, p95 = _percentile(latencies, 0.5), _percentile(latencies, 0.95)
+        return {**stats, 'latency_p50_s': round(p50, 3) if p50 is not None else None,
+                'latency_p95_s': round(p95, 3) if p95 is not None else None}
+
+
+class LLMClient(_PolicyClient):
+    """A sync SDK client whose create() calls are pooled, retried, optionally hedged and coalesced."""
+
+    def __init__(self, client, max_workers=16, **options):
+        super().__init__(client, **options)
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="llm-hedge")
+
+    def _create(self, path, method, **kwargs):
+        self._count('requests')
+        key = self._key(path, kwargs)
+        if key is None:
+            return self._send(path, method, kwargs)
+        with self._lock:
+            shared = self._inflight.get(key)
+            if shared is None:
+                future = self._inflight[key] = Future()
+            else:
+                self._stats['coalesced'] += 1
+        if shared is not None:
+            return shared.result()
+        try:
+            result = self._send(path, method, kwargs)
+            future.set_result(result)
+            return result
+        except Exception as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+
+    def _send(self, path, method, kwargs):
+        started = time.perf_counter()
+        delay = self._hedge_delay(path, kwargs)
+        try:
+            result = self._attempts(method, kwargs) if delay is None else self._hedged(method, kwargs, delay)
+        except Exception:
+            self._count('errors')
+            raise
+        if not kwargs.get('stream'):
+            self._record(path, time.perf_counter() - started)
+        return result
+
+    def _attempts(self, method, kwargs):
+        attempt = 0
+        while True:
+            try:
+                return method(**kwargs)
+            except Exception as e:
+                delay = self._backoff(e, attempt)
+                if delay is None:
+                    raise
+                self._count('retries')
+                time.sleep(delay)
+                attempt += 1
+
+    def _hedged(self, method, kwargs, delay):
+        # copy_context(): tracing spans opened around the call still apply in the pool threads
+        primary = self._pool.submit(contextvars.copy_context().run, self._attempts, method, kwargs)
+        done, _ = wait([primary], timeout=delay)
+        if done:
+            return primary.result()
+        self._count('hedges')
+        backup = self._pool.submit(contextvars.copy_context().run, self._attempts, method, kwargs)
+        pending = {primary, backup}
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is None:
+                    if future is backup:
+                        self._count('hedge_wins')
+                    return future.result()   # the other request finishes in the background, unused
+        return primary.result()              # both failed: raise the first request's error
+
+    def close(self):
+        self._pool.shutdown(wait=False, cancel_futures=True)
+        self.raw.close()
+
+
+class AsyncLLMClient(_PolicyClient):
+    """The async counterpart of LLMClient (AsyncOpenAI / AsyncAzureOpenAI); the losing hedge is cancelled."""
+
+    async def _create(self, path, method, **kwargs):
+        self._count('requests')
+        key = self._key(path, kwargs)
+        if key is None:
+            return await self._send(path, method, kwargs)
+        shared = self._inflight.get(key)
+        if shared is not None:
+            self._count('coalesced')
+            return await asyncio.shield(shared)
+        future = self._inflight[key] = asyncio.get_running_loop().create_future()
+        try:
+            result = await self._send(path, method, kwargs)
+            future.set_result(result)
+            return result
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            future.exception()   # retrieved, so an error nobody else awaited is not logged
+            raise
+        finally:
+            self._inflight.pop(key, None)
+
+    async def _send(self, path, method, kwargs):
+        started = time.perf_counter()
+        delay = self._hedge_delay(path, kwargs)
+        try:
+            if delay is None:
+                result = await self._attempts(method, kwargs)
+            else:
+                result = await self._hedged(method, kwargs, delay)
+        except Exception:
+            self._count('errors')
+            raise
+        if not kwargs.get('stream'):
+            self._record(path, time.perf_counter() - started)
+        return result
+
+    async def _attempts(self, method, kwargs):
+        attempt = 0
+        while True:
+            try:
+                return await method(**kwargs)
+            except Exception as e:
+                delay = self._backoff(e, attempt)
+                if delay is None:
+                    raise
+                self._count('retries')
+                await asyncio.sleep(delay)
+                attempt += 1
+
+    async def _hedged(self, method, kwargs, delay):
+        primary = asyncio.ensure_future(self._attempts(method, kwargs))
+        done, _ = await asyncio.wait({primary}, timeout=delay)
+        if done:
+            return primary.result()
+        self._count('hedges')
+        backup = asyncio.ensure_future(self._attempts(method, kwargs))
+        pending = {primary, backup}
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        if task is backup:
+                            self._count('hedge_wins')
+                        return task.result()
+            return primary.result()
+        finally:
+            for task in pending:
+                task.cancel()
+
+    async def close(self):
+        await self.raw.close()
+
+
+# --- construction ------------------------------------------------------------
+
+def _sdk_client(provider, deployment, async_client, http_client, timeout):
+    # max_retries=0: retries are done by the policy client, with its own backoff and stats
+    if provider == "azure":
+        api_key = os.environ.get("AZURE_OPENAI_KEY")
+        cls = openai.AsyncAzureOpenAI if async_client else openai.AzureOpenAI
+        return cls(
+            api_key=api_key,
+            azure_endpoint=os.environ.get("AZURE_OPENAI_ENDPOINT"),
+            azure_deployment=deployment or os.environ.get("AZURE_OPENAI_DEPLOYMENT_NAME"),
+            api_version=os.environ.get("AZURE_OPENAI_VERSION"),
+            default_headers={"Ocp-Apim-Subscription-Key": api_key} if api_key else None,  # API Management gateways
+            http_client=http_client,
+            timeout=timeout,
+            max_retries=0,
+        )
+    cls = openai.AsyncOpenAI if async_client else openai.OpenAI
+    return cls(api_key=os.environ.get("OPENAI_API_KEY"), http_client=http_client, timeout=timeout, max_retries=0)
+
+
+@functools.lru_cache(maxsize=None)
+def get_client(provider=None, deployment=None, async_client=False, timeout_s=60.0, connect_timeout_s=5.0,
+               max_connections=50, max_keepalive_connections=20, keepalive_s=60.0, **options):
+    """
+    The shared client for a provider; the same arguments return the same client (and pool).
+
+    Args:
+        provider: 'openai' or 'azure' (default: get_provider())
+        deployment: Azure deployment name (default: AZURE_OPENAI_DEPLOYMENT_NAME)
+        async_client: Return an AsyncLLMClient (for asyncio code) instead of an LLMClient
+        timeout_s: Read/write timeout of a request attempt
+        connect_timeout_s: Timeout for opening a connection
+        max_connections: Connections open at the same time
+        max_keepalive_connections: Idle connections kept for reuse
+        keepalive_s: Seconds an idle connection is kept
+        **options: Policy settings: max_retries, backoff_s, max_backoff_s, hedge, hedge_after_s,
+                   hedge_min_samples, coalesce (see LLMClient)
+
+    Returns:
+        LLMClient or AsyncLLMClient
+    """
+    provider = provider or get_provider()
+    timeout = httpx.Timeout(timeout_s, connect=connect_timeout_s)
+    limits = httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_keepalive_connections,
+                          keepalive_expiry=keepalive_s)
+    if async_client:
+        http_client = openai.DefaultAsyncHttpxClient(limits=limits, timeout=timeout)
+        return AsyncLLMClient(_sdk_client(provider, deployment, True, http_client, timeout), **options)
+    http_client = openai.DefaultHttpxClient(limits=limits, timeout=timeout)
+    return LLMClient(_sdk_client(provider, deployment, False, http_client, timeout), **options)
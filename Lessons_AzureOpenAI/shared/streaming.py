@@ -0,0 +1,170 @@
+"""
+Streaming Model Output as Events
+
+A response that is printed only once it is complete keeps the user looking at
+nothing for the whole generation time, even though the first words were ready
+after a few hundred milliseconds. With stream=True the API sends the output as
+it is generated; this module turns that stream into a small set of events that
+a notebook can print and an API can forward as server-sent events (SSE):
+
+- {"type": "text", "delta": ...}: the next piece of the answer
+- {"type": "tool_call_started", "call_id", "name"}: the model began a function call
+- {"type": "tool_call_arguments", "call_id", "delta"}: its arguments, as they arrive
+- {"type": "tool_call", "call_id", "name", "arguments"}: the call is complete
+- {"type": "error", "message"}: the stream reported an error
+- {"type": "done", "text", "tool_calls", "response", "time_to_first_token_s", "elapsed_s"}:
+  always last; tool_calls are ToolCall tuples, ready for ToolExecutor.run()
+
+Both APIs are understood: Responses API event streams (client.responses.create)
+and Chat Completions chunk streams (client.chat.completions.create), sync or async.
+
+Usage:
+    stream = client.responses.create(model=MODEL, input=messages, stream=True)
+    for event in stream_events(stream):
+        if event["type"] == "text":
+            print(event["delta"], end="", flush=True)
+
+    # FastAPI
+    async def generate():
+        async for event in astream_events(await async_client.responses.create(..., stream=True)):
+            yield sse(event)
+    return StreamingResponse(generate(), media_type="text/event-stream")
+"""
+
+import json
+import time
+
+from shared.tool_executor import ToolCall
+
+
+class _StreamState:
+    """Converts stream events or chunks of either API into module events."""
+
+    def __init__(self, started=None):
+        self.started = started if started is not None else time.perf_counter()
+        self.first_token = None
+        self.text = []
+        self.tool_calls = []
+        self.response = None
+        self._calls = {}      # Responses API item id or Chat Completions index -> [call_id, name, arguments]
+
+    def _text(self, delta):
+        if self.first_token is None:
+            self.first_token = time.perf_counter()
+        self.text.append(delta)
+        return {"type": "text", "delta": delta}
+
+    def feed(self, event):
+        """Events for one item of the stream."""
+        if getattr(event, 'choices', None) is not None:
+            return self._feed_chunk(event)
+        kind = getattr(event, 'type', '')
+        if kind == "response.output_text.delta":
+            return [self._text(event.delta)]
+        if kind == "response.output_item.added" and event.item.type == "function_call":
+            self._calls[event.item.id] = [event.item.call_id, event.item.name, []]
+            return [{"type": "tool_call_started", "call_id": event.item.call_id, "name": event.item.name}]
+        if kind == "response.function_call_arguments.delta" and event.item_id in self._calls:
+            call = self._calls[event.item_id]
+            call[2].append(event.delta)
+            return [{"type": "tool_call_arguments", "call_id": call[0], "delta": event.delta}]
+        if kind == "response.output_item.done" and event.item.type == "function_call":
+            self._calls.pop(event.item.id, None)
+            return [self._tool_call(event.item.call_id, event.item.name, event.item.arguments)]
+        if kind == "response.completed":
+            self.response = event.response
+        elif kind in ("error", "response.failed"):
+            error = getattr(event, 'message', None) or getattr(getattr(event, 'response', None), 'error', None)
+            return [{"type": "error", "message": str(error)}]
+        return []
+
+    def _feed_chunk(self, chunk):
+        events = []
+        for choice in chunk.choices:
+            delta = choice.delta
+            if delta is not None and delta.content:
+                events.append(self._text(delta.content))
+            for tool_call in (delta.tool_calls if delta is not None else None) or []:
+                call = self._calls.get(tool_call.index)
+                if call is None:
+                    name = tool_call.function.name if tool_call.function else None
+                    call = self._calls[tool_call.index] = [tool_call.id, name, []]
+                    events.append({"type": "tool_call_started", "call_id": call[0], "name": call[1]})
+                if tool_call.function and tool_call.function.arguments:
+                    call[2].append(tool_call.function.arguments)
+                    events.append({"type": "tool_call_arguments", "call_id": call[0],
+                                   "delta": tool_call.function.arguments})
+            if choice.finish_reason:
+                for index in sorted(self._calls):
+                    call_id, name, arguments = self._calls[index]
+                    events.append(self._tool_call(call_id, name, "".join(arguments)))
+                self._calls.clear()
+        return events
+
+    def _tool_call(self, call_id, name, arguments):
+        self.tool_calls.append(ToolCall(call_id, name, arguments))
+        return {"type": "tool_call", "call_id": call_id, "name": name, "arguments": arguments}
+
+    def done(self):
+        now = time.perf_counter()
+        return {
+            "type": "done",
+            "text": "".join(self.text),
+            "tool_calls": list(self.tool_calls),
+            "response": self.response,
+            "time_to_first_token_s": round(self.first_token - self.started, 3) if self.first_token else None,
+            "elapsed_s": round(now - self.started, 3),
+        }
+
+
+def stream_events(stream, started=None):
+    """
+    Events from a sync stream (see the module docstring for the event types).
+
+    Args:
+        stream: The result of create(..., stream=True)
+        started: time.perf_counter() when the request was sent, for time_to_first_token_s
+                 (default: when iteration starts)
+    """
+    state = _StreamState(started)
+    for item in stream:
+        yield from state.feed(item)
+    yield state.done()
+
+
+async def astream_events(stream, started=None):
+    """Events from an async stream (AsyncOpenAI / AsyncAzureOpenAI)."""
+    state = _StreamState(started)
+    async for item in stream:
+        for event in state.feed(item):
+            yield event
+    yield state.done()
+
+
+def print_stream(events):
+    """
+    Print text as it arrives, tool calls as they complete and the 'tool_result' events
+    agents add when they execute them; returns the 'done' event.
+    """
+    done = None
+    for event in events:
+        if event["type"] == "text":
+            print(event["delta"], end="", flush=True)
+        elif event["type"] == "tool_call":
+            print(f"\n🔧 {event['name']}({event['arguments']})", flush=True)
+        elif event["type"] == "tool_result":
+            print(f"📦 {event['name']} finished in {event['elapsed_s']:.2f}s", flush=True)
+        elif event["type"] == "error":
+            print(f"\n⚠️ {event['message']}", flush=True)
+        elif event["type"] == "done":
+            done = event
+    print()
+    return done
+
+
+def sse(event):
+    """Format an event as a server-sent event (API response objects and message lists are left out)."""
+    data = {key: value for key, value in event.items() if key not in ("response", "messages")}
+    if "tool_calls" in data:
+        data["tool_calls"] = [call._asdict() for call in data["tool_calls"]]
+    return f"event: {event['type']}\ndata: {json.dumps(data, default=str)}\n\n"
@@ -0,0 +1,221 @@
+"""
+Parallel Tool-Call Executor for Function-Calling Agents
+
+When the model answers with several function calls at once ("get the Q3 and the
+Q4 totals"), the calls are independent, but an agent loop that executes them
+one after the other makes the turn take the sum of their latencies.
+
+ToolExecutor runs the function calls of one model response concurrently:
+
+- calls are dispatched to a thread pool (the lesson tools are blocking: SQL
+  queries, HTTP requests), and the outputs are returned in call order, ready to
+  be sent back to the model in one request
+- every tool can have its own timeout and concurrency cap (e.g. at most 2 SQL
+  queries at a time, however many the model asks for); calls over the cap wait
+  for a slot without holding a worker thread, and their timeout starts when they
+  start running. A call that times out or raises returns an error output instead
+  of failing the turn
+- pure tools (same arguments, same result within a turn, e.g. get_database_schema)
+  are memoised: repeated calls in the same turn, or the same batch, run once
+- calls in both API formats are accepted: Responses API function_call items and
+  Chat Completions tool_calls
+
+Usage:
+    executor = ToolExecutor(
+        {"execute_sql": lambda query, **_: execute_sql_query(query),
+         "get_database_schema": get_database_schema},
+        timeouts={"execute_sql": 30}, max_concurrency={"execute_sql": 2},
+        pure={"get_database_schema"},
+    )
+    results = executor.run(response.output)   # pass memo={} shared by a turn's rounds to memoise across them
+    input_list += [{"type": "function_call_output", "call_id": r.call_id, "output": r.output} for r in results]
+"""
+
+import json
+import threading
+import time
+from collections import deque, namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeout
+
+ToolCall = namedtuple('ToolCall', 'call_id name arguments')
+ToolResult = namedtuple('ToolResult', 'call_id name output elapsed_s cached error')
+
+
+def tool_calls(items):
+    """
+    The function calls in a model response, as ToolCall tuples.
+
+    Args:
+        items: Responses API output items (function_call items are picked out),
+               Chat Completions tool_calls, or ToolCall tuples
+
+    Returns:
+        list[ToolCall]
+    """
+    calls = []
+    for item in items or []:
+        if isinstance(item, ToolCall):
+            calls.append(item)
+            continue
+        function = getattr(item, 'function', None)
+        if function is not None:
+            calls.append(ToolCall(item.id, function.name, function.arguments))
+        elif getattr(item, 'type', None) == "function_call":
+            calls.append(ToolCall(item.call_id, item.name, item.arguments))
+    return calls
+
+
+def _to_output(result):
+    return result if isinstance(result, str) else json.dumps(result, default=str)
+
+
+class _Pending:
+    """A dispatched call: it starts once its tool has a free slot, then runs in the pool."""
+
+    def __init__(self, name, arguments):
+        self.name = name
+        self.arguments = arguments
+        self.started = threading.Event()
+        self.started_at = None
+        self.future = None
+        self.abandoned = False    # gave up waiting for a slot; never started
+
+
+class ToolExecutor:
+    """Executes independent tool calls concurrently, with per-tool timeouts, caps and memoisation."""
+
+    def __init__(self, tools, timeouts=None, default_timeout=30.0, max_concurrency=None, pure=(), max_workers=8):
+        """
+        Args:
+            tools: {tool name: function}; the function is called with the call's JSON arguments
+                   as keyword arguments and returns a string or something json.dumps can encode
+            timeouts: {tool name: seconds}
+            default_timeout: Seconds for tools without their own timeout
+            max_concurrency: {tool name: calls of that tool running at the same time}; further
+                             calls wait in a queue, outside the thread pool
+            pure: Names of tools whose result only depends on their arguments (memoised per turn)
+            max_workers: Threads shared by all tools
+        """
+        self.tools = dict(tools)
+        self.timeouts = dict(timeouts or {})
+        self.default_timeout = default_timeout
+        self.pure = set(pure)
+        self.max_concurrency = dict(max_concurrency or {})
+        self._running = {}        # tool name -> calls holding a slot
+        self._queued = {}         # tool name -> calls waiting for a slot
+        self._lock = threading.Lock()
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="tool")
+
+    def _call(self, name, arguments):
+        """Run one tool (in a pool thread); returns (output, error, seconds)."""
+        started = time.perf_counter()
+        output, error = self._invoke(name, arguments)
+        return output, error, round(time.perf_counter() - started, 3)
+
+    def _invoke(self, name, arguments):
+        function = self.tools.get(name)
+        if function is None:
+            return json.dumps({"error": f"Unknown tool: {name}"}), "unknown tool"
+        try:
+            kwargs = json.loads(arguments) if arguments else {}
+        except json.JSONDecodeError as e:
+            return json.dumps({"error": f"Invalid arguments: {e}"}), "invalid arguments"
+        try:
+            return _to_output(function(**kwargs)), None
+        except Exception as e:
+            return json.dumps({"error": f"{type(e).__name__}: {e}"}), str(e)
+
+    # --- dispatch ------------------------------------------------------------
+
+    def _dispatch(self, name, arguments):
+        """Start a call now, or queue it until its tool has a free slot."""
+        pending = _Pending(name, arguments)
+        with self._lock:
+            cap = self.max_concurrency.get(name)
+            if cap is not None and self._running.get(name, 0) >= cap:
+                self._queued.setdefault(name, deque()).append(pending)
+                return pending
+            self._running[name] = self._running.get(name, 0) + 1
+        self._start(pending)
+        return pending
+
+    def _start(self, pending):
+        pending.started_at = time.perf_counter()
+        pending.future = self._pool.submit(self._call, pending.name, pending.arguments)
+        pending.started.set()
+        # A finished call hands its slot to the next queued call of the same tool
+        pending.future.add_done_callback(lambda _: self._release(pending.name))
+
+    def _release(self, name):
+        with self._lock:
+            queue = self._queued.get(name)
+            if not queue:
+                self._running[name] -= 1
+                return
+            pending = queue.popleft()
+        self._start(pending)
+
+    def _wait(self, pending, deadline, timeout):
+        """(output, error, seconds) of a call; both the wait for a slot and the run are bounded by timeout."""
+        if not pending.started.wait(max(0.0, deadline - time.perf_counter())):
+            with self._lock:
+                queue = self._queued.get(pending.name, ())
+                if pending in queue:
+                    queue.remove(pending)
+                    pending.abandoned = True
+                abandoned = pending.abandoned
+            if abandoned:
+                return (json.dumps({"error": f"{pending.name} found no free slot within {timeout:g}s"}),
+                        "timeout", timeout)
+            pending.started.wait()    # a finishing call just handed it its slot
+        try:
+            return pending.future.result(timeout=max(0.0, pending.started_at + timeout - time.perf_counter()))
+        except FutureTimeout:
+            return json.dumps({"error": f"{pending.name} timed out after {timeout:g}s"}), "timeout", timeout
+
+    @staticmethod
+    def _memo_key(call):
+        try:
+            return call.name, json.dumps(json.loads(call.arguments or "{}"), sort_keys=True)
+        except json.JSONDecodeError:
+            return None  # not memoised; the call itself reports the invalid arguments
+
+    def run(self, calls, memo=None):
+        """
+        Execute the function calls of one model response concurrently.
+
+        Args:
+            calls: Responses API output items (other items are ignored), Chat Completions
+                   tool_calls, or ToolCall tuples
+            memo: Dict shared by the calls of one turn, for memoising pure tools
+                  (defaults to a new one, i.e. only duplicates within this batch are shared)
+
+        Returns:
+            list[ToolResult]: one per call, in call order
+        """
+        calls = tool_calls(calls)
+        memo = {} if memo is None else memo
+        started = time.perf_counter()
+
+        dispatched = []
+        for call in calls:
+            key = self._memo_key(call) if call.name in self.pure else None
+            if key is not None and key in memo:
+                dispatched.append((memo[key], True))
+                continue
+            pending = self._dispatch(call.name, call.arguments)
+            if key is not None:
+                memo[key] = pending
+            dispatched.append((pending, False))
+
+        results = []
+        for call, (pending, cached) in zip(calls, dispatched):
+            # All calls were dispatched at `started`; the run time counts from each call's own start
+            timeout = self.timeouts.get(call.name, self.default_timeout)
+            output, error, elapsed = self._wait(pending, started + timeout, timeout)
+            results.append(ToolResult(call.call_id, call.name, output, 0.0 if cached else elapsed, cached, error))
+        return results
+
+    def close(self):
+        self._pool.shutdown(wait=False, cancel_futures=True)
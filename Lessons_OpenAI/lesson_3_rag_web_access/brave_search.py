@@ -0,0 +1,235 @@
+"""
+Cached, Pooled Brave Search Client
+
+Calling requests.get for every search opens a new TCP/TLS connection, has no
+timeout or retry, and sends identical queries to the (paid) API again and again.
+The BraveSearchClient:
+
+- reuses connections through a requests.Session with a sized connection pool
+- caches responses on disk in SQLite, keyed by a hash of the normalised query and
+  its parameters, with a time-to-live
+- retries rate-limited (429), server-side (5xx) and connection errors with
+  exponential backoff and jitter, honouring Retry-After
+- coalesces concurrent identical searches: while one call is in flight, other
+  threads asking the same thing wait for its result instead of calling the API
+
+The endpoint can be pointed at a local stub (examples/stub_search_server.py) to
+work without an API key or network access.
+
+Usage:
+    search_client = BraveSearchClient(os.environ.get("BRAVE_SEARCH_API_KEY"))
+    results = search_client.search("greek restaurants in san francisco", count=5)
+    print(search_client.stats)
+
+    # Offline, against the stub server
+    search_client = BraveSearchClient("test", base_url="http://127.0.0.1:8765/res/v1/web/search")
+"""
+
+import hashlib
+import json
+import os
+import random
+import sqlite3
+import threading
+import time
+from concurrent.futures import Future
+
+import requests
+from requests.adapters import HTTPAdapter
+
+BRAVE_SEARCH_URL = "https://api.search.brave.com/res/v1/web/search"
+
+RETRY_STATUS = {429, 500, 502, 503, 504}
+
+
+class BraveSearchError(Exception):
+    """Raised when a search fails after all retries (or with a non-retryable status)."""
+
+    def __init__(self, message, status_code=None):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+def normalize_query(query):
+    """Lowercase and collapse whitespace, so trivially different queries share a cache entry."""
+    return " ".join(query.lower().split())
+
+
+def cache_key(query, params):
+    payload = json.dumps({'q': normalize_query(query), **params}, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+class SearchCache:
+    """SQLite-backed response cache with a time-to-live, safe to share between threads."""
+
+    def __init__(self, path='brave_search_cache.sqlite', ttl=6 * 3600):
+        """
+        Args:
+            path: SQLite file for the cache (':memory:' for a per-process cache)
+            ttl: Seconds a cached response stays valid (None for no expiry)
+        """
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        if path != ':memory:':
+            self._conn.execute("PRAGMA journal_mode = WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS search_cache ("
+            "key TEXT PRIMARY KEY, query TEXT, response TEXT, created REAL)"
+        )
+
+    def get(self, key):
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT response, created FROM search_cache WHERE key = ?", (key,)
+            ).fetchone()
+        if row is None:
+            return None
+        if self.ttl is not None and time.time() - row[1] > self.ttl:
+            return None
+        return json.loads(row[0])
+
+    def set(self, key, query, response):
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO search_cache (key, query, response, created) VALUES (?, ?, ?, ?)",
+                (key, query, json.dumps(response), time.time()),
+            )
+
+    def purge_expired(self):
+        """Delete expired entries and return how many were removed."""
+        if self.ttl is None:
+            return 0
+        with self._lock:
+            return self._conn.execute(
+                "DELETE FROM search_cache WHERE created < ?", (time.time() - self.ttl,)
+            ).rowcount
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM search_cache")
+
+    def __len__(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM search_cache").fetchone()[0]
+
+    def close(self):
+        self._conn.close()
+
+
+class BraveSearchClient:
+    """Brave web search with connection pooling, an on-disk cache, retries and request coalescing."""
+
+    def __init__(self, api_key=None, base_url=None, cache_path='brave_search_cache.sqlite',
+                 ttl=6 * 3600, timeout=10.0, max_retries=3, backoff=0.5, pool_size=10):
+        """
+        Args:
+            api_key: Brave Search subscription token (defaults to BRAVE_SEARCH_API_KEY)
+            base_url: Search endpoint (defaults to BRAVE_SEARCH_URL, or the real API)
+            cache_path: SQLite file for cached responses (None to disable caching)
+            ttl: Seconds a cached response is reused
+            timeout: Seconds to wait for the API (connect and read)
+            max_retries: Retries after the first attempt for 429/5xx/connection errors
+            backoff: Base delay in seconds, doubled on every retry
+            pool_size: Maximum number of pooled connections
+        """
+        self.api_key = api_key or os.environ.get("BRAVE_SEARCH_API_KEY")
+        self.base_url = base_url or os.environ.get("BRAVE_SEARCH_URL", BRAVE_SEARCH_URL)
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.cache = SearchCache(cache_path, ttl) if cache_path else None
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self.session.headers.update({
+            "Accept": "application/json",
+            "Accept-Encoding": "gzip",
+            "X-Subscription-Token": self.api_key or "",
+        })
+
+        self._lock = threading.Lock()
+        self._inflight = {}
+        self.stats = {'requests': 0, 'cache_hits': 0, 'coalesced': 0, 'retries': 0}
+
+    def _count(self, name):
+        with self._lock:
+            self.stats[name] += 1
+
+    def _request(self, params):
+        """GET the endpoint, retrying with exponential backoff."""
+        for attempt in range(self.max_retries + 1):
+            retry_after = None
+            try:
+                self._count('requests')
+                response = self.session.get(self.base_url, params=params, timeout=self.timeout)
+                if response.status_code == 200:
+                    return response.json()
+                if response.status_code not in RETRY_STATUS:
+                    raise BraveSearchError(
+                        f"Brave Search returned {response.status_code}: {response.text[:200]}",
+                        response.status_code,
+                    )
+                error = BraveSearchError(f"Brave Search returned {response.status_code}", response.status_code)
+                retry_after = response.headers.get("Retry-After")
+            except (requests.ConnectionError, requests.Timeout) as e:
+                error = BraveSearchError(f"Brave Search request failed: {e}")
+
+            if attempt == self.max_retries:
+                raise error
+            self._count('retries')
+            delay = self.backoff * (2 ** attempt) * (0.5 + random.random())
+            if retry_after and retry_after.isdigit():
+                delay = max(delay, float(retry_after))
+            time.sleep(delay)
+
+    def search(self, query, count=5, country="us", search_lang="en", use_cache=True, **params):
+        """
+        Search the web and return the API's JSON response.
+
+        Extra keyword arguments are passed to the API (e.g. freshness='pd') and
+        are part of the cache key.
+
+        Raises:
+            BraveSearchError: if the search failed after all retries
+        """
+        params = {"count": count, "country": country, "search_lang": search_lang, **params}
+        key = cache_key(query, params)
+
+        if use_cache and self.cache is not None:
+            cached = self.cache.get(key)
+            if cached is not None:
+                self._count('cache_hits')
+                return cached
+
+        # Coalesce: the first caller for a key does the request, the rest wait for it
+        with self._lock:
+            future = self._inflight.get(key)
+            owner = future is None
+            if owner:
+                future = self._inflight[key] = Future()
+            else:
+                self.stats['coalesced'] += 1
+        if not owner:
+            return future.result()
+
+        try:
+            result = self._request({"q": query, **params})
+            if self.cache is not None:
+                self.cache.set(key, normalize_query(query), result)
+            future.set_result(result)
+            return result
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+
+    def close(self):
+        self.session.close()
+        if self.cache is not None:
+            self.cache.close()
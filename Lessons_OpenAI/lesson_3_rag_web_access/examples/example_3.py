@@ -1,26 +1,25 @@
 #!/usr/bin/env python
 
-import requests
 import os
+import sys
 from dotenv import load_dotenv, find_dotenv
 
+# Make the lesson's helper modules (brave_search.py) importable
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from brave_search import BraveSearchClient
+
 # Load environment variables
 load_dotenv(find_dotenv())
 
-print(
-    requests.get(
-        "https://api.search.brave.com/res/v1/web/search",
-        headers={
-            "X-Subscription-Token": os.environ.get("BRAVE_SEARCH_API_KEY"),
-        },
-        params={
-            "q": "greek restaurants in san francisco",
-            "count": 20,
-            "country": "us",
-            "search_lang": "en",
-        },
-    ).json()
-)
+# Pooled connections, an on-disk cache and retries (see brave_search.py).
+# Set BRAVE_SEARCH_URL to the stub server in stub_search_server.py to run offline.
+search_client = BraveSearchClient(os.environ.get("BRAVE_SEARCH_API_KEY"))
+
+print(search_client.search("greek restaurants in san francisco", count=20))
+
+# The same query again is answered from the cache, without calling the API
+search_client.search("Greek restaurants in San Francisco", count=20)
+print(search_client.stats)
 
 # from serpapi import GoogleSearch
 # import json
@@ -0,0 +1,140 @@
+#!/usr/bin/env python
+"""
+Local stand-in for the Brave Search API
+
+Answers GET /res/v1/web/search with canned results in the Brave response
+format, so the lesson code and BraveSearchClient can run without an API key
+or network access. Optional latency and failure injection (a random share
+of requests, or the next N) exercise the client's retries and request
+coalescing.
+
+The result URLs point back at this server (/page/<n>), which serves HTML
+pages with navigation, scripts and footers around the article text, for
+page_fetcher.py. Add ?delay=<seconds> to a page URL to make it slow, or
+?empty=1 to leave out the article (as on a page rendered by JavaScript).
+
+Usage:
+    python stub_search_server.py --port 8765 --latency 0.2 --fail-rate 0.2
+
+    search_client = BraveSearchClient("test", base_url="http://127.0.0.1:8765/res/v1/web/search")
+"""
+
+import argparse
+import html
+import json
+import random
+import threading
+import time
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, quote_plus, urlparse
+
+
+def make_results(query, count, base_url="https://example.com"):
+    return {
+        "type": "search",
+        "query": {"original": query, "query": query, "timestamp": datetime.now(timezone.utc).isoformat()},
+        "web": {
+            "type": "search",
+            "results": [
+                {
+                    "title": f"Result {i + 1} for {query}",
+                    "url": f"{base_url}/page/{i + 1}?q={quote_plus(query)}",
+                    "description": f"Stub description {i + 1} about {query}.",
+                }
+                for i in range(count)
+            ],
+        },
+    }
+
+
+def make_page(n, query, empty=False):
+    """An HTML page about the query, wrapped in the usual boilerplate."""
+    query = html.escape(query)
+    paragraphs = "\n".join(
+        f"<p>Paragraph {k + 1} of page {n}: this section discusses {query} in detail, "
+        f"with facts, figures and background that a search snippet would leave out.</p>"
+        for k in range(0 if empty else 12)
+    )
+    return f"""<!DOCTYPE html>
+<html><head><title>Page {n}: {query}</title>
+<style>body {{ font-family: sans-serif; }}</style>
+<script>window.analytics = {{ track: function() {{}} }};</script></head>
+<body>
+<header><nav><a href="/">Home</a> <a href="/news">News</a> <a href="/about">About us and our team</a></nav></header>
+<main><article><h1>{query}</h1>
+{paragraphs}
+</article></main>
+<aside>Subscribe to our newsletter for more stories like this one every week.</aside>
+<footer>Copyright 2025 Example Media. All rights reserved. Privacy policy and terms.</footer>
+</body></html>"""
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    latency = 0.0
+    fail_rate = 0.0
+    fail_next = 0  # the next N searches are answered with 503
+    hits = 0
+    lock = threading.Lock()
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        params = parse_qs(url.query)
+        if url.path.startswith("/page/"):
+            time.sleep(float(params.get("delay", ["0"])[0]))
+            page = make_page(url.path.rsplit("/", 1)[-1], params.get("q", [""])[0], "empty" in params)
+            self._send(page, "text/html; charset=utf-8")
+            return
+        if url.path != "/res/v1/web/search":
+            self.send_error(404)
+            return
+        with StubHandler.lock:
+            StubHandler.hits += 1
+            fail = StubHandler.fail_next > 0
+            if fail:
+                StubHandler.fail_next -= 1
+
+        time.sleep(self.latency)
+        if fail or random.random() < self.fail_rate:
+            self.send_response(503)
+            self.send_header("Retry-After", "0")
+            self.end_headers()
+            return
+
+        query = params.get("q", [""])[0]
+        count = int(params.get("count", ["5"])[0])
+        base_url = f"http://{self.headers.get('Host', '127.0.0.1')}"
+        self._send(json.dumps(make_results(query, count, base_url)), "application/json")
+
+    def _send(self, text, content_type):
+        body = text.encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_server(port=8765, latency=0.0, fail_rate=0.0):
+    """Start the stub in a background thread and return the server (call .shutdown() to stop)."""
+    StubHandler.latency = latency
+    StubHandler.fail_rate = fail_rate
+    server = ThreadingHTTPServer(("127.0.0.1", port), StubHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Stub Brave Search API server")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=0.0, help="Seconds to wait before answering")
+    parser.add_argument("--fail-rate", type=float, default=0.0, help="Fraction of requests answered with 503")
+    args = parser.parse_args()
+
+    StubHandler.latency = args.latency
+    StubHandler.fail_rate = args.fail_rate
+    print(f"Stub Brave Search listening on http://127.0.0.1:{args.port}/res/v1/web/search")
+    ThreadingHTTPServer(("127.0.0.1", args.port), StubHandler).serve_forever()
@@ -0,0 +1,324 @@
+"""
+Parallel Page Fetching and Context Building for Web RAG
+
+Brave's result snippets are one or two sentences, so answers built from them
+stay shallow. This module reads the pages behind the top results instead:
+
+1. Fetch the top-N URLs concurrently (asyncio + httpx) with a global and a
+   per-host connection limit and a hard per-page timeout
+2. Stop at a time budget: whatever finished within budget_ms is used, the rest
+   is cancelled, so adding sources never adds unbounded latency
+3. Strip boilerplate (scripts, styles, navigation, headers, footers, forms) with a
+   single-pass HTML parser and keep the text of content blocks
+4. Split each page into overlapping chunks of a few hundred words
+5. Rank all chunks against the query with BM25 and pack the best ones, each
+   tagged with its source, into a token budget (shared/context_packer.py drops
+   near-duplicates and caps how much one page can contribute)
+
+Usage:
+    search_results = brave_search(query, count=10)
+    context = await build_web_context(query, search_results, top_n=5, budget_ms=2500, token_budget=2000)
+
+    # Outside a notebook
+    context = asyncio.run(build_web_context(query, search_results))
+"""
+
+import asyncio
+import math
+import os
+import re
+import sys
+import time
+from collections import Counter
+from html.parser import HTMLParser
+from urllib.parse import urlparse
+
+import httpx
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from shared.context_packer import ContextPacker
+
+USER_AGENT = "Mozilla/5.0 (compatible; agentic-ai-workflows/1.0; +https://github.com/mzwaMoj/agentic-ai-workflows)"
+
+# Elements whose text is never content
+_SKIP_TAGS = frozenset(["script", "style", "noscript", "template", "svg", "canvas", "iframe",
+                        "nav", "header", "footer", "aside", "form", "button", "select", "head"])
+# Elements that end a block of text
+_BLOCK_TAGS = frozenset(["p", "div", "section", "article", "main", "li", "ul", "ol", "table", "tr",
+                         "td", "th", "h1", "h2", "h3", "h4", "h5", "h6", "blockquote", "pre", "br",
+                         "dd", "dt", "figcaption"])
+_VOID_TAGS = frozenset(["br", "img", "hr", "input", "meta", "link", "area", "base", "col", "embed",
+                        "source", "track", "wbr"])
+
+_WORD = re.compile(r"\w+")
+_STOPWORDS = frozenset("""a an and are as at be by for from has have how i in is it its of on or
+that the this to was were what when where which who why will with you your""".split())
+
+
+class _TextExtractor(HTMLParser):
+    """Collects the text of an HTML page, one string per block, skipping boilerplate elements."""
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.blocks = []
+        self.title = ""
+        self._current = []
+        self._skip_depth = 0
+        self._in_title = False
+
+    def handle_starttag(self, tag, attrs):
+        if tag in _VOID_TAGS:
+            if tag == "br":
+                self._flush()
+            return
+        if tag == "title":
+            self._in_title = True
+        if tag in _SKIP_TAGS or self._skip_depth:
+            self._skip_depth += 1
+        elif tag in _BLOCK_TAGS:
+            self._flush()
+
+    def handle_endtag(self, tag):
+        if tag in _VOID_TAGS:
+            return
+        if tag == "title":
+            self._in_title = False
+        if self._skip_depth:
+            self._skip_depth -= 1
+        elif tag in _BLOCK_TAGS:
+            self._flush()
+
+    def handle_data(self, data):
+        if self._in_title:
+            self.title += data
+        elif not self._skip_depth:
+            self._current.append(data)
+
+    def _flush(self):
+        text = " ".join("".join(self._current).split())
+        self._current = []
+        if text:
+            self.blocks.append(text)
+
+    def close(self):
+        super().close()
+        self._flush()
+
+
+def extract_text(html, min_block_words=6):
+    """
+    Return (title, text) of an HTML page with boilerplate removed.
+
+    Blocks shorter than min_block_words (menus, buttons, bylines) are dropped.
+    """
+    parser = _TextExtractor()
+    try:
+        parser.feed(html)
+        parser.close()
+    except Exception:
+        pass  # keep whatever was parsed before the markup broke
+    blocks = [b for b in parser.blocks if len(b.split()) >= min_block_words]
+    return " ".join(parser.title.split()), "\n".join(blocks)
+
+
+def chunk_text(text, chunk_words=200, overlap=40):
+    """Split text into chunks of about chunk_words words, overlapping by `overlap` words."""
+    words = text.split()
+    if not words:
+        return []
+    step = max(1, chunk_words - overlap)
+    chunks = []
+    for start in range(0, len(words), step):
+        chunks.append(" ".join(words[start:start + chunk_words]))
+        if start + chunk_words >= len(words):
+            break
+    return chunks
+
+
+def _terms(text):
+    return [w for w in _WORD.findall(text.lower()) if w not in _STOPWORDS]
+
+
+def rank_chunks(query, chunks, k1=1.5, b=0.75):
+    """
+    Score chunks against the query with BM25.
+
+    Args:
+        query: The user's question
+        chunks: list of dicts with a 'text' key
+
+    Returns:
+        list: the chunks with a 'score' key, best first
+    """
+    query_terms = set(_terms(query))
+    docs = [Counter(_terms(c['text'])) for c in chunks]
+    if not docs:
+        return []
+    avg_len = sum(sum(d.values()) for d in docs) / len(docs) or 1
+    df = Counter(term for d in docs for term in query_terms if term in d)
+
+    ranked = []
+    for chunk, doc in zip(chunks, docs):
+        length = sum(doc.values())
+        score = 0.0
+        for term in query_terms:
+            tf = doc.get(term, 0)
+            if tf:
+                idf = math.log(1 + (len(docs) - df[term] + 0.5) / (df[term] + 0.5))
+                score += idf * tf * (k1 + 1) / (tf + k1 * (1 - b + b * length / avg_len))
+        ranked.append(dict(chunk, score=score))
+    return sorted(ranked, key=lambda c: -c['score'])
+
+
+class PageFetcher:
+    """Fetches many pages concurrently under global and per-host limits."""
+
+    def __init__(self, concurrency=8, per_host=2, timeout=3.0, max_bytes=2_000_000):
+        """
+        Args:
+            concurrency: Maximum pages fetched at once
+            per_host: Maximum simultaneous requests to one host
+            timeout: Hard limit in seconds for one page (connect + download)
+            max_bytes: Pages larger than this are truncated
+        """
+        self.concurrency = concurrency
+        self.per_host = per_host
+        self.timeout = timeout
+        self.max_bytes = max_bytes
+
+    async def _download(self, client, url):
+        async with client.stream("GET", url) as response:
+            response.raise_for_status()
+            content_type = response.headers.get("content-type", "")
+            if "html" not in content_type and "text" not in content_type:
+                raise ValueError(f"Unsupported content type: {content_type}")
+            body = bytearray()
+            async for part in response.aiter_bytes():
+                body.extend(part)
+                if len(body) >= self.max_bytes:
+                    break
+            return bytes(body).decode(response.encoding or "utf-8", errors="replace")
+
+    async def _fetch(self, client, url, limit, host_limits):
+        host = urlparse(url).netloc
+        host_limit = host_limits.setdefault(host, asyncio.Semaphore(self.per_host))
+        started = time.perf_counter()
+        # Per-host slot first: tasks queued behind a busy host must not hold global slots
+        async with host_limit, limit:
+            html = await asyncio.wait_for(self._download(client, url), self.timeout)
+        title, text = extract_text(html)
+        return {'url': url, 'title': title, 'text': text,
+                'elapsed_ms': round(1000 * (time.perf_counter() - started))}
+
+    async def fetch_all(self, urls, budget_ms=2500):
+        """
+        Fetch the URLs and return the pages that finished within budget_ms.
+
+        Returns:
+            tuple: (pages, failed) where pages is a list of {'url', 'title', 'text', 'elapsed_ms'}
+                   in the order of urls, and failed maps each URL that errored or ran out
+                   of time to the reason
+        """
+        limit = asyncio.Semaphore(self.concurrency)
+        host_limits = {}
+        async with httpx.AsyncClient(
+            follow_redirects=True,
+            headers={"User-Agent": USER_AGENT, "Accept": "text/html,application/xhtml+xml"},
+            limits=httpx.Limits(max_connections=self.concurrency, max_keepalive_connections=self.concurrency),
+            timeout=self.timeout,
+        ) as client:
+            tasks = {asyncio.create_task(self._fetch(client, url, limit, host_limits)): url
+                     for url in dict.fromkeys(urls)}
+            if not tasks:
+                return [], {}
+            done, pending = await asyncio.wait(tasks, timeout=budget_ms / 1000)
+            for task in pending:
+                task.cancel()
+            await asyncio.gather(*pending, return_exceptions=True)
+
+        pages, failed = {}, {}
+        for task, url in tasks.items():
+            if task in pending:
+                failed[url] = "time budget exceeded"
+            elif task.exception() is not None:
+                error = task.exception()
+                failed[url] = f"{type(error).__name__}: {error}" if str(error) else type(error).__name__
+            else:
+                pages[url] = task.result()
+        return [pages[url] for url in tasks.values() if url in pages], failed
+
+
+async def fetch_and_rank(query, urls, budget_ms=2500, max_chunks=8, chunk_words=200,
+                         fetcher=None, fallback=None):
+    """
+    Fetch pages, chunk them and return the chunks most relevant to the query.
+
+    Args:
+        query: The user's question
+        urls: Page URLs, most relevant first
+        budget_ms: Time budget for fetching, in milliseconds
+        max_chunks: Number of chunks to keep (None for all, ranked)
+        chunk_words: Words per chunk
+        fetcher: PageFetcher to use (a default one otherwise)
+        fallback: {url: (title, snippet)} used for pages that could not be fetched
+                  or had no readable text
+
+    Returns:
+        dict: {'chunks': [{'url', 'title', 'text', 'score'}], 'pages', 'failed', 'elapsed_ms'}
+    """
+    started = time.perf_counter()
+    fetcher = fetcher or PageFetcher()
+    pages, failed = await fetcher.fetch_all(urls, budget_ms)
+
+    chunks, unused = [], list(failed)
+    for page in pages:
+        texts = chunk_text(page['text'], chunk_words)
+        chunks.extend({'url': page['url'], 'title': page['title'], 'text': text} for text in texts)
+        if not texts:
+            # Script-rendered or paywalled: the page loaded but had no content blocks
+            unused.append(page['url'])
+    for url in unused:
+        if fallback and url in fallback:
+            title, snippet = fallback[url]
+            chunks.append({'url': url, 'title': title, 'text': snippet})
+
+    return {
+        'chunks': rank_chunks(query, chunks)[:max_chunks],
+        'pages': len(pages),
+        'failed': failed,
+        'elapsed_ms': round(1000 * (time.perf_counter() - started)),
+    }
+
+
+def format_context(query, chunks):
+    """Format ranked chunks as numbered, cited context for the prompt."""
+    lines = [f"Search query: {query}"]
+    for i, chunk in enumerate(chunks, 1):
+        lines.append(f"\n[{i}] {chunk['title'] or chunk['url']}")
+        lines.append(f"URL: {chunk['url']}")
+        lines.append(f"Content: {chunk['text']}")
+    return "\n".join(lines)
+
+
+async def build_web_context(query, search_results, top_n=5, budget_ms=2500, max_chunks=8, fetcher=None,
+                            token_budget=2000, max_per_source=3, model=None):
+    """
+    Build LLM context from the pages behind the top Brave search results.
+
+    Results whose page could not be fetched in time, or had no readable text,
+    fall back to their snippet.
+    The ranked chunks are packed into token_budget tokens, best first, skipping
+    near-duplicates and taking at most max_per_source chunks from one page.
+
+    Returns:
+        str: Formatted context, one numbered entry per chunk with its source URL
+    """
+    results = (search_results or {}).get('web', {}).get('results', [])[:top_n]
+    urls = [r['url'] for r in results if r.get('url')]
+    fallback = {r['url']: (r.get('title', ''), r.get('description', '')) for r in results if r.get('url')}
+    ranked = await fetch_and_rank(query, urls, budget_ms, max_chunks=None, fetcher=fetcher, fallback=fallback)
+
+    packer = ContextPacker(token_budget=token_budget, model=model, max_passages=max_chunks,
+                           max_per_source=max_per_source)
+    packed = packer.pack([dict(chunk, source=chunk['url']) for chunk in ranked['chunks']])
+    return format_context(query, packed['passages'])
@@ -0,0 +1,22 @@
+"""Shared fixtures: the local stub search server from examples/."""
+
+import os
+import sys
+
+import pytest
+
+LESSON_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(LESSON_DIR)
+sys.path.append(os.path.join(LESSON_DIR, "examples"))
+
+from stub_search_server import StubHandler, start_server
+
+
+@pytest.fixture
+def stub_server():
+    """Start the stub on a free port and return its base URL."""
+    server = start_server(port=0)
+    StubHandler.fail_next = 0
+    yield f"http://127.0.0.1:{server.server_address[1]}"
+    server.shutdown()
+    server.server_close()
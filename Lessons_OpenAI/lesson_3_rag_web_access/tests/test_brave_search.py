@@ -0,0 +1,68 @@
+"""Tests for BraveSearchClient against the local stub server (run with: python -m pytest tests)."""
+
+import threading
+
+from brave_search import BraveSearchClient
+from stub_search_server import StubHandler
+
+
+def make_client(stub_server, **kwargs):
+    return BraveSearchClient("test", base_url=f"{stub_server}/res/v1/web/search", **kwargs)
+
+
+def test_concurrent_identical_searches_send_one_request(stub_server):
+    StubHandler.latency = 0.3
+    client = make_client(stub_server, cache_path=None)
+    barrier = threading.Barrier(8)
+    results = []
+
+    def search():
+        barrier.wait()
+        results.append(client.search("Greek Restaurants", count=3))
+
+    hits = StubHandler.hits
+    threads = [threading.Thread(target=search) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    client.close()
+
+    assert StubHandler.hits - hits == 1
+    assert client.stats['requests'] == 1 and client.stats['coalesced'] == 7
+    assert len(results) == 8 and all(result == results[0] for result in results)
+
+
+def test_repeated_search_is_answered_from_the_cache(stub_server, tmp_path):
+    cache_path = str(tmp_path / "cache.sqlite")
+    client = make_client(stub_server, cache_path=cache_path)
+    hits = StubHandler.hits
+
+    first = client.search("greek restaurants", count=3)
+    # Normalised queries share the entry
+    assert client.search("  Greek   RESTAURANTS ", count=3) == first
+    assert client.stats['cache_hits'] == 1
+    # Different parameters are a different search
+    client.search("greek restaurants", count=4)
+    client.close()
+
+    # The cache is on disk, so a new client reuses it
+    reopened = make_client(stub_server, cache_path=cache_path)
+    assert reopened.search("greek restaurants", count=3) == first
+    reopened.close()
+
+    assert StubHandler.hits - hits == 2
+    assert reopened.stats == {'requests': 0, 'cache_hits': 1, 'coalesced': 0, 'retries': 0}
+
+
+def test_unavailable_api_is_retried(stub_server):
+    StubHandler.fail_next = 2
+    client = make_client(stub_server, cache_path=None, backoff=0.01)
+    hits = StubHandler.hits
+
+    response = client.search("greek restaurants", count=2)
+    client.close()
+
+    assert len(response['web']['results']) == 2
+    assert StubHandler.hits - hits == 3
+    assert client.stats['retries'] == 2 and client.stats['requests'] == 3
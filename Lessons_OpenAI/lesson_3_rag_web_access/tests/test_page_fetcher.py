@@ -0,0 +1,60 @@
+"""Tests for PageFetcher and fetch_and_rank against the local stub server (run with: python -m pytest tests)."""
+
+import asyncio
+import time
+
+from page_fetcher import PageFetcher, extract_text, fetch_and_rank
+
+
+def page_url(stub_server, n, query="solar power", **params):
+    extra = "".join(f"&{key}={value}" for key, value in params.items())
+    return f"{stub_server}/page/{n}?q={query.replace(' ', '+')}{extra}"
+
+
+def test_boilerplate_is_stripped():
+    html = ("<html><head><title>Solar</title><script>var x = 'tracking code';</script></head><body>"
+            "<nav>Home News About us and our team</nav>"
+            "<p>Solar panels convert sunlight into electricity for homes and businesses.</p>"
+            "<footer>Copyright 2025 Example Media. All rights reserved.</footer></body></html>")
+    assert extract_text(html) == ("Solar", "Solar panels convert sunlight into electricity for homes and businesses.")
+
+
+def test_slow_pages_are_cut_off_at_the_budget(stub_server):
+    urls = [page_url(stub_server, 1), page_url(stub_server, 2, delay=2)]
+
+    started = time.perf_counter()
+    pages, failed = asyncio.run(PageFetcher().fetch_all(urls, budget_ms=500))
+
+    assert time.perf_counter() - started < 1.5
+    assert [page['url'] for page in pages] == urls[:1]
+    assert "Paragraph 1 of page 1" in pages[0]['text'] and "Copyright" not in pages[0]['text']
+    assert failed == {urls[1]: "time budget exceeded"}
+
+
+def test_requests_to_one_host_are_limited(stub_server):
+    urls = [page_url(stub_server, n, delay=0.2) for n in range(1, 5)]
+
+    def fetch_time(per_host):
+        started = time.perf_counter()
+        pages, _ = asyncio.run(PageFetcher(concurrency=8, per_host=per_host).fetch_all(urls, budget_ms=5000))
+        assert len(pages) == 4
+        return time.perf_counter() - started
+
+    # Two at a time: two rounds of 200 ms; four at a time: one round
+    assert fetch_time(per_host=2) >= 0.4
+    assert fetch_time(per_host=4) < 0.4
+
+
+def test_unusable_pages_fall_back_to_their_snippet(stub_server):
+    urls = [page_url(stub_server, 1), page_url(stub_server, 2, delay=2), page_url(stub_server, 3, empty=1)]
+    fallback = {url: (f"Result {n}", f"Snippet {n} about solar power.") for n, url in enumerate(urls, 1)}
+
+    ranked = asyncio.run(fetch_and_rank("solar power", urls, budget_ms=500, max_chunks=None, fallback=fallback))
+
+    texts = {}
+    for chunk in ranked['chunks']:
+        texts.setdefault(chunk['url'], []).append(chunk['text'])
+    assert any("Paragraph 1 of page 1" in text for text in texts[urls[0]])
+    assert texts[urls[1]] == ["Snippet 2 about solar power."]  # timed out
+    assert texts[urls[2]] == ["Snippet 3 about solar power."]  # fetched, but had no text
+    assert ranked['pages'] == 2 and list(ranked['failed']) == [urls[1]]
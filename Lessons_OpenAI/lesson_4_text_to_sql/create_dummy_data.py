@@ -1,168 +1,363 @@
-import pandas as pd
+"""
+Sample E-Commerce Data Generator
+
+Generates customers, products, orders, order items and reviews for the
+text-to-SQL lesson. Faker is slow (tens of microseconds per value), so it is
+only used to build small pools of names, addresses and texts up front; every
+row is then assembled with NumPy by drawing indices into those pools in bulk.
+Orders and their items are generated together in chunks, order totals come
+from a groupby over the items, and each chunk is written straight to CSV,
+SQLite or Parquet, so memory stays flat however large the dataset is.
+
+Scale 1 gives 1,000 customers, 200 products, 2,000 orders and 1,500 reviews;
+every table grows linearly with the scale (scale 5000 = 10 million orders).
+
+Usage:
+    python create_dummy_data.py                                  # CSV files next to this script, scale 1
+    python create_dummy_data.py --scale 50 --format sqlite --output sample_database.sqlite
+    python create_dummy_data.py --scale 5000 --format parquet --output dataset/   # needs pyarrow
+"""
+
+import argparse
+import os
+import sqlite3
+import time
+from datetime import date
+
 import numpy as np
+import pandas as pd
 from faker import Faker
-import uuid
-import random
-from datetime import datetime, timedelta
 
-# Initialize Faker
-fake = Faker()
+from db_loader import TABLES, create_indexes, create_table_sql
+
+BASE_ROWS = {'customers': 1000, 'products': 200, 'orders': 2000, 'reviews': 1500}
+POOL_SIZE = 1000
+
+CATEGORIES = ['Electronics', 'Clothing', 'Books', 'Home & Garden', 'Sports', 'Beauty', 'Toys', 'Food']
+CUSTOMER_STATUSES = ['Active', 'Inactive', 'Premium']
+ORDER_STATUSES = ['Pending', 'Shipped', 'Delivered', 'Cancelled']
+PAYMENT_METHODS = ['Credit Card', 'PayPal', 'Bank Transfer', 'Cash']
+
+
+def build_pools(seed=42, size=POOL_SIZE):
+    """Draw `size` values of every Faker field once; rows pick from these pools."""
+    fake = Faker()
+    Faker.seed(seed)
+    return {
+        'first_name': np.array([fake.first_name() for _ in range(size)]),
+        'last_name': np.array([fake.last_name() for _ in range(size)]),
+        'email_domain': np.array([fake.free_email_domain() for _ in range(50)]),
+        'phone': np.array([fake.phone_number() for _ in range(size)]),
+        'address': np.array([fake.address().replace('\n', ', ') for _ in range(size)]),
+        'city': np.array([fake.city() for _ in range(size)]),
+        'state': np.array([fake.state() for _ in range(100)]),
+        'country': np.array([fake.country() for _ in range(size)]),
+        'product_name': np.array([fake.catch_phrase() for _ in range(size)]),
+        'supplier': np.array([fake.company() for _ in range(size // 4)]),
+        'description': np.array([fake.text(max_nb_chars=200) for _ in range(size)]),
+        'review_text': np.array([fake.text(max_nb_chars=300) for _ in range(size)]),
+    }
+
+
+def random_uuids(rng, n):
+    """n random version-4 UUID strings, formatted without a Python loop."""
+    raw = np.frombuffer(rng.bytes(16 * n), dtype=np.uint8).reshape(n, 16).copy()
+    raw[:, 6] = (raw[:, 6] & 0x0F) | 0x40  # version 4
+    raw[:, 8] = (raw[:, 8] & 0x3F) | 0x80  # RFC 4122 variant
+    hexed = np.frombuffer(raw.tobytes().hex().encode('ascii'), dtype=np.uint8).reshape(n, 32)
+    out = np.full((n, 36), ord('-'), dtype=np.uint8)
+    out[:, 0:8] = hexed[:, 0:8]
+    out[:, 9:13] = hexed[:, 8:12]
+    out[:, 14:18] = hexed[:, 12:16]
+    out[:, 19:23] = hexed[:, 16:20]
+    out[:, 24:36] = hexed[:, 20:32]
+    return out.view('S36').ravel().astype(str)
+
+
+def random_dates(rng, n, days_back, days_min=0):
+    """n ISO dates between days_back and days_min days before today."""
+    today = np.datetime64(date.today(), 'D')
+    offsets = rng.integers(days_min, days_back + 1, n)
+    return np.datetime_as_string(today - offsets, unit='D')
+
 
-# Set seed for reproducibility
-Faker.seed(42)
-np.random.seed(42)
-random.seed(42)
+def coprime_strides(n):
+    """The steps in 1..n-1 that share no factor with n ([1] if there are none)."""
+    strides = np.flatnonzero(np.gcd(np.arange(1, n), n) == 1) + 1
+    return strides if len(strides) else np.array([1])
 
-def create_customers_data(n=1000):
+
+def pick(rng, values, n):
+    values = np.asarray(values)
+    return values[rng.integers(0, len(values), n)]
+
+
+def create_customers_data(rng, pools, n=1000):
     """Create dummy customer data"""
-    customers = []
-    for i in range(n):
-        customer = {
-            'customer_id': fake.uuid4(),
-            'first_name': fake.first_name(),
-            'last_name': fake.last_name(),
-            'email': fake.email(),
-            'phone': fake.phone_number(),
-            'date_of_birth': fake.date_of_birth(minimum_age=18, maximum_age=80),
-            'address': fake.address().replace('\n', ', '),
-            'city': fake.city(),
-            'state': fake.state(),
-            'country': fake.country(),
-            'registration_date': fake.date_between(start_date='-2y', end_date='today'),
-            'customer_status': random.choice(['Active', 'Inactive', 'Premium']),
-            'total_spent': round(random.uniform(10, 5000), 2)
-        }
-        customers.append(customer)
-    return pd.DataFrame(customers)
-
-def create_products_data(n=200):
+    first = pick(rng, pools['first_name'], n)
+    last = pick(rng, pools['last_name'], n)
+    email = (pd.Series(first).str.lower() + '.' + pd.Series(last).str.lower()
+             + pd.Series(rng.integers(1, 1000, n)).astype(str) + '@' + pd.Series(pick(rng, pools['email_domain'], n)))
+    return pd.DataFrame({
+        'customer_id': random_uuids(rng, n),
+        'first_name': first,
+        'last_name': last,
+        'email': email.to_numpy(),
+        'phone': pick(rng, pools['phone'], n),
+        'date_of_birth': random_dates(rng, n, 80 * 365, 18 * 365),
+        'address': pick(rng, pools['address'], n),
+        'city': pick(rng, pools['city'], n),
+        'state': pick(rng, pools['state'], n),
+        'country': pick(rng, pools['country'], n),
+        'registration_date': random_dates(rng, n, 2 * 365),
+        'customer_status': pick(rng, CUSTOMER_STATUSES, n),
+        'total_spent': rng.uniform(10, 5000, n).round(2),
+    })
+
+
+def create_products_data(rng, pools, n=200):
     """Create dummy product data"""
-    categories = ['Electronics', 'Clothing', 'Books', 'Home & Garden', 'Sports', 'Beauty', 'Toys', 'Food']
-    products = []
-    
-    for i in range(n):
-        category = random.choice(categories)
-        product = {
-            'product_id': str(uuid.uuid4()),
-            'product_name': fake.catch_phrase(),
-            'category': category,
-            'price': round(random.uniform(5, 1000), 2),
-            'cost': round(random.uniform(2, 500), 2),
-            'stock_quantity': random.randint(0, 1000),
-            'supplier': fake.company(),
-            'description': fake.text(max_nb_chars=200),
-            'created_date': fake.date_between(start_date='-1y', end_date='today'),
-            'is_active': random.choice([True, False])
-        }
-        # Ensure cost is less than price
-        product['cost'] = min(product['cost'], product['price'] * 0.7)
-        products.append(product)
-    return pd.DataFrame(products)
-
-def create_orders_data(customers_df, products_df, n=2000):
-    """Create dummy order data"""
-    orders = []
-    
-    for i in range(n):
-        customer = customers_df.sample(1).iloc[0]
-        order_date = fake.date_between(start_date='-1y', end_date='today')
-        
-        order = {
-            'order_id': str(uuid.uuid4()),
-            'customer_id': customer['customer_id'],
-            'order_date': order_date,
-            'status': random.choice(['Pending', 'Shipped', 'Delivered', 'Cancelled']),
-            'total_amount': 0,  # Will be calculated based on order items
-            'shipping_address': fake.address().replace('\n', ', '),
-            'payment_method': random.choice(['Credit Card', 'PayPal', 'Bank Transfer', 'Cash'])
-        }
-        orders.append(order)
-    return pd.DataFrame(orders)
-
-def create_order_items_data(orders_df, products_df, avg_items_per_order=2.5):
-    """Create dummy order items data"""
-    order_items = []
-    
-    for _, order in orders_df.iterrows():
-        num_items = max(1, int(np.random.poisson(avg_items_per_order)))
-        selected_products = products_df.sample(min(num_items, len(products_df)))
-        
-        order_total = 0
-        for _, product in selected_products.iterrows():
-            quantity = random.randint(1, 5)
-            unit_price = product['price']
-            total_price = quantity * unit_price
-            order_total += total_price
-            
-            item = {
-                'item_id': str(uuid.uuid4()),
-                'order_id': order['order_id'],
-                'product_id': product['product_id'],
-                'quantity': quantity,
-                'unit_price': unit_price,
-                'total_price': total_price
-            }
-            order_items.append(item)
-        
-        # Update order total
-        orders_df.loc[orders_df['order_id'] == order['order_id'], 'total_amount'] = round(order_total, 2)
-    
-    return pd.DataFrame(order_items)
-
-def create_reviews_data(customers_df, products_df, n=1500):
+    price = rng.uniform(5, 1000, n).round(2)
+    # Ensure cost is less than price
+    cost = np.minimum(rng.uniform(2, 500, n), price * 0.7).round(2)
+    return pd.DataFrame({
+        'product_id': random_uuids(rng, n),
+        'product_name': pick(rng, pools['product_name'], n),
+        'category': pick(rng, CATEGORIES, n),
+        'price': price,
+        'cost': cost,
+        'stock_quantity': rng.integers(0, 1001, n),
+        'supplier': pick(rng, pools['supplier'], n),
+        'description': pick(rng, pools['description'], n),
+        'created_date': random_dates(rng, n, 365),
+        'is_active': rng.random(n) < 0.5,
+    })
+
+
+def create_orders_data(rng, pools, customer_ids, products_df, n=2000, avg_items_per_order=2.5, strides=None):
+    """
+    Create dummy orders and their order items.
+
+    Args:
+        strides: coprime_strides(len(products_df)), if the caller already has them
+
+    Returns:
+        tuple: (orders_df, order_items_df), with total_amount summed from the items
+    """
+    n_products = len(products_df)
+    orders_df = pd.DataFrame({
+        'order_id': random_uuids(rng, n),
+        'customer_id': pick(rng, customer_ids, n).astype(str),
+        'order_date': random_dates(rng, n, 365),
+        'status': pick(rng, ORDER_STATUSES, n),
+        'total_amount': 0.0,
+        'shipping_address': pick(rng, pools['address'], n),
+        'payment_method': pick(rng, PAYMENT_METHODS, n),
+    })
+
+    # Items per order, then one row per item pointing back at its order
+    counts = np.clip(rng.poisson(avg_items_per_order, n), 1, n_products)
+    order_index = np.repeat(np.arange(n), counts)
+    position = np.arange(len(order_index)) - np.repeat(np.cumsum(counts) - counts, counts)
+
+    # Distinct products within an order: walk the catalog from a random start
+    # with a stride coprime to its size, so the first k steps never repeat
+    if strides is None:
+        strides = coprime_strides(n_products)
+    start = rng.integers(0, n_products, n)
+    stride = pick(rng, strides, n)
+    product_index = (start[order_index] + position * stride[order_index]) % n_products
+
+    quantity = rng.integers(1, 6, len(order_index))
+    unit_price = products_df['price'].to_numpy()[product_index]
+    total_price = (quantity * unit_price).round(2)
+
+    order_items_df = pd.DataFrame({
+        'item_id': random_uuids(rng, len(order_index)),
+        'order_id': orders_df['order_id'].to_numpy()[order_index],
+        'product_id': products_df['product_id'].to_numpy()[product_index],
+        'quantity': quantity,
+        'unit_price': unit_price,
+        'total_price': total_price,
+    })
+    orders_df['total_amount'] = np.bincount(order_index, weights=total_price, minlength=n).round(2)
+    return orders_df, order_items_df
+
+
+def create_reviews_data(rng, pools, customer_ids, product_ids, n=1500):
     """Create dummy review data"""
-    reviews = []
-    
-    for i in range(n):
-        customer = customers_df.sample(1).iloc[0]
-        product = products_df.sample(1).iloc[0]
-        
-        review = {
-            'review_id': str(uuid.uuid4()),
-            'customer_id': customer['customer_id'],
-            'product_id': product['product_id'],
-            'rating': random.randint(1, 5),
-            'review_text': fake.text(max_nb_chars=300),
-            'review_date': fake.date_between(start_date='-1y', end_date='today'),
-            'helpful_votes': random.randint(0, 50)
-        }
-        reviews.append(review)
-    return pd.DataFrame(reviews)
+    return pd.DataFrame({
+        'review_id': random_uuids(rng, n),
+        'customer_id': pick(rng, customer_ids, n).astype(str),
+        'product_id': pick(rng, product_ids, n),
+        'rating': rng.integers(1, 6, n),
+        'review_text': pick(rng, pools['review_text'], n),
+        'review_date': random_dates(rng, n, 365),
+        'helpful_votes': rng.integers(0, 51, n),
+    })
+
+
+# ----------------------------------------------------------------------
+# Writers: each receives DataFrame chunks per table and appends them
+# ----------------------------------------------------------------------
+
+class CSVWriter:
+    """One CSV file per table in a directory."""
+
+    def __init__(self, path):
+        os.makedirs(path, exist_ok=True)
+        self.path = path
+        self._started = set()
+
+    def write(self, table, df):
+        first = table not in self._started
+        self._started.add(table)
+        df.to_csv(os.path.join(self.path, f'{table}.csv'), mode='w' if first else 'a', header=first, index=False)
+
+    def close(self):
+        pass
+
+
+class SQLiteWriter:
+    """All tables in one SQLite file with the keys and types of db_loader.TABLES, indexed at the end."""
+
+    def __init__(self, path):
+        if os.path.exists(path):
+            os.remove(path)
+        self.conn = sqlite3.connect(path)
+        # The file is rebuilt from scratch if loading fails, so skip the safety nets
+        self.conn.execute("PRAGMA journal_mode = OFF")
+        self.conn.execute("PRAGMA synchronous = OFF")
+        self.conn.execute("PRAGMA cache_size = -262144")  # 256 MB
+        self._created = set()
+
+    def write(self, table, df):
+        if table not in self._created:
+            self.conn.execute(create_table_sql(table, list(df.columns)))
+            self._created.add(table)
+        df.to_sql(table, self.conn, index=False, if_exists='append', chunksize=50_000)
+
+    def close(self):
+        for table in self._created & set(TABLES):
+            create_indexes(self.conn, table)
+        self.conn.execute("ANALYZE")
+        self.conn.commit()
+        self.conn.close()
+
+
+class ParquetWriter:
+    """One Parquet file per table in a directory, one row group per chunk (requires pyarrow)."""
+
+    def __init__(self, path):
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise ImportError("Parquet output requires pyarrow: pip install pyarrow")
+        os.makedirs(path, exist_ok=True)
+        self.pa, self.pq = pa, pq
+        self.path = path
+        self._writers = {}
+
+    def write(self, table, df):
+        batch = self.pa.Table.from_pandas(df, preserve_index=False)
+        if table not in self._writers:
+            self._writers[table] = self.pq.ParquetWriter(os.path.join(self.path, f'{table}.parquet'), batch.schema)
+        self._writers[table].write_table(batch)
+
+    def close(self):
+        for writer in self._writers.values():
+            writer.close()
+
+
+WRITERS = {'csv': CSVWriter, 'sqlite': SQLiteWriter, 'parquet': ParquetWriter}
+
+
+def generate(writer, scale=1.0, chunk_size=500_000, seed=42, verbose=True):
+    """
+    Generate the full dataset at the given scale and stream it into a writer.
+
+    Args:
+        writer: CSVWriter, SQLiteWriter or ParquetWriter
+        scale: Multiplier on the base row counts (1 = 2,000 orders)
+        chunk_size: Rows generated and written per chunk
+        seed: Seed for Faker pools and NumPy draws
+
+    Returns:
+        dict: rows written per table
+    """
+    rng = np.random.default_rng(seed)
+    pools = build_pools(seed)
+    sizes = {table: max(1, int(round(rows * scale))) for table, rows in BASE_ROWS.items()}
+    counts = dict.fromkeys(['customers', 'products', 'orders', 'order_items', 'reviews'], 0)
+
+    def log(message):
+        if verbose:
+            print(message)
+
+    # Customer ids are kept (as compact bytes) so orders and reviews can refer to them
+    customer_ids = []
+    for start in range(0, sizes['customers'], chunk_size):
+        chunk = create_customers_data(rng, pools, min(chunk_size, sizes['customers'] - start))
+        customer_ids.append(chunk['customer_id'].to_numpy().astype('S36'))
+        writer.write('customers', chunk)
+        counts['customers'] += len(chunk)
+    customer_ids = np.concatenate(customer_ids)
+    log(f"Generated {counts['customers']:,} customers")
+
+    products_df = create_products_data(rng, pools, sizes['products'])
+    writer.write('products', products_df)
+    counts['products'] = len(products_df)
+    log(f"Generated {counts['products']:,} products")
+
+    strides = coprime_strides(len(products_df))   # the same for every chunk
+    for start in range(0, sizes['orders'], chunk_size):
+        orders_df, order_items_df = create_orders_data(
+            rng, pools, customer_ids, products_df, min(chunk_size, sizes['orders'] - start), strides=strides)
+        writer.write('orders', orders_df)
+        writer.write('order_items', order_items_df)
+        counts['orders'] += len(orders_df)
+        counts['order_items'] += len(order_items_df)
+        log(f"Generated {counts['orders']:,} / {sizes['orders']:,} orders")
+    log(f"Generated {counts['order_items']:,} order items")
+
+    product_ids = products_df['product_id'].to_numpy()
+    for start in range(0, sizes['reviews'], chunk_size):
+        reviews_df = create_reviews_data(
+            rng, pools, customer_ids, product_ids, min(chunk_size, sizes['reviews'] - start))
+        writer.write('reviews', reviews_df)
+        counts['reviews'] += len(reviews_df)
+    log(f"Generated {counts['reviews']:,} reviews")
+
+    writer.close()
+    return counts
+
 
 def main():
-    """Generate all dummy data and save to CSV files"""
+    """Generate all dummy data and save it as CSV files, a SQLite database or Parquet files"""
+    parser = argparse.ArgumentParser(description="Generate sample e-commerce data")
+    parser.add_argument('--scale', type=float, default=1.0,
+                        help="Multiplier on the base sizes (1 = 1,000 customers / 2,000 orders)")
+    parser.add_argument('--format', choices=sorted(WRITERS), default='csv')
+    parser.add_argument('--output', default=None,
+                        help="Directory for csv/parquet, database file for sqlite "
+                             "(default: this script's directory, sample_database.sqlite in it for sqlite)")
+    parser.add_argument('--chunk-size', type=int, default=500_000)
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+    if args.output is None:
+        # Next to this script, where db_loader.py and the notebook look for the data
+        lesson_dir = os.path.dirname(os.path.abspath(__file__))
+        args.output = os.path.join(lesson_dir, 'sample_database.sqlite') if args.format == 'sqlite' else lesson_dir
+
     print("Generating dummy data...")
-    
-    # Create data
-    customers_df = create_customers_data(1000)
-    products_df = create_products_data(200)
-    orders_df = create_orders_data(customers_df, products_df, 2000)
-    order_items_df = create_order_items_data(orders_df, products_df)
-    reviews_df = create_reviews_data(customers_df, products_df, 1500)
-    
-    # Save to CSV files
-    save_path = './Lessons_OpenAI/lesson_4_text_to_sql/'
-    customers_df.to_csv(save_path+'customers.csv', index=False)
-    products_df.to_csv(save_path+'products.csv', index=False)
-    orders_df.to_csv(save_path+'orders.csv', index=False)
-    order_items_df.to_csv(save_path+'order_items.csv', index=False)
-    reviews_df.to_csv(save_path+'reviews.csv', index=False)
-    
-    print("Data generation complete!")
-    print(f"Generated {len(customers_df)} customers")
-    print(f"Generated {len(products_df)} products")
-    print(f"Generated {len(orders_df)} orders")
-    print(f"Generated {len(order_items_df)} order items")
-    print(f"Generated {len(reviews_df)} reviews")
-    
-    # Display sample data
-    print("\nSample data:")
-    print("\nCustomers:")
-    print(customers_df.head())
-    print("\nProducts:")
-    print(products_df.head())
-    print("\nOrders:")
-    print(orders_df.head())
+    started = time.perf_counter()
+    counts = generate(WRITERS[args.format](args.output), args.scale, args.chunk_size, args.seed)
+    elapsed = time.perf_counter() - started
+
+    print(f"Data generation complete in {elapsed:.1f}s ({sum(counts.values()) / elapsed:,.0f} rows/s)")
+    print(f"Written to {args.output} ({args.format})")
+
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,266 @@
+"""
+Benchmark: Full Schema Dump vs Schema Linking
+
+Compares the size of the schema prompt sent to the LLM when the full schema is
+dumped (create_schema_prompt() in the lesson notebook) against the pruned schema
+produced by schema_linking.SchemaLinker, and measures whether the pruned schema
+still contains every table and column needed to answer each question.
+
+To show the effect on a wide warehouse, the e-commerce schema can be padded with
+unrelated tables (--extra-tables). With --llm the questions are also converted to
+SQL with both prompts and executed, so execution accuracy can be compared.
+
+Run from the lesson_4_text_to_sql folder after creating sample_database.sqlite:
+    python examples/benchmark_schema_linking.py
+    python examples/benchmark_schema_linking.py --extra-tables 300
+    python examples/benchmark_schema_linking.py --llm
+"""
+
+import argparse
+import os
+import random
+import sqlite3
+import statistics
+import sys
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+from schema_catalog import SchemaCatalog
+from schema_linking import SchemaLinker, format_linked_schema, load_table_metadata
+
+try:
+    import tiktoken
+    _encoding = tiktoken.get_encoding("o200k_base")
+except Exception:
+    # tiktoken not installed, or its encoding files could not be downloaded
+    _encoding = None
+
+
+def count_tokens(text):
+    if _encoding is None:
+        return len(text) // 4  # rough estimate
+    return len(_encoding.encode(text))
+
+
+# (question, tables needed, columns needed, reference SQL)
+ECOMMERCE_QUESTIONS = [
+    ("How many customers are there?",
+     {"customers"}, set(),
+     "SELECT COUNT(*) FROM customers"),
+    ("Show me the top 5 most expensive products",
+     {"products"}, {"products.product_name", "products.price"},
+     "SELECT product_name, price FROM products ORDER BY price DESC LIMIT 5"),
+    ("What is the total revenue from all orders?",
+     {"orders"}, {"orders.total_amount"},
+     "SELECT SUM(total_amount) FROM orders"),
+    ("Which customers are from California?",
+     {"customers"}, {"customers.state"},
+     "SELECT first_name, last_name FROM customers WHERE state = 'California'"),
+    ("Show me the top 5 customers by total spending",
+     {"customers"}, {"customers.total_spent"},
+     "SELECT first_name, last_name, total_spent FROM customers ORDER BY total_spent DESC LIMIT 5"),
+    ("What's the average rating for Electronics products?",
+     {"products", "reviews"}, {"products.category", "reviews.rating"},
+     "SELECT AVG(r.rating) FROM reviews r JOIN products p ON r.product_id = p.product_id WHERE p.category = 'Electronics'"),
+    ("Which customers have never left a review?",
+     {"customers", "reviews"}, {"reviews.customer_id"},
+     "SELECT COUNT(*) FROM customers WHERE customer_id NOT IN (SELECT customer_id FROM reviews)"),
+    ("What's the most popular product category by quantity sold?",
+     {"products", "order_items"}, {"products.category", "order_items.quantity"},
+     "SELECT p.category FROM order_items oi JOIN products p ON oi.product_id = p.product_id GROUP BY p.category ORDER BY SUM(oi.quantity) DESC LIMIT 1"),
+    ("Find customers from California who bought Electronics",
+     {"customers", "orders", "order_items", "products"}, {"customers.state", "products.category"},
+     "SELECT DISTINCT c.customer_id FROM customers c JOIN orders o ON c.customer_id = o.customer_id "
+     "JOIN order_items oi ON o.order_id = oi.order_id JOIN products p ON oi.product_id = p.product_id "
+     "WHERE c.state = 'California' AND p.category = 'Electronics'"),
+    ("Show me orders with more than 3 items",
+     {"orders", "order_items"}, {"order_items.order_id"},
+     "SELECT COUNT(*) FROM (SELECT order_id FROM order_items GROUP BY order_id HAVING COUNT(*) > 3)"),
+    ("Which products are out of stock?",
+     {"products"}, {"products.stock_quantity"},
+     "SELECT product_name FROM products WHERE stock_quantity = 0"),
+    ("What is the average order value per payment method?",
+     {"orders"}, {"orders.total_amount", "orders.payment_method"},
+     "SELECT payment_method, AVG(total_amount) FROM orders GROUP BY payment_method"),
+    ("How many orders were shipped last month?",
+     {"orders"}, {"orders.status", "orders.order_date"},
+     None),
+    ("Which supplier has the most products?",
+     {"products"}, {"products.supplier"},
+     "SELECT supplier FROM products GROUP BY supplier ORDER BY COUNT(*) DESC LIMIT 1"),
+    ("List the reviews with the most helpful votes",
+     {"reviews"}, {"reviews.helpful_votes"},
+     "SELECT review_id, helpful_votes FROM reviews ORDER BY helpful_votes DESC LIMIT 10"),
+]
+
+METADATA_QUESTIONS = [
+    ("What is the average credit score of customers by income category?",
+     {"customer_information"}, {"customer_information.credit_score", "customer_information.income_category"}),
+    ("Total grocery spending per customer this year",
+     {"transaction_history"}, {"transaction_history.amount", "transaction_history.category"}),
+    ("Which merchants do customers with a Business account type spend the most at?",
+     {"customer_information", "transaction_history"},
+     {"customer_information.account_type", "transaction_history.merchant_name", "transaction_history.amount"}),
+    ("How many failed transactions happened through the mobile app?",
+     {"transaction_history"}, {"transaction_history.status", "transaction_history.channel"}),
+    ("List customers eligible for a loan with their eligible loan amount",
+     {"customer_information"}, {"customer_information.loan_eligible", "customer_information.eligible_loan_amount"}),
+]
+
+_DOMAINS = ["hr", "finance", "marketing", "logistics", "support", "inventory", "payroll",
+            "crm", "web", "audit", "legal", "procurement", "facilities", "it", "sales_ops"]
+_ENTITIES = ["employees", "campaigns", "shipments", "tickets", "warehouses", "invoices",
+             "contracts", "vendors", "assets", "sessions", "leads", "budgets", "timesheets",
+             "incidents", "licenses", "routes", "carriers", "surveys", "events", "accounts"]
+_COLUMNS = ["name", "code", "description", "created_at", "updated_at", "status", "owner",
+            "region", "amount", "currency", "start_date", "end_date", "priority", "notes",
+            "category", "score", "channel", "manager", "cost_center", "reference", "source",
+            "target", "duration", "rate", "budget", "approved_by", "version", "external_id"]
+
+
+def add_distractor_tables(schema, count, seed=7):
+    """Pad a schema with unrelated tables to simulate a wide warehouse."""
+    rng = random.Random(seed)
+    padded = dict(schema)
+    names = [f"{d}_{e}" for d in _DOMAINS for e in _ENTITIES]
+    rng.shuffle(names)
+    for name in names[:count]:
+        columns = [(f"{name[:-1] if name.endswith('s') else name}_id", "TEXT")]
+        columns += [(c, rng.choice(["TEXT", "REAL", "INTEGER", "DATE"])) for c in rng.sample(_COLUMNS, rng.randint(8, 20))]
+        sample = {c: f"{c}-{i}" for i, (c, _) in enumerate(columns)}
+        padded[name] = {
+            'columns': columns,
+            'primary_key': [],
+            'foreign_keys': [],
+            'sample_data': [sample, sample],
+        }
+    return padded
+
+
+def full_prompt(schema):
+    """The full dump, formatted like create_schema_prompt() in the notebook."""
+    return format_linked_schema(schema, title="DATABASE SCHEMA:")
+
+
+def covers(pruned, tables, columns):
+    """Did the pruned schema keep everything the question needs?"""
+    if not tables <= set(pruned):
+        return False, False
+    kept = {f"{t}.{c}" for t, info in pruned.items() for c, _ in info['columns']}
+    return True, columns <= kept
+
+
+def run_linking_benchmark(label, schema, questions):
+    started = time.perf_counter()
+    linker = SchemaLinker(schema)
+    build_ms = (time.perf_counter() - started) * 1000
+
+    full = full_prompt(schema)
+    full_tokens = count_tokens(full)
+
+    pruned_tokens, link_ms = [], []
+    table_hits = column_hits = 0
+    misses = []
+    for question, tables, columns, *_ in questions:
+        started = time.perf_counter()
+        pruned = linker.link(question)
+        link_ms.append((time.perf_counter() - started) * 1000)
+        pruned_tokens.append(count_tokens(format_linked_schema(pruned)))
+
+        has_tables, has_columns = covers(pruned, tables, columns)
+        table_hits += has_tables
+        column_hits += has_tables and has_columns
+        if not (has_tables and has_columns):
+            misses.append(question)
+
+    n = len(questions)
+    print(f"\n{label}")
+    print("-" * 60)
+    print(f"Tables in schema:            {len(schema)}")
+    print(f"Index build time:            {build_ms:.1f} ms")
+    print(f"Full schema prompt:          {full_tokens} tokens")
+    print(f"Linked prompt (mean / max):  {statistics.mean(pruned_tokens):.0f} / {max(pruned_tokens)} tokens")
+    print(f"Reduction:                   {full_tokens / statistics.mean(pruned_tokens):.1f}x")
+    print(f"Linking latency (mean):      {statistics.mean(link_ms):.2f} ms")
+    print(f"Table recall:                {table_hits}/{n}")
+    print(f"Table + column recall:       {column_hits}/{n}")
+    for question in misses:
+        print(f"  missed: {question}")
+    return linker
+
+
+def run_llm_benchmark(db_path, schema, linker, questions):
+    """Generate SQL with the full and the linked prompt and compare execution accuracy."""
+    from shared.llm_client import get_client, get_model
+
+    client = get_client()
+    model = get_model()
+
+    def generate(schema_text, question):
+        response = client.responses.create(
+            model=model,
+            input=[
+                {"role": "system", "content": f"You are a SQL expert. Generate only a valid SQLite query, no explanations.\n\n{schema_text}"},
+                {"role": "user", "content": question},
+            ],
+        )
+        sql = response.output_text.strip()
+        return sql.replace('```sql', '').replace('```', '').strip()
+
+    def run(sql):
+        conn = sqlite3.connect(db_path)
+        try:
+            return sorted(map(repr, conn.execute(sql).fetchall()))
+        except sqlite3.Error:
+            return None
+        finally:
+            conn.close()
+
+    full = full_prompt(schema)
+    scores = {"full": [0, 0.0], "linked": [0, 0.0]}
+    graded = [q for q in questions if q[3]]
+    for question, _, _, reference in graded:
+        expected = run(reference)
+        for name, schema_text in (("full", full), ("linked", format_linked_schema(linker.link(question)))):
+            started = time.perf_counter()
+            sql = generate(schema_text, question)
+            scores[name][1] += time.perf_counter() - started
+            scores[name][0] += run(sql) == expected
+
+    print("\nExecution accuracy (LLM)")
+    print("-" * 60)
+    for name, (correct, seconds) in scores.items():
+        print(f"{name:>7}: {correct}/{len(graded)} correct, {seconds / len(graded):.2f} s per question")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark schema linking against the full schema dump")
+    parser.add_argument("--db", default="sample_database.sqlite", help="SQLite database built in the lesson notebook")
+    parser.add_argument("--extra-tables", type=int, default=200, help="Unrelated tables to add for the wide-warehouse run")
+    parser.add_argument("--metadata-dir", default=os.path.join("..", "..", "table_metadata"),
+                        help="Folder with the markdown table metadata files")
+    parser.add_argument("--llm", action="store_true", help="Also compare execution accuracy using the LLM")
+    args = parser.parse_args()
+
+    schema = SchemaCatalog(args.db).get_schema()
+    linker = run_linking_benchmark("E-commerce database", schema, ECOMMERCE_QUESTIONS)
+
+    if args.extra_tables:
+        wide = add_distractor_tables(schema, args.extra_tables)
+        run_linking_benchmark(f"E-commerce database + {args.extra_tables} unrelated tables", wide, ECOMMERCE_QUESTIONS)
+
+    metadata_files = [
+        os.path.join(args.metadata_dir, "metadata_customer_information.txt"),
+        os.path.join(args.metadata_dir, "metadata_transaction_history.txt"),
+    ]
+    if all(os.path.exists(path) for path in metadata_files):
+        run_linking_benchmark("Documented banking tables (table_metadata/)",
+                              load_table_metadata(*metadata_files), METADATA_QUESTIONS)
+
+    if args.llm:
+        run_llm_benchmark(args.db, schema, linker, ECOMMERCE_QUESTIONS)
+
+
+if __name__ == "__main__":
+    main()
@@ -5,48 +5,54 @@ This example demonstrates a simple text-to-SQL conversion using OpenAI
 and SQLite database operations.
 """
 
-import sqlite3
 import os
-from openai import AzureOpenAI
+import sys
 from dotenv import load_dotenv
 
+# Make the lesson's helper modules (schema_catalog.py, ...) importable
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+# ... and the shared modules of the track (shared/llm_client.py, ...)
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+from shared.llm_client import get_client, MODEL
+from schema_catalog import SchemaCatalog
+from sql_engine import SQLEngine
+from query_cache import QueryCache
+from sql_validator import SQLValidator
+from query_guard import QueryGuard
+
 # Load environment variables
 load_dotenv()
 
-# Initialize OpenAI client
-client = AzureOpenAI(
-    api_key=os.environ.get("AZURE_OPENAI_KEY"),
-    azure_endpoint=os.environ.get("AZURE_OPENAI_ENDPOINT"),
-    azure_deployment=os.environ.get("AZURE_OPENAI_DEPLOYMENT_NAME"),
-    api_version=os.environ.get("AZURE_OPENAI_VERSION"),
-)
+# Shared client of the track (OpenAI or Azure OpenAI, from the environment):
+# pooled connections, retries with backoff on 429/5xx, identical requests coalesced
+client = get_client()
+
+# Schema is introspected once and only rebuilt when the database changes
+schema_catalog = SchemaCatalog('sample_database.sqlite', sample_rows=0)
+
+# Read-only connections are opened once and reused for every query
+sql_engine = SQLEngine('sample_database.sqlite')
+
+# Repeated questions reuse the generated SQL, and repeated queries reuse their
+# result until the database changes
+query_cache = QueryCache(version_fn=schema_catalog.get_version)
 
-MODEL = os.environ.get("AZURE_OPENAI_MODEL")
+# Generated SQL is checked against the schema (read-only, known tables/columns) before it runs
+sql_validator = SQLValidator(catalog=schema_catalog)
+
+# Queries whose plan would visit too many rows are refused before they run
+query_guard = QueryGuard('sample_database.sqlite', catalog=schema_catalog)
 
 def get_database_schema():
     """Get database schema information"""
-    conn = sqlite3.connect('sample_database.sqlite')
-    cursor = conn.cursor()
-    
-    schema_info = ""
-    cursor.execute("SELECT name FROM sqlite_master WHERE type='table';")
-    tables = cursor.fetchall()
-    
-    for table in tables:
-        table_name = table[0]
-        schema_info += f"\nTable: {table_name}\n"
-        
-        cursor.execute(f"PRAGMA table_info({table_name});")
-        columns = cursor.fetchall()
-        
-        for col in columns:
-            schema_info += f"  - {col[1]} ({col[2]})\n"
-    
-    conn.close()
-    return schema_info
+    return schema_catalog.describe()
 
 def text_to_sql(question):
-    """Convert natural language question to SQL"""
+    """Convert natural language question to SQL (cached per normalised question)"""
+    return query_cache.get_sql_or_generate(question, generate_sql)
+
+def generate_sql(question):
+    """Ask the LLM to convert a natural language question to SQL"""
     
     schema = get_database_schema()
     
@@ -79,28 +85,19 @@ Generate only the SQL query, no explanations:"""
         
     return sql_query
 
-def execute_query(sql_query):
-    """Execute SQL query and return results"""
-    try:
-        conn = sqlite3.connect('sample_database.sqlite')
-        cursor = conn.cursor()
-        
-        cursor.execute(sql_query)
-        results = cursor.fetchall()
-        column_names = [description[0] for description in cursor.description]
-        
-        conn.close()
-        
-        return {
-            'success': True,
-            'results': results,
-            'columns': column_names
-        }
-    except Exception as e:
-        return {
-            'success': False,
-            'error': str(e)
-        }
+def execute_query(sql_query, max_results=100):
+    """Execute SQL query and return at most max_results rows (cached per database version)"""
+    return query_cache.get_result_or_execute(sql_query, run_query, max_results)
+
+def run_query(sql_query, max_results):
+    # One extra row in the LIMIT lets the engine report truncated results
+    validation = sql_validator.validate(sql_query, max_rows=max_results + 1)
+    if not validation['is_valid']:
+        return {'success': False, 'error': '; '.join(validation['issues'])}
+    plan_check = query_guard.check(validation['sql'])
+    if not plan_check['ok']:
+        return {'success': False, 'error': plan_check['reason']}
+    return sql_engine.execute(validation['sql'], max_rows=max_results)
 
 def main():
     """Main function to demonstrate text-to-SQL"""
@@ -110,7 +107,8 @@ def main():
         "How many customers are there?",
         "Show me the top 5 most expensive products",
         "What is the total revenue from all orders?",
-        "Which customers are from California?"
+        "Which customers are from California?",
+        "how many customers are there",  # repeat: served from the cache
     ]
     
     for question in questions:
@@ -134,8 +132,13 @@ def main():
                 
             if len(result['results']) > 5:
                 print(f"  ... and {len(result['results']) - 5} more rows")
+            if result['truncated']:
+                print(f"  (stopped reading after {result['row_count']} rows)")
         else:
             print(f"Error: {result['error']}")
 
+    print(f"\n{'='*50}")
+    print(f"Cache stats: {query_cache.stats()}")
+
 if __name__ == "__main__":
     main()
@@ -0,0 +1,424 @@
+"""
+SQL Safety Validator for Text-to-SQL
+
+Checking generated SQL with `keyword in sql.upper()` rejects harmless queries
+(a column called `updated_at` contains UPDATE) and misses real problems (a
+table that does not exist, a second statement after a semicolon). This module
+tokenizes the query instead, so keywords, identifiers, string literals and
+comments are told apart, and then checks that:
+
+- there is exactly one statement, and it is a SELECT (optionally WITH ... SELECT)
+- no write/DDL/PRAGMA keyword or file-access function is used
+- every table and column exists in the schema (from a SchemaCatalog)
+- the result is bounded: a LIMIT is added when missing, and lowered when above max_rows
+
+Results are cached per SQL text and SQL fingerprint, and invalidated when the
+schema changes, so a repeated query is validated in microseconds.
+
+Usage:
+    validator = SQLValidator(catalog=SchemaCatalog('sample_database.sqlite'), max_rows=50)
+    check = validator.validate("SELECT first_name FROM customers WHERE state = 'Texas'")
+    # {'is_valid': True, 'issues': [], 'sql': "... LIMIT 50", 'limit_added': True, 'tables': ['customers']}
+"""
+
+import difflib
+import re
+
+from query_cache import LRUCache, sql_fingerprint
+
+
+_TOKEN = re.compile(r"""
+    (?P<space>\s+)
+  | (?P<comment>--[^\n]*|/\*.*?(?:\*/|$))
+  | (?P<blob>[xX]'[0-9a-fA-F]*')
+  | (?P<string>'(?:[^']|'')*')
+  | (?P<quoted>"(?:[^"]|"")*"|`(?:[^`]|``)*`|\[[^\]]*\])
+  | (?P<number>0[xX][0-9a-fA-F]+|(?:\d+\.?\d*|\.\d+)(?:[eE][+-]?\d+)?)
+  | (?P<param>\?\d*|[:@$][A-Za-z_]\w*)
+  | (?P<name>[A-Za-z_][\w$]*)
+  | (?P<op>\|\||->>|->|<<|>>|<=|>=|==|!=|<>|[-+*/%&|~<>=(),.;])
+  | (?P<other>.)
+""", re.VERBOSE | re.DOTALL)
+
+# SQLite keywords (https://www.sqlite.org/lang_keywords.html)
+KEYWORDS = frozenset("""
+    ABORT ACTION ADD AFTER ALL ALTER ALWAYS ANALYZE AND AS ASC ATTACH AUTOINCREMENT BEFORE
+    BEGIN BETWEEN BY CASCADE CASE CAST CHECK COLLATE COLUMN COMMIT CONFLICT CONSTRAINT CREATE
+    CROSS CURRENT CURRENT_DATE CURRENT_TIME CURRENT_TIMESTAMP DATABASE DEFAULT DEFERRABLE
+    DEFERRED DELETE DESC DETACH DISTINCT DO DROP EACH ELSE END ESCAPE EXCEPT EXCLUDE EXCLUSIVE
+    EXISTS EXPLAIN FAIL FILTER FIRST FOLLOWING FOR FOREIGN FROM FULL GENERATED GLOB GROUP
+    GROUPS HAVING IF IGNORE IMMEDIATE IN INDEX INDEXED INITIALLY INNER INSERT INSTEAD
+    INTERSECT INTO IS ISNULL JOIN KEY LAST LEFT LIKE LIMIT MATCH MATERIALIZED NATURAL NO NOT
+    NOTHING NOTNULL NULL NULLS OF OFFSET ON OR ORDER OTHERS OUTER OVER PARTITION PLAN PRAGMA
+    PRECEDING PRIMARY QUERY RAISE RANGE RECURSIVE REFERENCES REGEXP REINDEX RELEASE RENAME
+    REPLACE RESTRICT RETURNING RIGHT ROLLBACK ROW ROWS SAVEPOINT SELECT SET TABLE TEMP
+    TEMPORARY THEN TIES TO TRANSACTION TRIGGER TRUE FALSE UNBOUNDED UNION UNIQUE UPDATE USING
+    VACUUM VALUES VIEW VIRTUAL WHEN WHERE WINDOW WITH WITHOUT
+""".split())
+
+# Statements that change the database, its schema or the connection
+WRITE_KEYWORDS = frozenset("""
+    ALTER ANALYZE ATTACH BEGIN COMMIT CREATE DELETE DETACH DROP INSERT PRAGMA REINDEX
+    RELEASE RENAME REPLACE ROLLBACK SAVEPOINT TRUNCATE UPDATE VACUUM
+""".split())
+
+# Functions that can read/write files or load native code
+FORBIDDEN_FUNCTIONS = frozenset(["load_extension", "readfile", "writefile", "edit", "fts3_tokenizer"])
+
+# Keywords that end an expression, so a name right after them is an alias
+_VALUE_KEYWORDS = frozenset(["END", "NULL", "TRUE", "FALSE", "CURRENT_DATE", "CURRENT_TIME", "CURRENT_TIMESTAMP"])
+
+# Keywords that end the FROM clause
+_FROM_END = frozenset([
+    "WHERE", "GROUP", "HAVING", "ORDER", "LIMIT", "WINDOW", "UNION", "EXCEPT", "INTERSECT",
+    "ON", "USING", "RETURNING", "VALUES", "SELECT",
+])
+
+# Tables every SQLite database has
+_BUILTIN_TABLES = {
+    'sqlite_master': {'type', 'name', 'tbl_name', 'rootpage', 'sql'},
+    'sqlite_schema': {'type', 'name', 'tbl_name', 'rootpage', 'sql'},
+}
+
+
+def tokenize(sql):
+    """Split SQL into (kind, text, start, end) tokens, dropping whitespace and comments."""
+    tokens = []
+    for match in _TOKEN.finditer(sql):
+        kind = match.lastgroup
+        if kind != 'space' and kind != 'comment':
+            tokens.append((kind, match.group(), match.start(), match.end()))
+    return tokens
+
+
+def _unquote(text):
+    if text[0] in '"`':
+        return text[1:-1].replace(text[0] * 2, text[0])
+    if text[0] == '[':
+        return text[1:-1]
+    return text
+
+
+def build_schema_index(schema):
+    """{table (lowercase): set of column names (lowercase)} for a SchemaCatalog schema."""
+    index = {name: set(columns) for name, columns in _BUILTIN_TABLES.items()}
+    for table, info in schema.items():
+        index[table.lower()] = {column.lower() for column, _ in info['columns']}
+    return index
+
+
+class _Analysis:
+    """Everything found in one statement while walking its tokens."""
+
+    def __init__(self):
+        self.issues = []
+        self.tables = []           # real tables referenced
+        self.aliases = {}          # alias -> table name, or None for subqueries/CTEs
+        self.names = set()         # aliases of columns, CTE columns, window names, ...
+        self.ctes = set()
+        self.columns = []          # unqualified column references
+        self.qualified = []        # (qualifier, column) references
+        self.open_columns = False  # a table-valued function was used, columns are unknown
+        self.limit = None          # index of the top-level LIMIT keyword
+
+
+def _skip_parens(tokens, i):
+    """Index just after the parenthesis group opening at tokens[i]."""
+    depth = 0
+    while i < len(tokens):
+        text = tokens[i][1]
+        if text == '(':
+            depth += 1
+        elif text == ')':
+            depth -= 1
+            if depth == 0:
+                return i + 1
+        i += 1
+    return i
+
+
+def _analyze(tokens, index):
+    result = _Analysis()
+    n = len(tokens)
+
+    # Statement type
+    first = tokens[0][1].upper() if tokens else ''
+    if first not in ('SELECT', 'WITH'):
+        result.issues.append(f"Only SELECT statements are allowed (got {first or 'an empty query'})")
+
+    # Common table expressions: WITH [RECURSIVE] name [(columns)] AS [NOT] [MATERIALIZED] (...), ...
+    cte_names = set()
+    if first == 'WITH':
+        i = 1
+        if i < n and tokens[i][1].upper() == 'RECURSIVE':
+            i += 1
+        while i < n and tokens[i][0] in ('name', 'quoted'):
+            name = _unquote(tokens[i][1]).lower()
+            result.ctes.add(name)
+            result.aliases[name] = None
+            cte_names.add(i)
+            i += 1
+            if i < n and tokens[i][1] == '(':
+                end = _skip_parens(tokens, i)
+                result.names.update(_unquote(t[1]).lower() for t in tokens[i + 1:end - 1] if t[0] in ('name', 'quoted'))
+                cte_names.update(range(i + 1, end - 1))
+                i = end
+            while i < n and tokens[i][1].upper() in ('AS', 'NOT', 'MATERIALIZED'):
+                i += 1
+            if i < n and tokens[i][1] == '(':
+                i = _skip_parens(tokens, i)
+            if i < n and tokens[i][1] == ',':
+                i += 1
+            else:
+                break
+
+    depth = 0
+    from_depths = set()        # paren depths currently inside a FROM clause
+    expect_table = False       # next name is a table (after FROM / JOIN / ',')
+    last_table = None          # table that an alias right after it would refer to
+    skip_next = False          # next name is a collation / index / type, not a column
+
+    for i, (kind, text, _, _) in enumerate(tokens):
+        upper = text.upper() if kind == 'name' else text
+        prev = tokens[i - 1] if i else None
+        nxt = tokens[i + 1] if i + 1 < n else None
+
+        if kind == 'op':
+            if text == '(':
+                depth += 1
+            elif text == ')':
+                from_depths.discard(depth)
+                depth -= 1
+                last_table = None
+                expect_table = False
+            elif text == ',' and depth in from_depths:
+                expect_table = True
+            continue
+
+        if kind == 'other':
+            result.issues.append(f"Unexpected character {text!r} (unterminated string or identifier?)")
+            continue
+
+        if kind not in ('name', 'quoted') or i in cte_names:
+            continue
+
+        prev_upper = prev[1].upper() if prev and prev[0] == 'name' else None
+
+        if kind == 'name' and upper in KEYWORDS:
+            if upper in WRITE_KEYWORDS and not (upper == 'REPLACE' and nxt and nxt[1] == '('):
+                result.issues.append(f"Write operation not allowed: {upper}")
+            if upper in ('FROM', 'JOIN'):
+                from_depths.add(depth)
+                expect_table = True
+            elif upper in _FROM_END:
+                from_depths.discard(depth)
+                expect_table = False
+                last_table = None
+            elif upper == 'COLLATE' or (upper == 'BY' and prev_upper == 'INDEXED'):
+                # Collation and index names are not columns
+                skip_next = True
+            if upper == 'LIMIT' and depth == 0:
+                result.limit = i
+            continue
+
+        name = _unquote(text).lower()
+
+        if skip_next:
+            skip_next = False
+            continue
+
+        # Function call (or table-valued function in FROM)
+        if nxt and nxt[1] == '(' and kind == 'name':
+            if name in FORBIDDEN_FUNCTIONS:
+                result.issues.append(f"Function not allowed: {name}()")
+            if expect_table:
+                result.open_columns = True
+                expect_table = False
+                last_table = name
+            continue
+
+        # Qualifier of a qualified column: q.column
+        if nxt and nxt[1] == '.':
+            continue
+        if prev and prev[1] == '.':
+            qualifier = tokens[i - 2][1] if i >= 2 else ''
+            result.qualified.append((_unquote(qualifier).lower(), name))
+            continue
+
+        # Table reference in a FROM / JOIN clause
+        if expect_table:
+            expect_table = False
+            last_table = name
+            if name in result.ctes:
+                result.aliases.setdefault(name, None)
+            elif name in index:
+                result.tables.append(name)
+                result.aliases[name] = name
+            else:
+                result.issues.append(_unknown("table", name, index))
+            continue
+
+        # Alias definition: "AS alias", or a name right after a value ("SUM(x) total", "orders o")
+        is_alias = prev_upper in ('AS', 'OVER', 'WINDOW') or (
+            prev is not None and (
+                prev[0] in ('quoted', 'string', 'number', 'blob') or prev[1] == ')'
+                or (prev[0] == 'name' and (prev_upper not in KEYWORDS or prev_upper in _VALUE_KEYWORDS))
+            )
+        )
+        if is_alias:
+            if depth in from_depths:
+                # Table alias: orders o / (SELECT ...) AS t
+                target = last_table if prev[1] != ')' else None
+                result.aliases[name] = result.aliases.get(target) if target else None
+            else:
+                result.names.add(name)
+            continue
+
+        result.columns.append(name)
+
+    return result
+
+
+def _unknown(kind, name, candidates, display=None):
+    close = difflib.get_close_matches(name, list(candidates), n=1)
+    hint = f" (did you mean {close[0]}?)" if close else ""
+    return f"Unknown {kind}: {display or name}{hint}"
+
+
+def _check_names(result, index):
+    """Report columns that do not exist in any table the query reads from."""
+    known = set(result.names)
+    for table in result.tables:
+        known |= index[table]
+    # Columns of subqueries and CTEs come from the tables they read, which are listed above
+    known.update(('rowid', 'oid', '_rowid_'))
+
+    issues = []
+    for qualifier, column in result.qualified:
+        if qualifier in ('main', 'temp'):
+            continue
+        if qualifier not in result.aliases:
+            if qualifier in index:
+                issues.append(f"Table {qualifier} is used in a column reference but is not in the FROM clause")
+            else:
+                issues.append(_unknown("table or alias", qualifier, result.aliases))
+            continue
+        table = result.aliases[qualifier]
+        if table and column not in index[table] and column not in ('rowid', 'oid', '_rowid_'):
+            issues.append(_unknown("column", column, index[table], display=f"{table}.{column}"))
+
+    if not result.open_columns:
+        for column in dict.fromkeys(result.columns):
+            if column not in known and column not in result.aliases:
+                issues.append(_unknown("column", column, known))
+    return issues
+
+
+class SQLValidator:
+    """Validates generated SQL against the database schema, with caching."""
+
+    def __init__(self, catalog=None, schema=None, max_rows=50, cache_size=2048):
+        """
+        Args:
+            catalog: SchemaCatalog to read the schema from (checked for changes on each call)
+            schema: Schema dict to use instead of a catalog
+            max_rows: LIMIT added to queries without one, and the highest LIMIT allowed
+            cache_size: Number of validation results to keep
+        """
+        if catalog is None and schema is None:
+            raise ValueError("Provide a SchemaCatalog or a schema dict")
+        self.catalog = catalog
+        self.max_rows = max_rows
+        self._static_index = build_schema_index(schema) if schema is not None else None
+        self._cache = LRUCache(cache_size)
+
+    def _index(self):
+        if self._static_index is not None:
+            return self._static_index
+        # Built once per schema version by the catalog; a new object means the schema changed
+        return self.catalog.render(build_schema_index)
+
+    def validate(self, sql, max_rows=None):
+        """
+        Validate a query and bound its result size.
+
+        Returns:
+            dict: {
+                'is_valid': bool,
+                'issues': list of problems found,
+                'sql': the query to execute (with a LIMIT added or lowered),
+                'limit_added': True if the LIMIT was added or changed,
+                'tables': tables the query reads from
+            }
+        """
+        max_rows = max_rows or self.max_rows
+        index = self._index()
+
+        key = (sql, max_rows)
+        entry = self._cache.get(key)
+        if entry is None or entry[0] is not index:
+            # Same query written differently (case, whitespace, comments)?
+            fingerprint_key = (sql_fingerprint(sql), max_rows)
+            entry = self._cache.get(fingerprint_key)
+            if entry is None or entry[0] is not index:
+                entry = (index, self._validate(sql, index, max_rows))
+                self._cache.set(fingerprint_key, entry)
+            self._cache.set(key, entry)
+
+        return dict(entry[1])
+
+    def _validate(self, sql, index, max_rows):
+        if not isinstance(sql, str) or not sql.strip():
+            return {'is_valid': False, 'issues': ["Query is empty"], 'sql': sql, 'limit_added': False, 'tables': []}
+
+        tokens = tokenize(sql)
+
+        # Only one statement: nothing but semicolons may follow the first semicolon
+        issues = []
+        end = len(tokens)
+        for i, token in enumerate(tokens):
+            if token[1] == ';':
+                end = i
+                if any(t[1] != ';' for t in tokens[i + 1:]):
+                    issues.append("Only one SQL statement is allowed")
+                break
+        tokens = tokens[:end]
+
+        result = _analyze(tokens, index)
+        issues += result.issues
+        if not any(kind == 'other' for kind, _, _, _ in tokens):
+            # Names can't be trusted once the tokenizer lost track of quotes
+            issues += _check_names(result, index)
+
+        bounded_sql, limit_added = _bound_limit(sql, tokens, result.limit, max_rows)
+        return {
+            'is_valid': not issues,
+            'issues': issues,
+            'sql': bounded_sql if not issues else sql,
+            'limit_added': limit_added and not issues,
+            'tables': list(dict.fromkeys(result.tables)),
+        }
+
+
+def _bound_limit(sql, tokens, limit_index, max_rows):
+    """Add LIMIT max_rows when missing, or lower a literal LIMIT above max_rows."""
+    if not tokens:
+        return sql, False
+
+    if limit_index is None:
+        end = tokens[-1][3]
+        return f"{sql[:end]} LIMIT {max_rows}", True
+
+    # LIMIT count [OFFSET n]  or  LIMIT offset, count
+    count = limit_index + 1
+    if count + 2 < len(tokens) and tokens[count + 1][1] == ',':
+        count += 2
+    if count < len(tokens) and tokens[count][0] == 'number':
+        try:
+            value = float(tokens[count][1])
+        except ValueError:
+            return sql, False
+        if value > max_rows:
+            _, _, start, end = tokens[count]
+            return f"{sql[:start]}{max_rows}{sql[end:]}", True
+    return sql, False
@@ -0,0 +1,120 @@
+"""Tests for the BatchRunner with the mocked LLM (run with: python -m pytest tests)."""
+
+import asyncio
+import json
+import os
+import sqlite3
+import sys
+import time
+
+import pytest
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from batch_runner import BatchRunner, TokenBucket, make_mock_generator, run_batch
+from sql_engine import SQLEngine
+
+
+QUESTIONS = [
+    {'id': 'count', 'question': "How many customers are there?",
+     'expected_sql': "SELECT COUNT(*) FROM customers"},
+    {'id': 'cities', 'question': "Which cities do customers live in?",
+     'expected_sql': "SELECT DISTINCT city FROM customers ORDER BY city"},
+    {'id': 'names', 'question': "List the customers in Berlin",
+     'expected_sql': "SELECT name FROM customers WHERE city = 'Berlin'"},
+    {'id': 'ungraded', 'question': "Show three customers"},
+]
+
+
+@pytest.fixture
+def engine(tmp_path):
+    path = str(tmp_path / 'customers.sqlite')
+    conn = sqlite3.connect(path)
+    conn.execute("CREATE TABLE customers (customer_id INTEGER PRIMARY KEY, name TEXT, city TEXT)")
+    conn.executemany("INSERT INTO customers (name, city) VALUES (?, ?)",
+                     [("Ada", "Berlin"), ("Bo", "Oslo"), ("Cy", "Berlin"), ("Di", "Lima")])
+    conn.commit()
+    conn.close()
+    engine = SQLEngine(path)
+    yield engine
+    engine.close()
+
+
+def test_token_bucket_paces_requests_after_the_burst():
+    async def acquire_all():
+        bucket = TokenBucket(rate=20, capacity=2)
+        started = time.monotonic()
+        for _ in range(6):
+            await bucket.acquire()
+        return time.monotonic() - started
+
+    # 2 tokens are available at once, the other 4 arrive at 20 per second
+    assert 0.18 <= asyncio.run(acquire_all()) < 1.0
+
+
+def test_runner_scores_generated_sql_against_expected_sql(engine, tmp_path):
+    # The mocked LLM answers one question wrongly and one with invalid SQL
+    answers = [dict(item) for item in QUESTIONS]
+    answers[1]['expected_sql'] = "SELECT city FROM customers"
+    answers[2]['expected_sql'] = "SELECT nme FROM customers"
+    answers[3]['expected_sql'] = "SELECT name FROM customers LIMIT 3"
+    generate = make_mock_generator(answers, latency=0.01)
+    output = tmp_path / 'results.jsonl'
+
+    summary = asyncio.run(run_batch(QUESTIONS, generate, engine.execute, output_path=str(output)))
+
+    records = {r['id']: r for r in map(json.loads, output.read_text(encoding='utf-8').splitlines())}
+    assert records['count']['match'] is True
+    assert records['count']['rows'] == [[4]]
+    assert records['cities']['match'] is False
+    assert records['names']['success'] is False and records['names']['match'] is False
+    assert 'match' not in records['ungraded'] and records['ungraded']['row_count'] == 3
+    assert (summary['questions'], summary['succeeded'], summary['graded'], summary['matched']) == (4, 3, 3, 1)
+
+
+def test_runner_keeps_concurrency_questions_in_flight(engine):
+    items = [{'id': str(i), 'question': f"Question {i}", 'expected_sql': "SELECT 1"} for i in range(12)]
+    mock = make_mock_generator(items, latency=0)
+    in_flight, peak = 0, 0
+
+    async def generate(question):
+        nonlocal in_flight, peak
+        in_flight += 1
+        peak = max(peak, in_flight)
+        await asyncio.sleep(0.05)
+        sql = await mock(question)
+        in_flight -= 1
+        return sql
+
+    started = time.monotonic()
+    summary = asyncio.run(BatchRunner(generate, engine.execute, concurrency=4).run(items))
+
+    assert peak == 4
+    # 12 questions of 50 ms, 4 at a time: three rounds rather than twelve
+    assert time.monotonic() - started < 0.45
+    assert summary['matched'] == 12
+
+
+def test_runner_respects_the_request_rate(engine):
+    items = [{'id': str(i), 'question': f"Question {i}"} for i in range(15)]
+    runner = BatchRunner(make_mock_generator(items, latency=0), engine.execute,
+                         concurrency=15, requests_per_minute=600)
+
+    started = time.monotonic()
+    summary = asyncio.run(runner.run(items))
+
+    # 10 requests per second with a burst of 10: the last 5 wait half a second
+    assert time.monotonic() - started >= 0.45
+    assert summary['succeeded'] == 15
+
+
+def test_resume_skips_recorded_questions(engine, tmp_path):
+    output = str(tmp_path / 'results.jsonl')
+    generate = make_mock_generator(QUESTIONS, latency=0)
+    asyncio.run(run_batch(QUESTIONS[:2], generate, engine.execute, output_path=output))
+
+    summary = asyncio.run(run_batch(QUESTIONS, generate, engine.execute, output_path=output, resume=True))
+
+    assert (summary['skipped'], summary['questions']) == (2, 2)
+    with open(output, encoding='utf-8') as f:
+        assert sorted(json.loads(line)['id'] for line in f) == sorted(item['id'] for item in QUESTIONS)
@@ -0,0 +1,35 @@
+"""Tests for the CSV -> SQLite loader (run with: python -m pytest tests)."""
+
+import os
+import sqlite3
+import sys
+
+import pytest
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from db_loader import load_database
+
+
+def test_missing_csvs_are_an_error(tmp_path):
+    db_path = str(tmp_path / 'shop.sqlite')
+    with pytest.raises(FileNotFoundError, match="create_dummy_data.py"):
+        load_database(str(tmp_path), db_path, verbose=False)
+    assert not os.path.exists(db_path)
+
+
+def test_only_changed_csvs_are_reloaded(tmp_path):
+    csv_path = tmp_path / 'products.csv'
+    csv_path.write_text("product_id,product_name,price,is_active\nP1,Lamp,19.5,True\nP2,Desk,120,False\n",
+                        encoding='utf-8')
+    db_path = str(tmp_path / 'shop.sqlite')
+
+    assert load_database(str(tmp_path), db_path, verbose=False) == ['products']
+    assert load_database(str(tmp_path), db_path, verbose=False) == []
+
+    csv_path.write_text("product_id,product_name,price,is_active\nP1,Lamp,21,True\n", encoding='utf-8')
+    assert load_database(str(tmp_path), db_path, verbose=False) == ['products']
+
+    conn = sqlite3.connect(db_path)
+    assert conn.execute("SELECT product_id, price, is_active FROM products").fetchall() == [('P1', 21.0, 1)]
+    conn.close()
@@ -0,0 +1,81 @@
+"""Tests for QueryCache (run with: python -m pytest tests)."""
+
+import os
+import sqlite3
+import sys
+
+import numpy as np
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from query_cache import QueryCache
+from schema_catalog import SchemaCatalog
+from test_schema_catalog import build_database
+
+
+class CountingExecutor:
+    def __init__(self, db_path):
+        self.db_path = db_path
+        self.calls = 0
+
+    def __call__(self, sql):
+        self.calls += 1
+        conn = sqlite3.connect(self.db_path)
+        try:
+            return {'success': True, 'rows': conn.execute(sql).fetchall()}
+        finally:
+            conn.close()
+
+
+def test_result_is_reused_until_the_database_is_rebuilt(tmp_path):
+    db_path = str(tmp_path / "test.sqlite")
+    build_database(db_path, 1)
+    catalog = SchemaCatalog(db_path)
+    cache = QueryCache(version_fn=catalog.get_version)
+    execute = CountingExecutor(db_path)
+
+    assert cache.get_result_or_execute("SELECT n FROM numbers", execute)['rows'] == [(1,)]
+    assert cache.get_result_or_execute("select n from numbers", execute)['rows'] == [(1,)]
+    assert execute.calls == 1
+
+    build_database(db_path, 2)
+    assert cache.get_result_or_execute("SELECT n FROM numbers", execute)['rows'] == [(2,)]
+    assert execute.calls == 2
+    catalog.close()
+
+
+def test_failed_results_are_not_cached():
+    cache = QueryCache()
+    calls = []
+
+    def execute(sql):
+        calls.append(sql)
+        return {'success': False, 'error': 'no such table'}
+
+    cache.get_result_or_execute("SELECT * FROM missing", execute)
+    cache.get_result_or_execute("SELECT * FROM missing", execute)
+    assert len(calls) == 2
+
+
+def test_sql_is_generated_once_per_normalised_question():
+    cache = QueryCache()
+    generated = []
+
+    def generate(question):
+        generated.append(question)
+        return "SELECT COUNT(*) FROM customers"
+
+    cache.get_sql_or_generate("How many customers?", generate)
+    assert cache.get_sql_or_generate("  how many   CUSTOMERS ", generate) == "SELECT COUNT(*) FROM customers"
+    assert len(generated) == 1
+
+
+def test_a_missed_question_is_embedded_once():
+    embedded = []
+
+    def embed(texts):
+        embedded.extend(texts)
+        return [np.ones(4) for _ in texts]
+
+    cache = QueryCache(embed_fn=embed)
+    cache.get_sql_or_generate("How many customers?", lambda question: "SELECT COUNT(*) FROM customers")
+    assert len(embedded) == 1
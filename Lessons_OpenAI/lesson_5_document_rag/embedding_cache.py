@@ -0,0 +1,307 @@
+"""
+Content-Addressed Embedding Cache
+
+Re-chunking the corpus with a different chunk_size/chunk_overlap, or rebuilding an
+index, embeds every chunk again, including the (many) chunks whose text is
+exactly the same as last time. This cache stores every embedding once, keyed by
+(model, SHA-256 of the text), so any index, run or script that embeds the same
+text with the same model gets it back without an API call.
+
+Storage is compact and fast to read:
+
+- vectors live in one flat binary file per model (float32, or float16 for half
+  the size), read through a NumPy memory map
+- a SQLite table maps (model, text hash) to the row of the vector in that file
+
+CachedEmbedding wraps any LlamaIndex embedding model (e.g. OpenAIEmbedding), so
+VectorStoreIndex, retrievers and our own code all go through the cache. Misses
+are embedded in as few requests as possible: up to 2048 texts and ~250k tokens
+per request, the OpenAI embeddings API limits.
+
+Usage:
+    embed_model = CachedEmbedding(OpenAIEmbedding(model="text-embedding-3-large"), cache_dir="embedding_cache")
+    Settings.embed_model = embed_model
+
+    vectors = embed_model.get_text_embedding_batch(["some text", "more text"])
+    print(embed_model.stats)   # {'hits': ..., 'misses': ..., 'requests': ...}
+"""
+
+import hashlib
+import os
+import sqlite3
+import sys
+import threading
+
+import numpy as np
+from llama_index.core.base.embeddings.base import BaseEmbedding
+from pydantic import PrivateAttr
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from shared.context_packer import count_tokens
+
+MAX_BATCH_TEXTS = 2048
+MAX_BATCH_TOKENS = 250_000
+
+
+def text_key(text):
+    return hashlib.sha256(text.encode('utf-8')).digest()
+
+
+def model_key(embed_model):
+    """Identify the vectors an embedding model produces: class, model (or Azure deployment) and dimensions."""
+    parts = [type(embed_model).__name__, embed_model.model_name]
+    for attr in ('azure_deployment', 'dimensions'):
+        value = getattr(embed_model, attr, None)
+        if value:
+            parts.append(str(value))
+    return ":".join(parts)
+
+
+class EmbeddingCache:
+    """Embeddings on disk: one memory-mapped matrix per model plus a SQLite key index."""
+
+    def __init__(self, cache_dir='embedding_cache', dtype='float32'):
+        """
+        Args:
+            cache_dir: Directory for the index and vector files (created if missing)
+            dtype: 'float32', or 'float16' to halve the size (about 3 significant digits)
+        """
+        self.cache_dir = cache_dir
+        self.dtype = np.dtype(dtype)
+        os.makedirs(cache_dir, exist_ok=True)
+        self._lock = threading.Lock()
+        self._maps = {}
+        self._conn = sqlite3.connect(os.path.join(cache_dir, 'index.sqlite'),
+                                     check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode = WAL")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS models (model TEXT PRIMARY KEY, dim INTEGER, file TEXT)")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS vectors ("
+            "model TEXT, key BLOB, row INTEGER, PRIMARY KEY (model, key)) WITHOUT ROWID"
+        )
+
+    def _model_info(self, model):
+        """(dim, path, dtype) of a model's vector file; the dtype is the file's extension."""
+        row = self._conn.execute("SELECT dim, file FROM models WHERE model = ?", (model,)).fetchone()
+        if row is None:
+            return None, None, self.dtype
+        return row[0], os.path.join(self.cache_dir, row[1]), np.dtype(os.path.splitext(row[1])[1][1:])
+
+    def _rows(self, model, keys):
+        """{key: row} for the keys that are stored."""
+        rows = {}
+        unique = list(dict.fromkeys(keys))
+        for start in range(0, len(unique), 500):  # stay under SQLite's parameter limit
+            batch = unique[start:start + 500]
+            rows.update(self._conn.execute(
+                f"SELECT key, row FROM vectors WHERE model = ? AND key IN ({','.join('?' * len(batch))})",
+                [model, *batch],
+            ).fetchall())
+        return rows
+
+    def _matrix(self, path, dim, dtype, rows_needed):
+        """Memory map of a vector file, remapped when it has grown past the cached map."""
+        matrix = self._maps.get(path)
+        if matrix is None or len(matrix) < rows_needed:
+            rows = os.path.getsize(path) // (dim * dtype.itemsize)
+            matrix = self._maps[path] = np.memmap(path, dtype=dtype, mode='r', shape=(rows, dim))
+        return matrix
+
+    def get_many(self, model, keys):
+        """
+        Look up vectors by text key.
+
+        Returns:
+            tuple: (vectors, missing) where vectors is a float32 array with one row per key
+                   (zeros for misses) and missing lists the positions of the misses
+        """
+        with self._lock:
+            dim, path, dtype = self._model_info(model)
+            if dim is None:
+                return None, list(range(len(keys)))
+            rows = self._rows(model, keys)
+            vectors = np.zeros((len(keys), dim), dtype=np.float32)
+            found = [i for i, key in enumerate(keys) if key in rows]
+            if found:
+                positions = np.array([rows[keys[i]] for i in found])
+                matrix = self._matrix(path, dim, dtype, int(positions.max()) + 1)
+                vectors[found] = matrix[positions]
+        return vectors, [i for i, key in enumerate(keys) if key not in rows]
+
+    def put_many(self, model, keys, vectors):
+        """Append vectors for the given text keys (keys already stored are skipped)."""
+        if not len(keys):
+            return
+        with self._lock:
+            # BEGIN IMMEDIATE takes SQLite's write lock, which also serialises appends
+            # to the vector file between processes sharing the cache
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                dim, path, dtype = self._model_info(model)
+                vectors = np.asarray(vectors, dtype=dtype)
+                if dim is None:
+                    dim = vectors.shape[1]
+                    file_name = hashlib.sha1(model.encode('utf-8')).hexdigest()[:16] + f'.{dtype.name}'
+                    self._conn.execute("INSERT INTO models (model, dim, file) VALUES (?, ?, ?)",
+                                       (model, dim, file_name))
+                    path = os.path.join(self.cache_dir, file_name)
+                if vectors.shape[1] != dim:
+                    raise ValueError(f"{model} returned {vectors.shape[1]}-dimensional vectors, cache has {dim}")
+
+                existing = self._rows(model, keys)
+                first_index = {}
+                for i, key in enumerate(keys):
+                    if key not in existing:
+                        first_index.setdefault(key, i)
+                if not first_index:
+                    self._conn.execute("COMMIT")
+                    return
+                new_keys = list(first_index)
+
+                # Rows are numbered by position in the file, so a vector written by a
+                # crashed run without its index entry is simply never referenced; a
+                # partially written row is cut off so the next one starts aligned
+                row_bytes = dim * dtype.itemsize
+                with open(path, 'ab') as f:
+                    size = f.tell()
+                    if size % row_bytes:
+                        size -= size % row_bytes
+                        f.truncate(size)
+                    first_row = size // row_bytes
+                    f.write(vectors[[first_index[key] for key in new_keys]].tobytes())
+                self._conn.executemany(
+                    "INSERT OR IGNORE INTO vectors (model, key, row) VALUES (?, ?, ?)",
+                    [(model, key, first_row + i) for i, key in enumerate(new_keys)],
+                )
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    def __len__(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM vectors").fetchone()[0]
+
+    def close(self):
+        self._maps.clear()
+        self._conn.close()
+
+
+class CachedEmbedding(BaseEmbedding):
+    """A LlamaIndex embedding model that serves repeated texts from an EmbeddingCache."""
+
+    embed_model: BaseEmbedding
+    max_batch_texts: int = MAX_BATCH_TEXTS
+    max_batch_tokens: int = MAX_BATCH_TOKENS
+
+    _cache = PrivateAttr()
+    _model = PrivateAttr()
+    _stats = PrivateAttr()
+    _stats_lock = PrivateAttr()
+
+    def __init__(self, embed_model, cache_dir='embedding_cache', dtype='float32', cache=None, **kwargs):
+        """
+        Args:
+            embed_model: The embedding model to wrap (e.g. OpenAIEmbedding)
+            cache_dir: Directory of the cache (ignored when cache is given)
+            dtype: Storage type of new cache files, 'float32' or 'float16'
+            cache: An EmbeddingCache to share between several wrapped models
+        """
+        kwargs.setdefault('model_name', embed_model.model_name)
+        kwargs.setdefault('embed_batch_size', MAX_BATCH_TEXTS)
+        super().__init__(embed_model=embed_model, **kwargs)
+        self._cache = cache or EmbeddingCache(cache_dir, dtype)
+        self._model = model_key(embed_model)
+        self._stats = {'hits': 0, 'misses': 0, 'requests': 0}
+        self._stats_lock = threading.Lock()
+
+    @classmethod
+    def class_name(cls):
+        return "CachedEmbedding"
+
+    @property
+    def cache(self):
+        return self._cache
+
+    @property
+    def stats(self):
+        return dict(self._stats)
+
+    def _count(self, **counts):
+        with self._stats_lock:
+            for name, value in counts.items():
+                self._stats[name] += value
+
+    def _batches(self, texts):
+        """Split texts into requests within the provider's per-request limits."""
+        batch, tokens = [], 0
+        for text in texts:
+            n = count_tokens(text)
+            if batch and (len(batch) >= self.max_batch_texts or tokens + n > self.max_batch_tokens):
+                yield batch
+                batch, tokens = [], 0
+            batch.append(text)
+            tokens += n
+        if batch:
+            yield batch
+
+    def _lookup(self, texts, namespace):
+        model = self._model + namespace
+        keys = [text_key(text) for text in texts]
+        vectors, missing = self._cache.get_many(model, keys)
+        # Identical texts in one call are embedded once
+        to_embed = list(dict.fromkeys(texts[i] for i in missing))
+        self._count(hits=len(texts) - len(missing), misses=len(to_embed))
+        return model, keys, vectors, missing, to_embed
+
+    def _merge(self, model, keys, vectors, missing, texts, to_embed, embedded):
+        self._cache.put_many(model, [text_key(text) for text in to_embed], embedded)
+        by_text = dict(zip(to_embed, embedded))
+        if vectors is None:
+            return [list(map(float, by_text[text])) for text in texts]
+        result = vectors.tolist()
+        for i in missing:
+            result[i] = list(map(float, by_text[texts[i]]))
+        return result
+
+    def _embed_texts(self, texts, namespace=''):
+        model, keys, vectors, missing, to_embed = self._lookup(texts, namespace)
+        embedded = []
+        for batch in self._batches(to_embed):
+            self._count(requests=1)
+            if namespace:
+                embedded.extend(self.embed_model._get_query_embedding(text) for text in batch)
+            else:
+                embedded.extend(self.embed_model._get_text_embeddings(batch))
+        return self._merge(model, keys, vectors, missing, texts, to_embed, embedded)
+
+    async def _aembed_texts(self, texts, namespace=''):
+        model, keys, vectors, missing, to_embed = self._lookup(texts, namespace)
+        embedded = []
+        for batch in self._batches(to_embed):
+            self._count(requests=1)
+            if namespace:
+                for text in batch:
+                    embedded.append(await self.embed_model._aget_query_embedding(text))
+            else:
+                embedded.extend(await self.embed_model._aget_text_embeddings(batch))
+        return self._merge(model, keys, vectors, missing, texts, to_embed, embedded)
+
+    # Queries are cached separately: some models embed queries and documents differently
+    def _get_query_embedding(self, query):
+        return self._embed_texts([query], namespace=':query')[0]
+
+    async def _aget_query_embedding(self, query):
+        return (await self._aembed_texts([query], namespace=':query'))[0]
+
+    def _get_text_embedding(self, text):
+        return self._embed_texts([text])[0]
+
+    async def _aget_text_embedding(self, text):
+        return (await self._aembed_texts([text]))[0]
+
+    def _get_text_embeddings(self, texts):
+        return self._embed_texts(list(texts))
+
+    async def _aget_text_embeddings(self, texts):
+        return await self._aembed_texts(list(texts))
@@ -0,0 +1,169 @@
+"""
+Inverted Metadata Index
+
+Filtering chunks by metadata (which file, what type, how recent, which tags) by
+looking at every chunk's metadata costs O(corpus) per filter, and rebuilding a
+vector index from the matching chunks costs far more. An inverted index answers
+the same question by looking up the filter value:
+
+- every metadata key maps each of its values to the rows (chunks) that have it,
+  e.g. file_name -> {"sample1.txt": [0, 1, 2], "sample2.txt": [3, 4]}
+- list values such as tags are indexed element by element, so "chunks tagged
+  'finance'" is a single lookup
+- equality and membership filters cost O(matching rows); range and substring
+  filters (dates such as last_modified_date, file names) only look at the
+  distinct values of the key, i.e. one per file rather than one per chunk
+
+The result is a set of row numbers that the vector search uses as a pre-filter.
+NumpyVectorIndex keeps one of these up to date as vectors are added and deleted.
+
+Usage:
+    metadata_index = MetadataIndex()
+    metadata_index.add(0, [{'file_name': 'a.pdf', 'tags': ['finance']}, {'file_name': 'b.txt'}])
+    rows = metadata_index.rows('tags', 'contains', 'finance')   # array([0])
+    metadata_index.match('file_name', 'A.P')                      # ['a.pdf']
+"""
+
+import numpy as np
+
+_SCALARS = (str, int, float, bool)
+
+
+def _terms(value):
+    """The indexed values of a metadata value: the elements of a list, otherwise the value itself."""
+    if isinstance(value, (list, tuple, set)):
+        return list(dict.fromkeys(v for v in value if isinstance(v, _SCALARS)))
+    return [value] if isinstance(value, _SCALARS) else []
+
+
+def _comparable(a, b):
+    """Range filters compare numbers with numbers and strings (e.g. ISO dates) with strings."""
+    if isinstance(a, str) or isinstance(b, str):
+        return isinstance(a, str) and isinstance(b, str)
+    return isinstance(a, (int, float)) and isinstance(b, (int, float))
+
+
+_COMPARE = {
+    '>': lambda a, b: a > b,
+    '<': lambda a, b: a < b,
+    '>=': lambda a, b: a >= b,
+    '<=': lambda a, b: a <= b,
+}
+
+
+class MetadataIndex:
+    """Maps metadata key -> value -> rows, for filtering without scanning every row."""
+
+    def __init__(self):
+        self._postings = {}  # key -> {value: [rows]}
+        self._live = {}      # key -> {value: number of rows not deleted}
+
+    @classmethod
+    def from_metadata(cls, metadata, alive=None):
+        """Index a list of metadata dicts (row i is metadata[i]), skipping rows where alive is False."""
+        index = cls()
+        for row, meta in enumerate(metadata):
+            if alive is None or alive[row]:
+                index._add_row(row, meta)
+        return index
+
+    def _add_row(self, row, meta):
+        for key, value in meta.items():
+            postings = self._postings.setdefault(key, {})
+            live = self._live.setdefault(key, {})
+            for term in _terms(value):
+                postings.setdefault(term, []).append(row)
+                live[term] = live.get(term, 0) + 1
+
+    def add(self, start, metadata):
+        """Index rows start, start + 1, ... with the given metadata dicts."""
+        for i, meta in enumerate(metadata):
+            self._add_row(start + i, meta)
+
+    def remove(self, row, meta):
+        """
+        Forget a deleted row.
+
+        Values left without rows are dropped; otherwise the row stays in the posting
+        list (removing it would cost O(rows of the value)), and callers mask it out
+        with their own record of deleted rows.
+        """
+        for key, value in meta.items():
+            live = self._live.get(key, {})
+            for term in _terms(value):
+                if term not in live:
+                    continue
+                live[term] -= 1
+                if live[term] == 0:
+                    del live[term]
+                    del self._postings[key][term]
+
+    # --- lookups -------------------------------------------------------------
+
+    def keys(self):
+        return [key for key, live in self._live.items() if live]
+
+    def values(self, key):
+        """Distinct values of a key that at least one row still has."""
+        return sorted(self._live.get(key, {}), key=lambda v: (type(v).__name__, v))
+
+    def match(self, key, text):
+        """Values of a key that contain text, ignoring case (e.g. file names matching "report")."""
+        text = text.lower()
+        return [v for v in self.values(key) if isinstance(v, str) and text in v.lower()]
+
+    def count(self, key, value):
+        return self._live.get(key, {}).get(value, 0)
+
+    def _union(self, key, values):
+        postings = self._postings.get(key, {})
+        lists = [postings[v] for v in values if v in postings]
+        if not lists:
+            return np.zeros(0, dtype=np.int64)
+        return np.unique(np.concatenate([np.asarray(rows, dtype=np.int64) for rows in lists]))
+
+    def rows(self, key, operator, value):
+        """
+        Rows whose metadata[key] satisfies the operator; may include deleted rows.
+
+        For list values (tags), '==' and 'contains' match rows whose list contains
+        value, 'in'/'any' rows that share any element with value and 'all' rows that
+        contain every element of value.
+
+        Returns:
+            array: sorted row numbers
+        """
+        postings = self._postings.get(key, {})
+        if operator in ('==', 'contains'):
+            return self._union(key, [value])
+        if operator in ('in', 'any'):
+            return self._union(key, _terms(value))
+        if operator == 'all':
+            wanted = _terms(value)
+            if not wanted:
+                return self._union(key, list(postings))
+            result = self._union(key, wanted[:1])
+            for term in wanted[1:]:
+                result = np.intersect1d(result, self._union(key, [term]), assume_unique=True)
+            return result
+        if operator in ('!=', 'nin'):
+            excluded = [value] if operator == '!=' else _terms(value)
+            return np.setdiff1d(self._union(key, list(postings)), self._union(key, excluded), assume_unique=True)
+        if operator in _COMPARE:
+            compare = _COMPARE[operator]
+            return self._union(key, [v for v in postings if not isinstance(v, bool) and _comparable(v, value)
+                                     and compare(v, value)])
+        if operator == 'text_match':
+            return self._union(key, [v for v in postings if isinstance(v, str) and value in v])
+        if operator == 'text_match_insensitive':
+            return self._union(key, self.match(key, value))
+        if operator == 'is_empty':
+            raise ValueError("is_empty selects rows without a value; use rows_without()")
+        raise ValueError(f"Unsupported filter operator: {operator}")
+
+    def rows_without(self, key, size):
+        """Rows among the first size rows that have no (non-empty) value for key."""
+        mask = np.ones(size, dtype=bool)
+        present = [v for v in self._postings.get(key, {}) if v != '']
+        mask[self._union(key, present)] = False
+        return np.flatnonzero(mask)
@@ -0,0 +1,213 @@
+"""
+Async, Cache-Aware Query Service
+
+The lesson's query engines are synchronous: a tree_summarize response summarises
+its retrieved chunks one LLM call at a time, and comparing two documents runs
+one query after the other, so a comparison takes the sum of its parts. Asking
+the same question twice pays for it twice.
+
+QueryService wraps an index and answers queries asynchronously:
+
+- tree_summarize runs with use_async=True, so the chunk summaries of one query are
+  requested concurrently
+- independent queries (several questions, or the per-document and overall parts
+  of a comparison) run concurrently, so a comparison takes about as long as its
+  slowest part; at most max_concurrency queries run at once
+- answers are cached by (normalised question, index version, parameters); the
+  vector store's version changes whenever documents are added or removed, so
+  cached answers never outlive the index they came from
+- identical questions asked at the same time share one execution
+
+Usage:
+    service = QueryService(index, similarity_top_k=5, max_concurrency=4)
+    response = await service.aquery("What is IaaS?")
+    result = await service.acompare("machine learning", ["sample1.txt", "sample2.txt"])
+    print(service.stats)   # {'queries': ..., 'hits': ..., 'shared': ..., 'misses': ...}
+"""
+
+import asyncio
+import json
+import re
+from collections import OrderedDict
+
+from llama_index.core import get_response_synthesizer
+from llama_index.core.query_engine import RetrieverQueryEngine
+from llama_index.core.vector_stores import FilterOperator, MetadataFilter, MetadataFilters
+
+COMPARISON_QUESTION = """
+Based on the available documents, compare and contrast how {topic} is presented.
+Highlight similarities and differences in the explanations, approaches, or perspectives.
+"""
+
+
+def normalize_question(question):
+    return re.sub(r"\s+", " ", question).strip().lower()
+
+
+class QueryService:
+    """Concurrent, cached question answering over a VectorStoreIndex."""
+
+    def __init__(self, index, similarity_top_k=5, response_mode="tree_summarize", node_postprocessors=None,
+                 vector_store_query_mode="default", max_concurrency=4, cache_size=256):
+        """
+        Args:
+            index: The VectorStoreIndex to query
+            similarity_top_k: Chunks retrieved per query
+            response_mode: LlamaIndex response mode (tree_summarize, compact, ...)
+            node_postprocessors: Postprocessors applied to the retrieved chunks
+            vector_store_query_mode: "default" (dense) or "hybrid" (dense + BM25)
+            max_concurrency: Queries executed at the same time (each may make up to
+                             similarity_top_k concurrent LLM calls while summarising)
+            cache_size: Answers kept in the LRU cache (0 disables caching)
+        """
+        self.index = index
+        self.similarity_top_k = similarity_top_k
+        self.response_mode = response_mode
+        self.node_postprocessors = list(node_postprocessors or [])
+        self.vector_store_query_mode = vector_store_query_mode
+        self.max_concurrency = max_concurrency
+        self.cache_size = cache_size
+        self._cache = OrderedDict()
+        self._in_flight = {}
+        self._semaphore = None
+        self._loop = None
+        self._stats = {'queries': 0, 'hits': 0, 'shared': 0, 'misses': 0}
+
+    @property
+    def stats(self):
+        return dict(self._stats)
+
+    def clear_cache(self):
+        self._cache.clear()
+
+    def index_version(self):
+        """Changes whenever the index content changes (NumpyVectorStore keeps a counter)."""
+        version = getattr(self.index.vector_store, 'version', None)
+        return version if version is not None else len(self.index.docstore.docs)
+
+    def _params(self, filters, similarity_top_k, response_mode):
+        return {
+            'similarity_top_k': similarity_top_k or self.similarity_top_k,
+            'response_mode': response_mode or self.response_mode,
+            'mode': str(self.vector_store_query_mode),
+            'filters': filters.model_dump() if filters is not None else None,
+            'postprocessors': [p.class_name() for p in self.node_postprocessors],
+        }
+
+    def _cache_key(self, question, params):
+        return (normalize_question(question), self.index_version(),
+                json.dumps(params, sort_keys=True, default=str))
+
+    def _get_semaphore(self):
+        # asyncio primitives belong to one event loop; query() runs each call in a new one
+        loop = asyncio.get_running_loop()
+        if self._semaphore is None or self._loop is not loop:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+            self._loop = loop
+            self._in_flight = {}
+        return self._semaphore
+
+    def _engine(self, filters, params):
+        retriever = self.index.as_retriever(
+            similarity_top_k=params['similarity_top_k'],
+            vector_store_query_mode=self.vector_store_query_mode,
+            filters=filters,
+        )
+        return RetrieverQueryEngine(
+            retriever=retriever,
+            node_postprocessors=self.node_postprocessors,
+            response_synthesizer=get_response_synthesizer(response_mode=params['response_mode'], use_async=True),
+        )
+
+    async def _execute(self, question, filters, params):
+        async with self._get_semaphore():
+            return await self._engine(filters, params).aquery(question)
+
+    async def aquery(self, question, filters=None, similarity_top_k=None, response_mode=None):
+        """
+        Answer a question, from the cache if it was answered for the current index.
+
+        Args:
+            question: The question
+            filters: Optional MetadataFilters restricting the retrieved chunks
+            similarity_top_k: Overrides the service's setting for this query
+            response_mode: Overrides the service's setting for this query
+
+        Returns:
+            Response: the LlamaIndex response (the same object for cache hits)
+        """
+        self._stats['queries'] += 1
+        params = self._params(filters, similarity_top_k, response_mode)
+        key = self._cache_key(question, params)
+        if key in self._cache:
+            self._cache.move_to_end(key)
+            self._stats['hits'] += 1
+            return self._cache[key]
+
+        self._get_semaphore()
+        task = self._in_flight.get(key)
+        if task is not None:
+            self._stats['shared'] += 1
+            return await asyncio.shield(task)
+
+        self._stats['misses'] += 1
+        task = asyncio.ensure_future(self._execute(question, filters, params))
+        self._in_flight[key] = task
+        try:
+            response = await asyncio.shield(task)
+        finally:
+            self._in_flight.pop(key, None)
+        if self.cache_size:
+            self._cache[key] = response
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+        return response
+
+    async def aquery_many(self, questions, filters=None):
+        """Answer several questions concurrently; returns the responses in order."""
+        return await asyncio.gather(*(self.aquery(q, filters) for q in questions))
+
+    def file_filters(self, document_filter):
+        """MetadataFilters for the files whose name contains document_filter, or None if none match."""
+        metadata_index = getattr(self.index.vector_store, 'metadata_index', None)
+        if metadata_index is not None:
+            file_names = metadata_index.match('file_name', document_filter)
+        else:
+            file_names = sorted({
+                node.metadata.get('file_name', '') for node in self.index.docstore.docs.values()
+                if document_filter.lower() in node.metadata.get('file_name', '').lower()
+            })
+        if not file_names:
+            return None
+        return MetadataFilters(filters=[
+            MetadataFilter(key="file_name", value=file_names, operator=FilterOperator.IN)
+        ])
+
+    async def acompare(self, topic, document_filters, question="Explain {topic}",
+                       comparison_question=COMPARISON_QUESTION):
+        """
+        Ask about a topic in each document and across all documents, concurrently.
+
+        Args:
+            topic: The topic to compare
+            document_filters: File name substrings, one per document (e.g. ["sample1", "sample2"])
+            question: Per-document question template
+            comparison_question: Question over all documents
+
+        Returns:
+            dict: {'documents': {document_filter: Response or None if no file matched},
+                   'comparison': Response}
+        """
+        filters = {name: self.file_filters(name) for name in document_filters}
+        matched = [name for name in document_filters if filters[name] is not None]
+        responses = await asyncio.gather(
+            *(self.aquery(question.format(topic=topic), filters[name]) for name in matched),
+            self.aquery(comparison_question.format(topic=topic)),
+        )
+        documents = {name: None for name in document_filters}
+        documents.update(zip(matched, responses[:-1]))
+        return {'documents': documents, 'comparison': responses[-1]}
+
+    def query(self, question, filters=None, similarity_top_k=None, response_mode=None):
+        """Synchronous aquery() for scripts (in a notebook, use await service.aquery(...))."""
+        return asyncio.run(self.aquery(question, filters, similarity_top_k, response_mode))
@@ -0,0 +1,195 @@
+"""
+Tiered Query Router: Rules, Nearest Neighbours, then the LLM
+
+Asking the LLM which agent should handle "total sales for Q4 2024" costs a full
+round-trip before any agent starts, and the answer is always the same. Most
+queries are like that; only the unusual ones need the LLM's judgement.
+
+TieredRouter tries the cheap tiers first:
+
+1. cache: a query routed before (after normalising case and spacing) gets the same
+   decision
+2. rules: keyword/regex rules map obvious queries to agents; queries that ask for
+   analysis, comparisons or explanations are left to the later tiers
+3. nearest neighbours: the query is compared with the queries the LLM has routed
+   before; if the most similar ones are close enough and agree, their decision is
+   reused. Embeddings are local hashed word/bigram vectors by default (no API
+   call), or any embed_fn, e.g. an embedding model
+4. LLM: the fallback; its decision is cached and becomes a new neighbour example
+
+Hit counts per tier are kept in stats, so the share of requests that skipped the
+LLM can be logged (e.g. with mlflow.log_metrics). Examples can be saved and
+loaded, so the nearest-neighbour tier starts warm in the next session.
+
+Usage:
+    router = TieredRouter(llm_route=route_with_llm)   # llm_route(query) -> [{"agent": ..., "task": ...}]
+    tasks, tier = router.route("What were total sales for Q4 2024?")   # ([{"agent": "sql", ...}], "rules")
+    print(router.stats)
+    router.save("router_examples.json")
+"""
+
+import json
+import os
+import re
+import zlib
+from collections import OrderedDict
+
+import numpy as np
+
+DEFAULT_RULES = [
+    ("sql", r"\b(total|sum|average|avg|count|how many|number of|top \d+)\b.*"
+            r"\b(sales|revenue|orders?|customers?|products?|units)\b"),
+    ("sql", r"\b(sales|revenue|orders)\b.*\b(q[1-4]|20\d\d|last (month|quarter|year))\b"),
+    ("rag", r"\b(our|internal|company)\b.*\b(reports?|polic(y|ies)|documents?|handbook|guidelines?)\b"),
+    ("web_search", r"\b(news|latest|current|today|this week|market trends?|competitors?)\b"),
+]
+
+# Queries the rules should not decide: they usually need several agents and a task breakdown
+ESCALATE = r"\b(comprehensive|compare|comparison|versus|vs|analy[sz]e|analysis|why|explain|recommend)\b"
+
+_WORD = re.compile(r"\w+")
+
+
+def normalize_query(query):
+    return " ".join(_WORD.findall(query.lower()))
+
+
+def hashed_embedding(texts, dim=1024):
+    """Local embeddings: hashed word and word-pair counts, L2-normalised (no model, no API call)."""
+    vectors = np.zeros((len(texts), dim), dtype=np.float32)
+    for row, text in enumerate(texts):
+        words = _WORD.findall(text.lower())
+        for feature in words + [a + " " + b for a, b in zip(words, words[1:])]:
+            vectors[row, zlib.crc32(feature.encode()) % dim] += 1.0
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors / np.maximum(norms, 1e-9)
+
+
+class TieredRouter:
+    """Routes queries to agents by cache, rules, nearest neighbours and, only if needed, the LLM."""
+
+    def __init__(self, llm_route, rules=DEFAULT_RULES, escalate=ESCALATE, embed_fn=None, k=5,
+                 min_similarity=0.75, min_agreement=0.6, cache_size=1024):
+        """
+        Args:
+            llm_route: llm_route(query) -> list of task dicts ({"agent", "task", ...}); the fallback
+            rules: (agent, regex) pairs; every matching rule adds a task for its agent
+            escalate: Regex of queries the rules must not decide (None to disable)
+            embed_fn: embed_fn(texts) -> array of vectors (default: hashed_embedding)
+            k: Neighbours consulted
+            min_similarity: Cosine similarity the nearest example must reach
+            min_agreement: Share of the neighbours' similarity that must back the chosen agents
+            cache_size: Decisions kept in the LRU cache
+        """
+        self.llm_route = llm_route
+        self.rules = [(agent, re.compile(pattern, re.IGNORECASE)) for agent, pattern in rules]
+        self.escalate = re.compile(escalate, re.IGNORECASE) if escalate else None
+        self.embed_fn = embed_fn or hashed_embedding
+        self.k = k
+        self.min_similarity = min_similarity
+        self.min_agreement = min_agreement
+        self.cache_size = cache_size
+        self._cache = OrderedDict()
+        self._examples = []        # (query, agents)
+        self._vectors = None       # embeddings of the examples, one row each
+        self._stats = {'requests': 0, 'cache': 0, 'rules': 0, 'nearest_neighbour': 0, 'llm': 0}
+
+    # --- tiers ---------------------------------------------------------------
+
+    def _by_rules(self, query):
+        if self.escalate is not None and self.escalate.search(query):
+            return None
+        agents = list(dict.fromkeys(agent for agent, pattern in self.rules if pattern.search(query)))
+        return agents or None
+
+    def _by_neighbours(self, vector):
+        if self._vectors is None or not len(self._vectors):
+            return None
+        similarities = self._vectors @ vector
+        nearest = np.argsort(-similarities)[:self.k]
+        if similarities[nearest[0]] < self.min_similarity:
+            return None
+        votes = {}
+        for i in nearest:
+            if similarities[i] > 0:
+                agents = self._examples[i][1]
+                votes[agents] = votes.get(agents, 0.0) + float(similarities[i])
+        agents, weight = max(votes.items(), key=lambda item: item[1])
+        return list(agents) if weight / sum(votes.values()) >= self.min_agreement else None
+
+    def add_example(self, query, agents, vector=None):
+        """Remember how a query was routed (done automatically for LLM decisions)."""
+        if vector is None:
+            vector = np.asarray(self.embed_fn([query]), dtype=np.float32)[0]
+        agents = tuple(sorted(set(agents)))
+        if not agents:
+            return
+        self._examples.append((query, agents))
+        row = vector[None, :] / max(float(np.linalg.norm(vector)), 1e-9)
+        self._vectors = row if self._vectors is None else np.vstack([self._vectors, row])
+
+    # --- routing -------------------------------------------------------------
+
+    def route(self, query):
+        """
+        Decide which agents handle a query.
+
+        Returns:
+            tuple: (tasks, tier) where tasks is a list of {"agent", "task", ...} dicts and tier
+                   is 'cache', 'rules', 'nearest_neighbour' or 'llm'
+        """
+        self._stats['requests'] += 1
+        key = normalize_query(query)
+        if key in self._cache:
+            self._cache.move_to_end(key)
+            self._stats['cache'] += 1
+            return [dict(task) for task in self._cache[key]], 'cache'
+
+        vector = None
+        agents = self._by_rules(query)
+        tier = 'rules'
+        if agents is None:
+            vector = np.asarray(self.embed_fn([query]), dtype=np.float32)[0]
+            vector = vector / max(float(np.linalg.norm(vector)), 1e-9)
+            agents = self._by_neighbours(vector)
+            tier = 'nearest_neighbour'
+        if agents is not None:
+            tasks = [{"agent": agent, "task": query} for agent in agents]
+        else:
+            tier = 'llm'
+            tasks = self.llm_route(query)
+            self.add_example(query, [task['agent'] for task in tasks], vector)
+
+        self._stats[tier] += 1
+        if tasks:
+            self._cache[key] = [dict(task) for task in tasks]
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+        return tasks, tier
+
+    @property
+    def stats(self):
+        """Requests per tier, and the share that was routed without the LLM."""
+        requests = self._stats['requests']
+        return {**self._stats, 'examples': len(self._examples),
+                'llm_skipped_rate': round(1 - self._stats['llm'] / requests, 3) if requests else 0.0}
+
+    # --- persistence ---------------------------------------------------------
+
+    def save(self, path):
+        """Write the nearest-neighbour examples (queries and their agents) to a JSON file."""
+        with open(path + '.tmp', 'w') as f:
+            json.dump([{'query': q, 'agents': list(a)} for q, a in self._examples], f, indent=1)
+        os.replace(path + '.tmp', path)
+
+    def load(self, path):
+        """Add the examples saved by save(), if the file exists; returns how many were loaded."""
+        if not os.path.exists(path):
+            return 0
+        with open(path) as f:
+            examples = json.load(f)
+        if examples:
+            vectors = np.asarray(self.embed_fn([e['query'] for e in examples]), dtype=np.float32)
+            for example, vector in zip(examples, vectors):
+                self.add_example(example['query'], example['agents'], vector)
+        return len(examples)
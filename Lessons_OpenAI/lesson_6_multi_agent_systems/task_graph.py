@@ -0,0 +1,143 @@
+"""
+Dependency-Aware Parallel Task Execution for Multi-Agent Systems
+
+The router splits a question into tasks for specialist agents. Most of them are
+independent (query the database, search the documents, search the web), so
+running them one after the other makes the answer wait for the sum of all
+agent latencies, while the slowest agent would do.
+
+run_task_graph() executes the tasks as a dependency graph (DAG):
+
+- tasks without dependencies start immediately, in parallel (one thread each,
+  up to max_workers; the agents are blocking API and database calls)
+- a task with depends_on starts as soon as the tasks it depends on have finished,
+  and receives their results; it does not wait for unrelated tasks
+- a global deadline bounds the whole run: tasks still running at the deadline are
+  reported as timed out and the caller continues with the partial results
+- tasks whose dependencies failed, timed out or form a cycle are skipped
+- workers run in a copy of the caller's context, so tracing spans (mlflow.trace)
+  opened by the agents nest under the caller's span instead of starting new traces
+
+Usage:
+    outcomes = run_task_graph(
+        [{"id": "sales", "agent": "sql", "task": "Q4 totals"},
+         {"id": "news", "agent": "web_search", "task": "Market news"},
+         {"id": "why", "agent": "rag", "task": "Explain the change", "depends_on": ["sales"]}],
+        lambda task, inputs: agents[task["agent"]].execute(task["task"], inputs),
+        deadline_s=30,
+    )
+    completed = [o for o in outcomes if o['status'] == 'ok']
+"""
+
+import contextvars
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+
+def normalize_tasks(tasks):
+    """Give every task an id (t1, t2, ... when missing) and a list of known dependencies."""
+    normalized = []
+    for i, task in enumerate(tasks, 1):
+        task = dict(task)
+        task['id'] = str(task.get('id') or f"t{i}")
+        normalized.append(task)
+    ids = {task['id'] for task in normalized}
+    for task in normalized:
+        task['depends_on'] = [str(d) for d in task.get('depends_on') or [] if str(d) in ids and str(d) != task['id']]
+    return normalized
+
+
+def _in_cycles(tasks):
+    """Ids of tasks that can never start: on, or downstream of, a dependency cycle."""
+    pending = {task['id']: set(task['depends_on']) for task in tasks}
+    ready = [task_id for task_id, deps in pending.items() if not deps]
+    while ready:
+        done = ready.pop()
+        del pending[done]
+        for task_id, deps in pending.items():
+            if done in deps:
+                deps.discard(done)
+                if not deps:
+                    ready.append(task_id)
+    return set(pending)
+
+
+def _timed(run_fn, task, inputs):
+    started = time.perf_counter()
+    result = run_fn(task, inputs)
+    return result, time.perf_counter() - started
+
+
+def run_task_graph(tasks, run_fn, deadline_s=60.0, max_workers=8, verbose=True):
+    """
+    Run tasks in dependency order, independent ones in parallel, within a deadline.
+
+    Args:
+        tasks: List of dicts with optional 'id' and 'depends_on' (a list of ids)
+        run_fn: run_fn(task, inputs) -> result, where inputs is {dependency id: result}
+        deadline_s: Seconds after which unfinished tasks are abandoned
+        max_workers: Tasks running at the same time
+        verbose: Print when tasks finish
+
+    Returns:
+        list: One outcome per task, in task order: {'id', 'task', 'status' ('ok', 'error',
+              'timeout' or 'skipped'), 'result', 'error', 'started_s', 'latency_s'}
+    """
+    tasks = normalize_tasks(tasks)
+    started = time.perf_counter()
+    deadline = started + deadline_s
+    outcomes = {task['id']: {'id': task['id'], 'task': task, 'status': None, 'result': None, 'error': None,
+                             'started_s': None, 'latency_s': None} for task in tasks}
+    blocked = _in_cycles(tasks)
+    waiting = [task for task in tasks if task['id'] not in blocked]
+    running = {}
+    pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="agent")
+
+    def settle(task_id, status, error=None):
+        outcomes[task_id].update(status=status, error=error)
+        if verbose and status != 'ok':
+            print(f"   ⚠️ Task {task_id} {status}{': ' + str(error) if error else ''}")
+
+    for task_id in blocked:
+        settle(task_id, 'skipped', "circular dependency")
+
+    try:
+        while waiting or running:
+            # Start every task whose dependencies are done; skip those whose dependencies failed
+            for task in list(waiting):
+                statuses = [outcomes[d]['status'] for d in task['depends_on']]
+                if any(s not in (None, 'ok') for s in statuses):
+                    waiting.remove(task)
+                    settle(task['id'], 'skipped', "a dependency did not complete")
+                elif all(s == 'ok' for s in statuses):
+                    waiting.remove(task)
+                    inputs = {d: outcomes[d]['result'] for d in task['depends_on']}
+                    outcomes[task['id']]['started_s'] = round(time.perf_counter() - started, 3)
+                    # copy_context(): the worker sees the caller's active tracing span
+                    future = pool.submit(contextvars.copy_context().run, _timed, run_fn, task, inputs)
+                    running[future] = task['id']
+            if not running:
+                break
+
+            remaining = deadline - time.perf_counter()
+            done, _ = wait(running, timeout=max(0.0, remaining), return_when=FIRST_COMPLETED)
+            if not done:
+                for task_id in running.values():
+                    settle(task_id, 'timeout', f"still running after the {deadline_s:g}s deadline")
+                for task in waiting:
+                    settle(task['id'], 'skipped', "deadline reached")
+                break
+            for future in done:
+                task_id = running.pop(future)
+                try:
+                    result, latency = future.result()
+                    outcomes[task_id].update(result=result, latency_s=round(latency, 3))
+                    settle(task_id, 'ok')
+                    if verbose:
+                        print(f"   ✓ Task {task_id} finished in {latency:.2f}s")
+                except Exception as e:
+                    settle(task_id, 'error', f"{type(e).__name__}: {e}")
+    finally:
+        # Don't wait for abandoned tasks; their results are discarded
+        pool.shutdown(wait=False, cancel_futures=True)
+    return [outcomes[task['id']] for task in tasks]
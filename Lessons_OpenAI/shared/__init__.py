@@ -0,0 +1 @@
+"""Helpers shared by several lessons."""
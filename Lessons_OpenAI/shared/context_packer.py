@@ -0,0 +1,222 @@
+"""
+Token-Budgeted Context Packer for RAG Prompts
+
+Retrieved context is usually the largest part of a RAG prompt, and the part
+nobody measures: web results are concatenated whole, document engines pass on
+whatever the retriever returned, and the same paragraph often arrives several
+times from mirrored pages or overlapping chunks. Every one of those tokens is
+paid for and adds latency.
+
+The ContextPacker:
+
+- counts tokens with tiktoken, reusing one encoder per model and caching counts of
+  passages it has already seen (falling back to a ~4 characters per token estimate
+  when tiktoken or its encoding files are not available)
+- drops near-duplicate passages using 64-bit SimHash fingerprints of word pairs
+- greedily packs the highest-scoring passages into a token budget, with optional
+  caps on passages and tokens per source, so one long page cannot crowd out the rest
+
+Usage:
+    packer = ContextPacker(token_budget=2000, max_per_source=2)
+    packed = packer.pack([
+        {'text': chunk_text, 'score': 0.83, 'source': url},
+        ...
+    ])
+    context = "\n\n".join(p['text'] for p in packed['passages'])
+    print(packed['tokens'], packed['dropped'])
+"""
+
+import hashlib
+import re
+from functools import lru_cache
+
+DEFAULT_ENCODING = "o200k_base"
+CHARS_PER_TOKEN = 4
+
+_WORD = re.compile(r"\w+")
+
+
+@lru_cache(maxsize=None)
+def get_encoder(model=None):
+    """
+    Return a (cached) tiktoken encoder for a model, or None if tiktoken is unavailable.
+
+    Loading an encoding parses a large BPE file, so it is done once per model.
+    """
+    try:
+        import tiktoken
+    except ImportError:
+        return None
+    try:
+        return tiktoken.encoding_for_model(model) if model else tiktoken.get_encoding(DEFAULT_ENCODING)
+    except KeyError:
+        pass  # model unknown to this tiktoken version
+    except Exception:
+        return None  # encoding files could not be downloaded
+    try:
+        return tiktoken.get_encoding(DEFAULT_ENCODING)
+    except Exception:
+        return None
+
+
+@lru_cache(maxsize=16384)
+def count_tokens(text, model=None):
+    """Number of tokens in text for the given model (estimated if no encoder is available)."""
+    encoder = get_encoder(model)
+    if encoder is None:
+        return max(1, (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN) if text else 0
+    return len(encoder.encode(text, disallowed_special=()))
+
+
+def truncate_to_tokens(text, max_tokens, model=None):
+    """Cut text to at most max_tokens tokens."""
+    encoder = get_encoder(model)
+    if encoder is None:
+        return text[:max_tokens * CHARS_PER_TOKEN]
+    tokens = encoder.encode(text, disallowed_special=())
+    return text if len(tokens) <= max_tokens else encoder.decode(tokens[:max_tokens])
+
+
+def simhash(text, shingle_size=2):
+    """
+    64-bit SimHash of a text's word shingles (pairs of adjacent words by default).
+
+    Texts that share most of their shingles get fingerprints that differ in only a
+    few bits, so near-duplicates are found by Hamming distance.
+    """
+    words = _WORD.findall(text.lower())
+    if len(words) < shingle_size:
+        shingles = [" ".join(words)]
+    else:
+        shingles = [" ".join(words[i:i + shingle_size]) for i in range(len(words) - shingle_size + 1)]
+
+    weights = [0] * 64
+    for shingle in set(shingles):
+        h = int.from_bytes(hashlib.blake2b(shingle.encode("utf-8"), digest_size=8).digest(), "big")
+        for bit in range(64):
+            weights[bit] += 1 if h >> bit & 1 else -1
+    return sum(1 << bit for bit in range(64) if weights[bit] > 0)
+
+
+def hamming_distance(a, b):
+    return bin(a ^ b).count("1")
+
+
+class ContextPacker:
+    """Selects the best passages that fit in a token budget."""
+
+    def __init__(self, token_budget=3000, model=None, max_passages=None, max_per_source=None,
+                 max_tokens_per_source=None, dedup_distance=10, separator="\n\n", truncate_last=True,
+                 min_tail_tokens=64):
+        """
+        Args:
+            token_budget: Maximum tokens of context (including separators)
+            model: Model name used to pick the tokenizer (default: o200k_base)
+            max_passages: Maximum passages selected in total (None for no cap)
+            max_per_source: Maximum passages taken from one source (None for no cap)
+            max_tokens_per_source: Maximum tokens taken from one source (None for no cap)
+            dedup_distance: SimHash bits two passages may differ by and still count as
+                            duplicates (-1 to disable deduplication)
+            separator: Text placed between passages, counted against the budget
+            truncate_last: When the next passage does not fit, add a truncated copy of it
+                           if at least min_tail_tokens of budget remain
+            min_tail_tokens: Smallest useful truncated passage
+        """
+        self.token_budget = token_budget
+        self.model = model
+        self.max_passages = max_passages
+        self.max_per_source = max_per_source
+        self.max_tokens_per_source = max_tokens_per_source
+        self.dedup_distance = dedup_distance
+        self.separator = separator
+        self.truncate_last = truncate_last
+        self.min_tail_tokens = min_tail_tokens
+
+    def count(self, text):
+        return count_tokens(text, self.model)
+
+    def pack(self, passages, token_budget=None):
+        """
+        Pack passages into the budget, best score first.
+
+        Args:
+            passages: list of dicts with 'text', and optionally 'score' (higher is better)
+                      and 'source'; other keys are passed through
+            token_budget: Overrides the packer's budget for this call
+
+        Returns:
+            dict: {
+                'passages': selected passages (each with a 'tokens' key), best first,
+                'tokens': tokens used, including separators,
+                'dropped': {'duplicate', 'source_cap', 'budget'} counts,
+                'candidate_tokens': tokens of the passages considered
+            }
+        """
+        budget = self.token_budget if token_budget is None else token_budget
+        separator_tokens = self.count(self.separator) if self.separator else 0
+        ranked = sorted(passages, key=lambda p: -(p.get('score') or 0.0))
+
+        selected, fingerprints = [], []
+        per_source_count, per_source_tokens = {}, {}
+        dropped = {'duplicate': 0, 'source_cap': 0, 'budget': 0}
+        used = 0
+        candidate_tokens = 0
+
+        for passage in ranked:
+            if self.max_passages is not None and len(selected) >= self.max_passages:
+                break
+            text = passage.get('text') or ''
+            if not text.strip():
+                continue
+            tokens = self.count(text)
+            candidate_tokens += tokens
+            source = passage.get('source')
+
+            if self.dedup_distance >= 0:
+                fingerprint = simhash(text)
+                if any(hamming_distance(fingerprint, f) <= self.dedup_distance for f in fingerprints):
+                    dropped['duplicate'] += 1
+                    continue
+            else:
+                fingerprint = None
+
+            if source is not None:
+                if self.max_per_source is not None and per_source_count.get(source, 0) >= self.max_per_source:
+                    dropped['source_cap'] += 1
+                    continue
+                if (self.max_tokens_per_source is not None
+                        and per_source_tokens.get(source, 0) + tokens > self.max_tokens_per_source):
+                    dropped['source_cap'] += 1
+                    continue
+
+            cost = tokens + (separator_tokens if selected else 0)
+            if used + cost > budget:
+                remaining = budget - used - (separator_tokens if selected else 0)
+                if self.truncate_last and remaining >= self.min_tail_tokens:
+                    text = truncate_to_tokens(text, remaining, self.model)
+                    tokens = self.count(text)
+                    cost = tokens + (separator_tokens if selected else 0)
+                    passage = dict(passage, text=text, truncated=True)
+                else:
+                    dropped['budget'] += 1
+                    continue
+
+            selected.append(dict(passage, tokens=tokens))
+            if fingerprint is not None:
+                fingerprints.append(fingerprint)
+            used += cost
+            if source is not None:
+                per_source_count[source] = per_source_count.get(source, 0) + 1
+                per_source_tokens[source] = per_source_tokens.get(source, 0) + tokens
+
+        return {
+            'passages': selected,
+            'tokens': used,
+            'dropped': dropped,
+            'candidate_tokens': candidate_tokens,
+        }
+
+    def pack_text(self, passages, token_budget=None):
+        """Pack passages and join the selected texts with the separator."""
+        packed = self.pack(passages, token_budget)
+        return self.separator.join(p['text'] for p in packed['passages'])
@@ -0,0 +1,283 @@
+"""
+Token-Budgeted Conversation Memory
+
+Chat agents that resend their whole history grow slower and more expensive with
+every turn, and agents that keep "the last 10 messages" forget the start of the
+conversation while still resending every SQL result set they ever fetched.
+
+ConversationMemory keeps the history within a token budget:
+
+- recent turns are kept verbatim (a turn is a user message and everything that
+  followed it: tool calls, tool outputs, the answer)
+- when the history exceeds the budget, the oldest turns are evicted until it is
+  back under three quarters of the budget, and folded into a rolling summary
+- the summary is written by summarize_fn in a background thread, so no turn waits
+  for it; until it is ready, evicted turns are represented by a short extract
+  (with its own token allowance, so the newest evicted turns are never crowded
+  out by a long summary)
+- once a turn is complete, tool outputs longer than max_tool_tokens are replaced
+  by a preview and a reference; the full output stays available via artifact(ref)
+
+The prompt sent per turn is therefore bounded by token_budget plus the summary,
+however long the session runs. Items may be plain dicts or SDK objects in either
+the Responses API format (function_call / function_call_output items) or the
+Chat Completions format (assistant tool_calls / role "tool" messages).
+
+Usage:
+    memory = ConversationMemory(token_budget=3000, summarize_fn=summarize_history)
+    memory.add({"role": "user", "content": question})
+    response = client.responses.create(model=MODEL, input=[system] + memory.messages(), tools=tools)
+    memory.extend(response.output)
+    ...
+    print(memory.stats)
+"""
+
+import itertools
+import json
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from shared.context_packer import count_tokens, truncate_to_tokens
+
+SUMMARY_PREFIX = "Summary of the earlier conversation:\n"
+EVICT_TO = 0.75
+
+
+def _field(item, name, default=None):
+    if isinstance(item, dict):
+        return item.get(name, default)
+    return getattr(item, name, default)
+
+
+def _as_dict(item):
+    if isinstance(item, dict):
+        return item
+    if hasattr(item, 'model_dump'):
+        return item.model_dump(exclude_none=True)
+    return {'content': str(item)}
+
+
+def _text(content):
+    """Plain text of a message content (a string or a list of content parts)."""
+    if isinstance(content, str):
+        return content
+    if not content:
+        return ""
+    return " ".join(_field(part, 'text') or "" for part in content)
+
+
+def _tool_output_key(item):
+    """Name of the field holding a tool output, or None if item is not a tool output."""
+    if _field(item, 'type') == "function_call_output":
+        return 'output'
+    if _field(item, 'role') == "tool":
+        return 'content'
+    return None
+
+
+def render_item(item, max_chars=300):
+    """One transcript line for an item (used for summaries and extracts)."""
+    role = _field(item, 'role')
+    item_type = _field(item, 'type')
+    if _tool_output_key(item):
+        text = "Tool result: " + str(_field(item, _tool_output_key(item)) or "")
+    elif item_type == "function_call":
+        text = f"Tool call: {_field(item, 'name')}({_field(item, 'arguments')})"
+    elif role:
+        calls = _field(item, 'tool_calls') or []
+        text = f"{role.capitalize()}: {_text(_field(item, 'content'))}"
+        text += "".join(f" [tool call: {_field(c.function if hasattr(c, 'function') else c['function'], 'name')}]"
+                        for c in calls)
+    else:
+        return ""
+    return text if len(text) <= max_chars else text[:max_chars] + "..."
+
+
+def extract_summary(previous_summary, transcript):
+    """Summariser without an LLM: keeps the previous summary and the start of each line."""
+    lines = [line for line in transcript.splitlines() if not line.startswith("Tool")]
+    return "\n".join(filter(None, [previous_summary] + [line[:200] for line in lines]))
+
+
+def _newest_lines(text, max_tokens, model=None):
+    """The end of text within max_tokens: whole lines are dropped from the start."""
+    kept, used = [], 0
+    for line in reversed(text.splitlines()):
+        tokens = count_tokens(line, model) + 1
+        if used + tokens > max_tokens:
+            if not kept:
+                kept.append(truncate_to_tokens(line, max_tokens, model))
+            break
+        kept.append(line)
+        used += tokens
+    return "\n".join(reversed(kept))
+
+
+class ConversationMemory:
+    """Conversation history within a token budget, with a rolling summary of older turns."""
+
+    def __init__(self, token_budget=3000, summarize_fn=None, min_recent_turns=2, max_tool_tokens=300,
+                 tool_preview_tokens=100, summary_tokens=400, max_artifacts=100, model=None):
+        """
+        Args:
+            token_budget: Tokens the verbatim turns may use
+            summarize_fn: summarize_fn(previous_summary, transcript) -> new summary; an LLM call
+                          (runs in a background thread). Defaults to extract_summary
+            min_recent_turns: Turns always kept verbatim, even over the budget
+            max_tool_tokens: Tool outputs longer than this are stored by reference once their turn ends
+            tool_preview_tokens: Tokens of a stored tool output kept in the history
+            summary_tokens: The summary is cut to this many tokens; turns still being summarised
+                            get the same allowance again
+            max_artifacts: Stored tool outputs kept (oldest are dropped first)
+            model: Model name for token counting
+        """
+        self.token_budget = token_budget
+        self.summarize_fn = summarize_fn or extract_summary
+        self.min_recent_turns = max(1, min_recent_turns)
+        self.max_tool_tokens = max_tool_tokens
+        self.tool_preview_tokens = tool_preview_tokens
+        self.summary_tokens = summary_tokens
+        self.max_artifacts = max_artifacts
+        self.model = model
+        self._turns = []          # [{'items': [...], 'tokens': [...]}], oldest first
+        self._tokens = 0
+        self._summary = ""
+        self._pending = []        # evicted turns whose summary is being written
+        self._artifacts = OrderedDict()
+        self._refs = itertools.count(1)
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="memory-summary")
+        self._futures = []
+        self._stats = {'evicted_turns': 0, 'summaries': 0, 'summary_errors': 0, 'stored_outputs': 0}
+
+    # --- recording -----------------------------------------------------------
+
+    def add(self, item):
+        """Record a message or item; a user message starts a new turn."""
+        if _field(item, 'role') == "user" or not self._turns:
+            if self._turns:
+                self._close_turn(self._turns[-1])
+            self._turns.append({'items': [], 'tokens': []})
+            self._turns[-1]['items'].append(item)
+            self._turns[-1]['tokens'].append(self._count(item))
+            self._tokens += self._turns[-1]['tokens'][-1]
+            self._evict()
+            return
+        self._turns[-1]['items'].append(item)
+        self._turns[-1]['tokens'].append(self._count(item))
+        self._tokens += self._turns[-1]['tokens'][-1]
+
+    def extend(self, items):
+        for item in items:
+            self.add(item)
+
+    def _count(self, item):
+        return count_tokens(json.dumps(_as_dict(item), default=str), self.model)
+
+    def _close_turn(self, turn):
+        """Store the finished turn's large tool outputs by reference."""
+        for i, item in enumerate(turn['items']):
+            key = _tool_output_key(item)
+            if key is None or turn['tokens'][i] <= self.max_tool_tokens:
+                continue
+            output = str(_field(item, key) or "")
+            ref = f"result-{next(self._refs)}"
+            self._artifacts[ref] = output
+            while len(self._artifacts) > self.max_artifacts:
+                self._artifacts.popitem(last=False)
+            preview = truncate_to_tokens(output, self.tool_preview_tokens, self.model)
+            compact = dict(_as_dict(item))
+            compact[key] = (f"{preview}... [truncated: full output ({count_tokens(output, self.model)} tokens) "
+                            f"stored as {ref}]")
+            turn['items'][i] = compact
+            new_tokens = self._count(compact)
+            self._tokens += new_tokens - turn['tokens'][i]
+            turn['tokens'][i] = new_tokens
+            self._stats['stored_outputs'] += 1
+
+    def _evict(self):
+        """Move the oldest turns out of the budget and summarise them in the background."""
+        if self._tokens <= self.token_budget:
+            return
+        evicted = []
+        while len(self._turns) > self.min_recent_turns and self._tokens > EVICT_TO * self.token_budget:
+            turn = self._turns.pop(0)
+            self._tokens -= sum(turn['tokens'])
+            evicted.append(turn)
+        if not evicted:
+            return
+        transcript = "\n".join(filter(None, (render_item(item) for turn in evicted for item in turn['items'])))
+        with self._lock:
+            self._pending.append(transcript)
+        self._stats['evicted_turns'] += len(evicted)
+        self._futures = [f for f in self._futures if not f.done()]
+        self._futures.append(self._executor.submit(self._summarize, transcript))
+
+    def _summarize(self, transcript):
+        # One worker thread, so summaries are folded in eviction order
+        extracted = self.summarize_fn is extract_summary
+        try:
+            summary = self.summarize_fn(self._summary, transcript)
+            self._stats['summaries'] += 1
+        except Exception as e:
+            print(f"⚠️ Summarising the conversation failed, keeping an extract: {e}")
+            summary = extract_summary(self._summary, transcript)
+            self._stats['summary_errors'] += 1
+            extracted = True
+        # An extract grows at the end, so its oldest lines go; a rewritten summary is cut at the end
+        if extracted:
+            summary = _newest_lines(summary, self.summary_tokens, self.model)
+        else:
+            summary = truncate_to_tokens(summary or "", self.summary_tokens, self.model)
+        with self._lock:
+            self._summary = summary
+            self._pending.remove(transcript)
+
+    # --- reading -------------------------------------------------------------
+
+    def summary(self):
+        """The rolling summary, plus an extract of turns still being summarised."""
+        with self._lock:
+            summary, pending = self._summary, list(self._pending)
+        if pending:
+            # The extract has its own allowance, newest turns first, whatever the summary's length
+            extract = _newest_lines(extract_summary("", "\n".join(pending)), self.summary_tokens, self.model)
+            summary = "\n".join(filter(None, [summary, extract]))
+        return summary
+
+    def messages(self):
+        """The history to send: a summary message (if any turns were evicted) followed by the recent turns."""
+        items = [item for turn in self._turns for item in turn['items']]
+        summary = self.summary()
+        if summary:
+            items.insert(0, {"role": "system", "content": SUMMARY_PREFIX + summary})
+        return items
+
+    def artifact(self, ref):
+        """Full text of a tool output stored by reference (None if it was dropped)."""
+        return self._artifacts.get(ref)
+
+    @property
+    def tokens(self):
+        """Tokens of the verbatim turns."""
+        return self._tokens
+
+    @property
+    def stats(self):
+        return {**self._stats, 'turns': len(self._turns), 'tokens': self._tokens,
+                'summary_tokens': count_tokens(self.summary(), self.model), 'artifacts': len(self._artifacts)}
+
+    def wait(self):
+        """Block until pending summaries are written (the agent itself never needs to)."""
+        for future in list(self._futures):
+            future.result()
+
+    def clear(self):
+        self.wait()
+        with self._lock:
+            self._turns, self._tokens, self._summary, self._pending = [], 0, "", []
+        self._artifacts.clear()
+
+    def __len__(self):
+        return sum(len(turn['items']) for turn in self._turns)